@@ -6,6 +6,9 @@ class Settings(BaseSettings):
     # 数据库配置
     SQLITE_DB_PATH: str = "data/database/papers.db"
     CHROMA_DB_PATH: str = "data/database/chroma"
+    VECTOR_BACKEND: str = "chroma"  # 可选: chroma/numpy（numpy 为内存映射的精确检索，存放在 CHROMA_DB_PATH/numpy）
+    VECTOR_DTYPE: str = "float32"  # numpy 后端的向量存储类型: float32/float16（体积减半，查询较慢）
+    VECTOR_QUANTIZATION: str = "none"  # numpy 后端首轮检索的量化编码: none/int8/binary（候选再用全精度向量精排）
     
     # LLM配置
     DEFAULT_LLM_PROVIDER: str = "ollama"
@@ -19,6 +22,24 @@ class Settings(BaseSettings):
     # 嵌入模型配置
     EMBEDDING_MODEL: str = "sentence-transformers/all-MiniLM-L6-v2"
     EMBEDDING_DEVICE: str = "cpu"
+    EMBEDDING_BATCH_SIZE: int = 64
+    EMBEDDING_NORMALIZE: bool = True
+    EMBEDDING_THREADS: int = 0  # CPU 推理线程数，0 表示使用默认值
+    EMBEDDING_BACKEND: str = "sentence-transformers"  # 可选: sentence-transformers/onnx
+    EMBEDDING_QUANTIZE: bool = True  # onnx 后端是否使用 int8 动态量化
+    EMBEDDING_ONNX_DIR: str = "data/models/onnx"
+    EMBEDDING_CACHE: bool = True  # 按文本内容缓存向量，重新导入时不重复计算
+    QUERY_CACHE_SIZE: int = 1024  # 内存中缓存的查询向量数，0 表示不缓存
+    QUERY_CACHE_PERSIST: bool = False  # 查询向量同时保存到 CHROMA_DB_PATH/query_cache.sqlite
+    RESULT_CACHE_SIZE: int = 256  # QueryEngine.query 缓存的结果数，论文或向量变化时自动失效，0 表示不缓存
+    SEARCH_AGGREGATION: str = "max"  # 分块得分汇总为论文得分: max/sum（得分最高的 SEARCH_TOP_M 个分块之和）
+    SEARCH_TOP_M: int = 3
+    SEARCH_MAX_CANDIDATES: int = 1000  # 不足 n 篇论文时逐步加深检索，最多检查的分块数
+    SEARCH_FILTER_PUSHDOWN: int = 2000  # 过滤后的论文数不超过该值时以 paper_id 条件下推到向量库，否则在检索结果中过滤
+    # 混合搜索的融合方式: max（默认，与旧版相同：按最大值归一化后加权求和）/rrf/zscore/minmax
+    # 其他方式会改变排序，切换前先用 scripts/evaluate_fusion.py 在标注查询上比较 nDCG
+    FUSION_METHOD: str = "max"
+    FUSION_RRF_K: int = 60
     
     # PDF解析配置
     PDF_PARSER: str = "marker"  # 可选: pymupdf/marker/llm/mineru
@@ -45,5 +66,9 @@ class Settings(BaseSettings):
     @property
     def chroma_path(self) -> Path:
         return self.project_root / self.CHROMA_DB_PATH
+    
+    @property
+    def embedding_onnx_path(self) -> Path:
+        return self.project_root / self.EMBEDDING_ONNX_DIR
 
 settings = Settings()
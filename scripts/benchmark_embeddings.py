@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""嵌入后端吞吐基准测试
+
+对比以下后端的编码速度（句/秒），ONNX 后端同时报告与原模型的一致性：
+  - sentence-transformers: PyTorch 原模型
+  - onnx-float: ONNX Runtime float32
+  - onnx-int8: ONNX Runtime + int8 动态量化
+"""
+
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from config import settings
+from src.database.embeddings import SentenceTransformerEmbedder, OnnxEmbedder
+
+
+def load_sentences(n: int, chunk_size: int):
+    """从文献库全文中取样文本块，库为空时使用合成文本"""
+    sentences = []
+    try:
+        from src.database import SQLManager
+        from src.parsers.text_chunker import TextChunker
+        sql_manager = SQLManager(str(settings.sqlite_path))
+        chunker = TextChunker(chunk_size, 0)
+        for paper in sql_manager.iter_papers(columns=('raw_text',), batch_size=50):
+            sentences.extend(chunk["text"] for chunk in chunker.chunk_text(paper.get('raw_text')))
+            if len(sentences) >= n:
+                break
+    except Exception as e:
+        print(f"读取文献库失败，使用合成文本: {e}")
+
+    if not sentences:
+        words = ("retrieval", "augmented", "generation", "transformer", "literature", "review",
+                 "embedding", "semantic", "search", "benchmark", "evaluation", "model")
+        rng = np.random.default_rng(0)
+        sentences = [' '.join(rng.choice(words, size=rng.integers(20, 200))) for _ in range(n)]
+    return sentences[:n]
+
+
+def bench(name: str, embedder, sentences, repeats: int):
+    embedder.embed(sentences[:8])  # 预热（加载模型、导出 ONNX）
+    start = time.perf_counter()
+    for _ in range(repeats):
+        vectors = embedder.embed(sentences)
+    elapsed = time.perf_counter() - start
+    rate = len(sentences) * repeats / elapsed
+    print(f"[{name:>21}] {rate:10.1f} 句/秒")
+    return vectors
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="嵌入后端吞吐基准测试")
+    parser.add_argument("--model", default=settings.EMBEDDING_MODEL, help="嵌入模型")
+    parser.add_argument("--sentences", type=int, default=512, help="测试文本数量 (默认: 512)")
+    parser.add_argument("--chunk-size", type=int, default=settings.CHUNK_SIZE, help="文本块长度")
+    parser.add_argument("--batch-size", type=int, default=settings.EMBEDDING_BATCH_SIZE, help="编码批大小")
+    parser.add_argument("--threads", type=int, default=settings.EMBEDDING_THREADS or None,
+                        help="推理线程数 (默认: 全部核心)")
+    parser.add_argument("--repeats", type=int, default=3, help="重复次数 (默认: 3)")
+    args = parser.parse_args()
+
+    sentences = load_sentences(args.sentences, args.chunk_size)
+    print(f"模型 {args.model}，{len(sentences)} 段文本，批大小 {args.batch_size}，线程 {args.threads or '默认'}\n")
+
+    common = dict(model_name=args.model, batch_size=args.batch_size, normalize=True, num_threads=args.threads)
+    reference = bench("sentence-transformers", SentenceTransformerEmbedder(**common), sentences, args.repeats)
+
+    for quantize in (False, True):
+        embedder = OnnxEmbedder(export_dir=str(settings.embedding_onnx_path), quantize=quantize, **common)
+        vectors = bench(f"onnx-{embedder.variant}", embedder, sentences, args.repeats)
+        cosine = (reference * vectors).sum(axis=1)
+        print(f"{'':>24}与原模型余弦相似度: 平均 {cosine.mean():.4f} / 最小 {cosine.min():.4f}")
+
+
+if __name__ == "__main__":
+    main()
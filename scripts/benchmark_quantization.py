@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""量化首轮检索的召回率与内存基准测试
+
+读取 paper_fulltext 集合中的全文向量，取其中一部分作为查询，其余写入临时的
+NumpyVectorStore，对比以下方式的 recall@k（以全精度精确检索为基准）、
+首轮需要扫描的数据量、首轮扫描缓存占用的内存和查询延迟：
+  - float32: 全精度精确检索
+  - int8: int8 标量量化首轮 + 全精度精排
+  - binary: 符号位二值量化首轮 + 全精度精排
+"""
+
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from config import settings
+from src.database.numpy_store import NumpyVectorStore
+from src.database.quantization import QUANTIZERS
+
+
+def load_embeddings(limit: int, page_size: int = 5000) -> np.ndarray:
+    """分页读取 paper_fulltext 集合中的向量，集合为空时使用合成向量"""
+    vectors = []
+    try:
+        from src.database import VectorManager
+        collection = VectorManager(str(settings.chroma_path)).fulltext_collection
+        offset = 0
+        while not limit or offset < limit:
+            size = min(page_size, limit - offset) if limit else page_size
+            page = collection.get(include=["embeddings"], limit=size, offset=offset)
+            if not len(page["ids"]):
+                break
+            vectors.extend(np.asarray(page["embeddings"], dtype=np.float32))
+            offset += len(page["ids"])
+    except Exception as e:
+        print(f"读取 paper_fulltext 失败，使用合成向量: {e}")
+
+    if not vectors:
+        # 聚簇分布的合成向量，比均匀随机向量更接近真实文本嵌入
+        rng = np.random.default_rng(0)
+        n = limit or 50000
+        centers = rng.normal(size=(256, 384))
+        vectors = centers[rng.integers(0, len(centers), n)] + rng.normal(scale=0.8, size=(n, 384))
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def run_queries(collection, queries: np.ndarray, k: int):
+    """逐条查询，返回 (结果 id 列表, 平均毫秒)"""
+    found = []
+    start = time.perf_counter()
+    for query in queries:
+        found.append(collection.query(query_embeddings=[query], n_results=k, include=[])["ids"][0])
+    return found, (time.perf_counter() - start) * 1000 / len(queries)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="量化首轮检索的召回率与内存基准测试")
+    parser.add_argument("--limit", type=int, default=0, help="最多读取的向量数 (默认: 全部)")
+    parser.add_argument("--queries", type=int, default=200, help="查询数量 (默认: 200)")
+    parser.add_argument("-k", type=int, default=10, help="recall@k 的 k (默认: 10)")
+    parser.add_argument("--oversample", type=int, nargs="*", default=[],
+                        help="首轮候选倍数，可指定多个 (默认: 各量化器的推荐值)")
+    args = parser.parse_args()
+
+    vectors = load_embeddings(args.limit)
+    queries, base = vectors[:args.queries], vectors[args.queries:]
+    print(f"paper_fulltext: {len(base)} 条向量，维度 {base.shape[1]}，{len(queries)} 条查询，k={args.k}\n")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = NumpyVectorStore(tmp, dtype="float32")
+        collection = store.get_or_create_collection("paper_fulltext")
+        for start in range(0, len(base), 50000):
+            batch = base[start:start + 50000]
+            collection.add(ids=[f"v{i}" for i in range(start, start + len(batch))], embeddings=batch)
+
+        exact, exact_ms = run_queries(collection, queries, args.k)
+        vector_bytes = collection.memory_usage()["vectors"]
+        print(f"{'方式':<14}{'首轮扫描':>12}{'每向量':>10}{'扫描缓存':>10}{'recall@' + str(args.k):>12}"
+              f"{'毫秒/查询':>12}")
+        print(f"{'float32':<16}{vector_bytes / 2**20:>10.1f}MB{vector_bytes / len(base):>10.0f}B"
+              f"{0:>12.1f}MB{1.0:>12.3f}{exact_ms:>14.2f}")
+        store.close()
+
+        for name, quantizer in QUANTIZERS.items():
+            for oversample in args.oversample or [quantizer.oversample]:
+                # 同一目录以量化方式重新打开，缺少的编码文件在第一次查询时生成
+                store = NumpyVectorStore(tmp, dtype="float32", quantization=name, oversample=oversample)
+                collection = store.get_or_create_collection("paper_fulltext")
+                code_bytes = collection.memory_usage()["codes"]
+                found, ms = run_queries(collection, queries, args.k)
+                view_bytes = collection.memory_usage()["code_views"]
+                recall = np.mean([len(set(a) & set(b)) / args.k for a, b in zip(found, exact)])
+                label = f"{name} ×{oversample}"
+                print(f"{label:<16}{code_bytes / 2**20:>10.1f}MB{code_bytes / len(base):>10.0f}B"
+                      f"{view_bytes / 2**20:>12.1f}MB{recall:>12.3f}{ms:>14.2f}")
+                store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""SQLite 读写并发基准测试
+
+对比两种模式下，后台持续写入时的读取吞吐：
+  - legacy: 每次操作新建连接 + 默认 rollback journal（旧版 SQLManager 的行为）
+  - pooled: SQLManager 的按线程连接池 + WAL
+"""
+
+import sys
+import json
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.database.sql_manager import SQLManager
+
+INSERT_SQL = """
+    INSERT INTO papers (title, authors, year, abstract, keywords, pdf_path, pdf_hash)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+def make_row(i: int):
+    return (
+        f"Benchmark Paper {i}",
+        "Alice, Bob",
+        2000 + i % 25,
+        "lorem ipsum " * 100,
+        json.dumps(["benchmark", f"topic-{i % 10}"]),
+        f"/tmp/paper_{i}.pdf",
+        f"hash-{i}-{random.random()}",
+    )
+
+
+def seed(sql_manager: SQLManager, n: int):
+    with sql_manager.transaction() as conn:
+        conn.executemany(INSERT_SQL, [make_row(i) for i in range(n)])
+
+
+def run(mode: str, db_path: Path, seed_size: int, readers: int, duration: float):
+    """运行一轮基准，返回 (读次数, 写次数)"""
+    pragmas = None if mode == "pooled" else {"journal_mode": "DELETE", "synchronous": "FULL"}
+    sql_manager = SQLManager(str(db_path), pragmas=pragmas)
+    seed(sql_manager, seed_size)
+
+    stop = threading.Event()
+    counts = {"reads": 0, "writes": 0, "errors": 0}
+    lock = threading.Lock()
+
+    def writer():
+        i = seed_size
+        while not stop.is_set():
+            try:
+                if mode == "pooled":
+                    with sql_manager.transaction() as conn:
+                        conn.execute(INSERT_SQL, make_row(i))
+                else:
+                    conn = sqlite3.connect(db_path)
+                    conn.execute(INSERT_SQL, make_row(i))
+                    conn.commit()
+                    conn.close()
+                i += 1
+                with lock:
+                    counts["writes"] += 1
+            except sqlite3.OperationalError:
+                with lock:
+                    counts["errors"] += 1
+
+    def reader():
+        local_reads = 0
+        while not stop.is_set():
+            paper_id = random.randint(1, seed_size)
+            try:
+                if mode == "pooled":
+                    sql_manager.get_paper(paper_id)
+                else:
+                    conn = sqlite3.connect(db_path)
+                    conn.row_factory = sqlite3.Row
+                    row = conn.execute("SELECT * FROM papers WHERE id = ?", (paper_id,)).fetchone()
+                    dict(row)
+                    conn.close()
+                local_reads += 1
+            except sqlite3.OperationalError:
+                with lock:
+                    counts["errors"] += 1
+        with lock:
+            counts["reads"] += local_reads
+
+    threads = [threading.Thread(target=writer)] + [threading.Thread(target=reader) for _ in range(readers)]
+    for t in threads:
+        t.start()
+    time.sleep(duration)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    sql_manager.close()
+    return counts
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="SQLite 读写并发基准测试")
+    parser.add_argument("--papers", type=int, default=2000, help="预置论文数量 (默认: 2000)")
+    parser.add_argument("--readers", type=int, default=4, help="读线程数量 (默认: 4)")
+    parser.add_argument("--duration", type=float, default=5.0, help="每轮持续秒数 (默认: 5)")
+    args = parser.parse_args()
+
+    print(f"预置 {args.papers} 篇论文，{args.readers} 个读线程 + 1 个写线程，每轮 {args.duration}s\n")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in ("legacy", "pooled"):
+            counts = run(mode, Path(tmp) / f"{mode}.db", args.papers, args.readers, args.duration)
+            print(f"[{mode:>6}] 读取 {counts['reads'] / args.duration:10.1f} 次/秒 | "
+                  f"写入 {counts['writes'] / args.duration:8.1f} 次/秒 | "
+                  f"锁冲突 {counts['errors']}")
+
+
+if __name__ == "__main__":
+    main()
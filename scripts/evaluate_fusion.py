@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""离线比较混合搜索的融合方式
+
+读取标注好的查询集，每个查询只做一次语义检索和关键词检索，然后用各种融合方式
+（以及只用单路结果的基线）排序，报告 recall@k、MRR@k 和 nDCG@k。
+
+查询集为 JSONL（或 JSON 数组），每行一个查询：
+    {"query": "graph neural networks", "relevant": [12, 40, 41], "filters": {"year_from": 2019}}
+relevant 为相关论文的ID，filters 可选（year_from / year_to / authors / venue）。
+"""
+
+import json
+import math
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Sequence
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from config import settings
+from src.database import SQLManager, VectorManager
+from src.retrieval import HybridSearch
+from src.retrieval.fusion import FUSION_METHODS, fuse
+
+BASELINES = ("semantic", "keyword")
+
+
+def load_queries(path: Path) -> List[Dict[str, Any]]:
+    text = path.read_text(encoding="utf-8").strip()
+    if text.startswith("["):
+        queries = json.loads(text)
+    else:
+        queries = [json.loads(line) for line in text.splitlines() if line.strip()]
+    for item in queries:
+        if not item.get("query") or not item.get("relevant"):
+            raise ValueError(f"查询缺少 query 或 relevant: {item}")
+    return queries
+
+
+def metrics(ranking: Sequence[int], relevant: set, k: int) -> Dict[str, float]:
+    """单个查询的 recall@k、MRR@k、nDCG@k（二值相关性）"""
+    top = list(ranking[:k])
+    hits = [paper_id in relevant for paper_id in top]
+    reciprocal = next((1 / (rank + 1) for rank, hit in enumerate(hits) if hit), 0.0)
+    dcg = sum(1 / math.log2(rank + 2) for rank, hit in enumerate(hits) if hit)
+    ideal = sum(1 / math.log2(rank + 2) for rank in range(min(len(relevant), k)))
+    return {
+        'recall': sum(hits) / len(relevant),
+        'mrr': reciprocal,
+        'ndcg': dcg / ideal if ideal else 0.0,
+    }
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="在标注查询集上比较混合搜索的融合方式")
+    parser.add_argument("queries", help="标注查询集 (JSONL 或 JSON 数组)")
+    parser.add_argument("-k", type=int, default=10, help="评估前 k 个结果 (默认: 10)")
+    parser.add_argument("--depth", type=int, help="每路检索的候选数 (默认: 2k，与在线搜索一致)")
+    parser.add_argument("--methods", nargs="+", choices=list(FUSION_METHODS), default=list(FUSION_METHODS),
+                        help="参与比较的融合方式 (默认: 全部)")
+    parser.add_argument("--semantic-weight", type=float, default=0.7, help="语义检索权重 (默认: 0.7)")
+    parser.add_argument("--keyword-weight", type=float, default=0.3, help="关键词检索权重 (默认: 0.3)")
+    parser.add_argument("--rrf-k", type=int, default=settings.FUSION_RRF_K, help="rrf 的平滑常数")
+    args = parser.parse_args()
+
+    queries = load_queries(Path(args.queries))
+    depth = args.depth or args.k * 2
+
+    sql_manager = SQLManager(str(settings.sqlite_path))
+    vector_manager = VectorManager(str(settings.chroma_path))
+    hybrid = HybridSearch(vector_manager, sql_manager)
+
+    # 每个查询的两路候选只检索一次，各融合方式共用
+    start = time.perf_counter()
+    candidates = [
+        hybrid.candidate_runs(item["query"], depth, item.get("filters")) for item in queries
+    ]
+    retrieval_ms = (time.perf_counter() - start) / len(queries) * 1000
+    print(f"{len(queries)} 个查询，每路候选 {depth} 篇，检索平均 {retrieval_ms:.1f}ms/查询\n")
+
+    weights = [args.semantic_weight, args.keyword_weight]
+    rows = []
+    for name in BASELINES + tuple(args.methods):
+        totals = {'recall': 0.0, 'mrr': 0.0, 'ndcg': 0.0}
+        elapsed = 0.0
+        for item, runs in zip(queries, candidates):
+            if name in BASELINES:
+                ranking = runs[name][0].tolist()
+            else:
+                start = time.perf_counter()
+                ids, _ = fuse([runs['semantic'], runs['keyword']], weights, method=name, k=args.rrf_k)
+                elapsed += time.perf_counter() - start
+                ranking = ids.tolist()
+            for metric, value in metrics(ranking, set(item["relevant"]), args.k).items():
+                totals[metric] += value
+        rows.append((name, {metric: value / len(queries) for metric, value in totals.items()},
+                     elapsed / len(queries) * 1000))
+
+    print(f"{'方式':<10} {'recall@' + str(args.k):>10} {'MRR@' + str(args.k):>10} {'nDCG@' + str(args.k):>10} {'融合ms':>8}")
+    for name, scores, fusion_ms in rows:
+        timing = f"{fusion_ms:.3f}" if name not in BASELINES else "-"
+        print(f"{name:<10} {scores['recall']:>10.3f} {scores['mrr']:>10.3f} {scores['ndcg']:>10.3f} {timing:>8}")
+
+    best = max((row for row in rows if row[0] not in BASELINES), key=lambda row: row[1]['ndcg'], default=None)
+    if best:
+        print(f"\nnDCG@{args.k} 最高的融合方式: {best[0]}（当前配置 FUSION_METHOD={settings.FUSION_METHOD}）")
+
+
+if __name__ == "__main__":
+    main()
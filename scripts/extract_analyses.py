@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""用LLM分析尚未分析（或模型/提示词已变化）的论文"""
+
+import sys
+import time
+from pathlib import Path
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from config import settings
+from src.database import SQLManager
+from src.llm.llm_factory import LLMFactory
+from src.analysis.extractor import PaperExtractor
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="批量提取论文分析结果")
+    parser.add_argument("--provider", default=settings.DEFAULT_LLM_PROVIDER, help="LLM提供商")
+    parser.add_argument("--model", default=settings.DEFAULT_LOCAL_MODEL, help="模型名称")
+    parser.add_argument("--limit", type=int, default=None, help="最多分析的论文数")
+    parser.add_argument("--batch-size", type=int, default=20, help="每批写入数据库的论文数 (默认: 20)")
+    args = parser.parse_args()
+
+    sql_manager = SQLManager(str(settings.sqlite_path))
+    llm = LLMFactory.create_llm(
+        provider=args.provider,
+        model=args.model,
+        base_url=settings.OLLAMA_BASE_URL if args.provider == "ollama" else None
+    )
+    extractor = PaperExtractor(llm)
+
+    print(f"模型: {extractor.model} | 提示词版本: {extractor.prompt_version}")
+    start = time.perf_counter()
+    stats = extractor.analyze_pending(sql_manager, limit=args.limit, batch_size=args.batch_size)
+    elapsed = time.perf_counter() - start
+
+    print(f"✓ 分析完成，用时 {elapsed:.1f}s")
+    print(f"  待分析: {stats['selected']} | 已保存: {stats['analyzed']} | 失败: {len(stats['failed'])}")
+    if stats['failed']:
+        print(f"  失败的论文ID: {stats['failed']}")
+    if stats['analyzed']:
+        print("  运行 scripts/sync_index.py 更新分析向量")
+
+
+if __name__ == "__main__":
+    main()
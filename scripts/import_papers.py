@@ -11,10 +11,101 @@ sys.path.insert(0, str(project_root))
 
 from config import settings
 from src.database import SQLManager, VectorManager
+from src.database.metadata_filters import paper_metadata
 from src.parsers.marker_parser import MarkerParser
 from src.parsers.pymupdf_parser import PyMuPDFParser
 from src.parsers.text_chunker import TextChunker
 
+def create_parser(parser_type: str = "pymupdf"):
+    """选择解析器"""
+    if parser_type == "marker":
+        try:
+            print("0使用PyMuPDF解析器")
+            return MarkerParser()
+        except ImportError:
+            print("Marker未安装，使用PyMuPDF")
+            return PyMuPDFParser()
+    print("1使用PyMuPDF解析器")
+    return PyMuPDFParser()
+
+def parse_pdf(parser, sql_manager: SQLManager, pdf_path: str):
+    """解析单个PDF，返回 (论文记录, 解析结果)"""
+    print(f"解析PDF: {pdf_path}")
+    parsed = parser.parse(pdf_path)
+    record = sql_manager.build_record(
+        pdf_path,
+        parsed,
+        raw_text=parsed.full_text,
+        markdown_text=parsed.markdown_text
+    )
+    return record, parsed
+
+def flush_batch(sql_manager: SQLManager, vector_manager: VectorManager, chunker: TextChunker, pending):
+    """批量写入数据库（单个事务），然后逐篇建立向量索引
+    
+    单篇论文分块或写入向量失败时只跳过这一篇，其余论文照常索引，
+    成功论文的 chunk_count 总会写回。
+    
+    Returns:
+        成功导入的 pdf_path -> paper_id 映射
+    """
+    if not pending:
+        return {}
+    
+    try:
+        ids = sql_manager.add_papers_bulk([record for record, _ in pending])
+    except Exception as e:
+        print(f"✗ 写入数据库失败（{len(pending)} 篇）: {e}")
+        return {}
+    
+    chunk_counts = {}
+    indexed = {}
+    failed = []
+    try:
+        for record, parsed in pending:
+            paper_id = ids[record['pdf_path']]
+            print(f"✓ 论文已保存 (ID: {paper_id}): {parsed.title}")
+            try:
+                chunk_counts.update(index_paper(vector_manager, chunker, paper_id, record, parsed))
+                indexed[record['pdf_path']] = paper_id
+            except Exception as e:
+                print(f"✗ 建立索引失败 (ID: {paper_id}): {e}")
+                failed.append(paper_id)
+    finally:
+        sql_manager.set_chunk_counts(chunk_counts)
+    
+    if failed:
+        print(f"✗ {len(failed)} 篇论文缺少向量 (ID: {failed})，可运行 scripts/sync_index.py --full --fulltext 重建")
+    return indexed
+
+def index_paper(vector_manager: VectorManager, chunker: TextChunker, paper_id: int, record, parsed):
+    """为单篇论文建立全文和摘要向量
+    
+    Returns:
+        {paper_id: 分块数}，没有分块时为空
+    """
+    # 年份、会议、作者写入向量元数据，检索时可直接过滤
+    metadata = paper_metadata(paper_id, record)
+    
+    # 分块并存储向量
+    chunks = chunker.chunk_text(parsed.full_text, metadata)
+    chunk_counts = {}
+    
+    if chunks:
+        chunk_texts = [chunk["text"] for chunk in chunks]
+        chunk_metadatas = [chunk.get("metadata", {}) for chunk in chunks]
+        written = vector_manager.add_fulltext(paper_id, chunk_texts, chunk_metadatas)
+        chunk_counts[paper_id] = len(chunks)
+        print(f"✓ 已创建 {len(chunks)} 个文本块 (新增 {written['added']}, 未变 {written['unchanged']}, "
+              f"删除 {written['deleted']})")
+    
+    # 存储摘要向量
+    if parsed.abstract:
+        vector_manager.add_abstract(paper_id, parsed.abstract, metadata)
+        print(f"✓ 摘要已索引")
+    
+    return chunk_counts
+
 def import_pdf(pdf_path: str, parser_type: str = "pymupdf"):
     """导入单个PDF"""
     # 初始化
@@ -22,57 +113,27 @@ def import_pdf(pdf_path: str, parser_type: str = "pymupdf"):
     vector_manager = VectorManager(str(settings.chroma_path))
     chunker = TextChunker(settings.CHUNK_SIZE, settings.CHUNK_OVERLAP)
     
-    # 选择解析器
-    if parser_type == "marker":
-        try:
-            print("0使用PyMuPDF解析器")
-            parser = MarkerParser()
-        except ImportError:
-            print("Marker未安装，使用PyMuPDF")
-            parser = PyMuPDFParser()
-    else:
-        print("1使用PyMuPDF解析器")
-        parser = PyMuPDFParser()
+    # 解析前先按文件指纹检查是否已导入
+    paper_id = sql_manager.is_ingested(pdf_path)
+    if paper_id:
+        print(f"已导入，跳过 (ID: {paper_id}): {pdf_path}")
+        return paper_id
     
-    print(f"解析PDF: {pdf_path}")
+    parser = create_parser(parser_type)
     
     try:
-        # 解析PDF
-        parsed = parser.parse(pdf_path)
-        
-        # 保存到数据库
-        paper_id = sql_manager.add_paper(
-            title=parsed.title,
-            pdf_path=pdf_path,
-            authors=', '.join(parsed.authors),
-            raw_text=parsed.full_text,
-            markdown_text=parsed.markdown_text
-        )
-        
-        print(f"✓ 论文已保存 (ID: {paper_id}): {parsed.title}")
-        
-        # 分块并存储向量
-        chunks = chunker.chunk_text(parsed.full_text, {"paper_id": paper_id, "title": parsed.title})
-        
-        if chunks:
-            chunk_texts = [chunk["text"] for chunk in chunks]
-            chunk_metadatas = [chunk.get("metadata", {}) for chunk in chunks]
-            vector_manager.add_fulltext(paper_id, chunk_texts, chunk_metadatas)
-            print(f"✓ 已创建 {len(chunks)} 个文本块")
-        
-        # 存储摘要向量
-        if parsed.abstract:
-            vector_manager.add_abstract(paper_id, parsed.abstract, {"paper_id": paper_id, "title": parsed.title})
-            print(f"✓ 摘要已索引")
-        
-        return paper_id
+        pending = [parse_pdf(parser, sql_manager, pdf_path)]
+        return flush_batch(sql_manager, vector_manager, chunker, pending).get(pdf_path)
         
     except Exception as e:
         print(f"✗ 导入失败: {e}")
         return None
 
-def import_directory(directory: str, parser_type: str = "pymupdf"):
-    """批量导入目录中的所有PDF"""
+def import_directory(directory: str, parser_type: str = "pymupdf", batch_size: int = 50):
+    """批量导入目录中的所有PDF
+    
+    每解析 batch_size 篇论文提交一次事务。
+    """
     pdf_dir = Path(directory)
     pdf_files = list(pdf_dir.glob("*.pdf"))
     
@@ -82,13 +143,47 @@ def import_directory(directory: str, parser_type: str = "pymupdf"):
     
     print(f"找到 {len(pdf_files)} 个PDF文件")
     
-    success_count = 0
-    for pdf_file in tqdm(pdf_files, desc="导入进度"):
-        paper_id = import_pdf(str(pdf_file), parser_type)
-        if paper_id:
-            success_count += 1
+    sql_manager = SQLManager(str(settings.sqlite_path))
+    vector_manager = VectorManager(str(settings.chroma_path))
+    chunker = TextChunker(settings.CHUNK_SIZE, settings.CHUNK_OVERLAP)
+    
+    # 解析前先按文件指纹过滤已导入的PDF（未变化的文件命中缓存，不会重新读取）
+    ingested = sql_manager.find_ingested([str(f) for f in pdf_files])
+    if ingested:
+        print(f"跳过 {len(ingested)} 个已导入的PDF")
+    new_files = [f for f in pdf_files if str(f) not in ingested]
+    
+    parser = create_parser(parser_type)
+    
+    success_count = len(ingested)
+    pending = []
+    for pdf_file in tqdm(new_files, desc="导入进度"):
+        try:
+            pending.append(parse_pdf(parser, sql_manager, str(pdf_file)))
+        except Exception as e:
+            print(f"✗ 导入失败: {e}")
+            continue
+        
+        if len(pending) >= batch_size:
+            success_count += len(flush_batch(sql_manager, vector_manager, chunker, pending))
+            pending = []
+    
+    success_count += len(flush_batch(sql_manager, vector_manager, chunker, pending))
     
     print(f"\n导入完成: {success_count}/{len(pdf_files)} 成功")
+    report_embedding_stats(vector_manager)
+
+def report_embedding_stats(vector_manager: VectorManager):
+    """输出嵌入吞吐"""
+    embedding_stats = vector_manager.embedding_stats()
+    for kind in ('ingest', 'query'):
+        stats = embedding_stats.get(kind)
+        if stats:
+            print(f"嵌入[{kind}]: {stats['texts']} 段文本 / {stats['calls']} 次调用, "
+                  f"{stats['seconds']:.1f}s, {stats['per_second']:.1f} 段/秒")
+    if 'cache' in embedding_stats:
+        cache = embedding_stats['cache']
+        print(f"向量缓存: 命中 {cache['hits']} / 未命中 {cache['misses']} ({cache['hit_rate']:.0%})")
 
 def main():
     import argparse
@@ -97,6 +192,8 @@ def main():
     parser.add_argument("path", help="PDF文件或目录路径")
     parser.add_argument("--parser", choices=["marker", "pymupdf"], default="pymupdf", 
                        help="PDF解析器类型 (默认: pymupdf)")
+    parser.add_argument("--batch-size", type=int, default=50,
+                       help="每批提交的论文数量 (默认: 50)")
     
     args = parser.parse_args()
     
@@ -105,7 +202,7 @@ def main():
     if path.is_file() and path.suffix == '.pdf':
         import_pdf(str(path), args.parser)
     elif path.is_dir():
-        import_directory(str(path), args.parser)
+        import_directory(str(path), args.parser, args.batch_size)
     else:
         print(f"无效路径: {path}")
 
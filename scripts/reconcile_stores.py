@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""比对 SQLite 与向量库，清理孤立向量并报告回收的空间"""
+
+import sys
+import time
+from pathlib import Path
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from config import settings
+from src.database import SQLManager, VectorManager
+from src.database.reconcile import StoreReconciler, delete_papers
+
+
+def format_bytes(size: int) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(size) < 1024 or unit == "GB":
+            return f"{size:.1f}{unit}" if unit != "B" else f"{size}B"
+        size /= 1024
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="清理 SQLite 与向量库之间的孤立数据")
+    parser.add_argument("--delete", type=int, nargs="+", metavar="ID", help="先从两个库中删除这些论文")
+    parser.add_argument("--dry-run", action="store_true", help="只统计，不删除")
+    parser.add_argument("--batch-size", type=int, default=1000, help="每批读取/删除的向量数 (默认: 1000)")
+    parser.add_argument("--no-compact", action="store_true", help="删除后不回收向量库空间（默认 numpy 后端合并段文件，chroma 后端运行 chroma vacuum）")
+    parser.add_argument("--vacuum", action="store_true", help="删除后 VACUUM SQLite 数据库")
+    args = parser.parse_args()
+
+    sql_manager = SQLManager(str(settings.sqlite_path))
+    vector_manager = VectorManager(str(settings.chroma_path))
+
+    if args.delete and not args.dry_run:
+        deleted = delete_papers(sql_manager, vector_manager, args.delete)
+        print(f"✓ 已删除 {deleted['papers']} 篇论文，向量: {deleted['vectors']}")
+
+    start = time.perf_counter()
+    report = StoreReconciler(sql_manager, vector_manager).reconcile(
+        batch_size=args.batch_size, dry_run=args.dry_run, compact=not args.no_compact, vacuum=args.vacuum
+    )
+    elapsed = time.perf_counter() - start
+
+    print(f"{'检查' if args.dry_run else '✓ 清理'}完成，用时 {elapsed:.1f}s，SQLite 中共 {report['papers']} 篇论文")
+    for name, scanned in report['scanned'].items():
+        print(f"  {name}: 扫描 {scanned} 条向量，孤立 {report['orphans'][name]} 条")
+        if report['skipped'][name]:
+            print(f"    其中 {report['skipped'][name]} 条属于扫描期间导入的论文，已保留")
+    if report['papers_without_vectors']:
+        missing = report['papers_without_vectors']
+        print(f"  没有任何向量的论文: {len(missing)} 篇 (如 {missing[:10]})，可运行 scripts/sync_index.py --full 重建")
+    if not args.dry_run:
+        print(f"  清理未引用的全文: {report['deleted_texts']} 条")
+        for label, (before, after) in (("向量库", report['vector_bytes']), ("SQLite", report['sqlite_bytes'])):
+            print(f"  {label}: {format_bytes(before)} -> {format_bytes(after)}，回收 {format_bytes(before - after)}")
+        if report['compact_error']:
+            print(f"  ⚠️ 向量库空间未回收: {report['compact_error']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -42,6 +42,16 @@ def search(query: str, method: str = "hybrid", n_results: int = 10):
             print(f"   相关度: {paper['relevance_score']:.3f}")
         
         print()
+    
+    query_stats = vector_manager.embedding_stats().get('query')
+    if query_stats:
+        print(f"查询嵌入: {query_stats['calls']} 次, 平均 {query_stats['seconds'] / query_stats['calls'] * 1000:.1f}ms")
+    search_stats = query_engine.search_stats()
+    if search_stats['queries']:
+        print(f"语义检索: 检查分块 {search_stats['candidates']} 个, 加深检索 {search_stats['requeries']} 次")
+    cache_info = query_engine.query_cache_info()
+    if cache_info:
+        print(f"查询向量缓存: 命中 {cache_info['hits']} 次, 未命中 {cache_info['misses']} 次")
 
 def find_similar(paper_id: int, n_results: int = 5):
     """查找相似论文"""
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""按变更日志增量同步向量索引"""
+
+import sys
+import time
+from pathlib import Path
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from config import settings
+from src.database import SQLManager, VectorManager
+from src.database.index_sync import VectorIndexSync
+from src.parsers.text_chunker import TextChunker
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="增量同步向量索引")
+    parser.add_argument("--full", action="store_true", help="忽略检查点，全量重建")
+    parser.add_argument("--fulltext", action="store_true", help="同时重新生成全文向量（较慢）")
+    parser.add_argument("--consumer", default="vector_index", help="检查点名称 (默认: vector_index)")
+    parser.add_argument("--batch-size", type=int, default=500, help="每批处理的变更数 (默认: 500)")
+    parser.add_argument("--prune", action="store_true", help="同步后删除所有消费者都已处理的变更")
+    parser.add_argument("--compact", action="store_true", help="同步后合并向量段文件（numpy 后端）")
+    args = parser.parse_args()
+
+    sql_manager = SQLManager(str(settings.sqlite_path))
+    vector_manager = VectorManager(str(settings.chroma_path))
+    chunker = TextChunker(settings.CHUNK_SIZE, settings.CHUNK_OVERLAP) if args.fulltext else None
+    syncer = VectorIndexSync(sql_manager, vector_manager, chunker, consumer=args.consumer)
+
+    print(f"待处理变更: {syncer.pending()}")
+    start = time.perf_counter()
+    stats = syncer.sync(batch_size=args.batch_size, full=args.full)
+    elapsed = time.perf_counter() - start
+
+    print(f"✓ 同步完成，用时 {elapsed:.1f}s")
+    print(f"  变更: {stats['changes']} | 更新论文: {stats['papers']} | 更新分析: {stats['analyses']} | "
+          f"删除论文: {stats['deleted_papers']} | 删除分析: {stats['deleted_analyses']}")
+
+    embedding_stats = vector_manager.embedding_stats()
+    if 'ingest' in embedding_stats:
+        print(f"  嵌入: {embedding_stats['ingest']['texts']} 段文本, {embedding_stats['ingest']['per_second']:.1f} 段/秒")
+    if 'cache' in embedding_stats:
+        print(f"  向量缓存命中率: {embedding_stats['cache']['hit_rate']:.0%}")
+
+    if args.prune:
+        print(f"✓ 已清理 {sql_manager.prune_changes()} 条变更日志")
+    if args.compact and vector_manager.vector_backend == "numpy":
+        print(f"✓ 向量段已合并: {vector_manager.compact()}")
+
+
+if __name__ == "__main__":
+    main()
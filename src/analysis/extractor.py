@@ -1,35 +1,19 @@
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+import hashlib
 from config.prompts import EXTRACTION_PROMPT
 from src.llm import LLMInterface
 
 class PaperExtractor:
     def __init__(self, llm: LLMInterface):
         self.llm = llm
+        # 与分析结果一起保存，提示词或模型变化后可以找出需要重新分析的论文
+        self.model = str(getattr(llm, 'model', type(llm).__name__))
+        self.prompt_version = hashlib.sha1(EXTRACTION_PROMPT.encode('utf-8')).hexdigest()[:12]
     
     def extract_info(self, paper_text: str, max_length: int = 8000) -> Dict[str, Any]:
         """提取论文关键信息"""
-        
-        # 截断过长的文本
-        if len(paper_text) > max_length:
-            paper_text = paper_text[:max_length] + "\n...(文本已截断)"
-        
-        # 构建提示词
-        prompt = EXTRACTION_PROMPT.format(paper_text=paper_text)
-        
-        # 调用LLM
         try:
-            result = self.llm.generate_structured(prompt, schema={})
-            
-            # 验证必需字段
-            required_fields = ['research_question', 'methodology', 'main_findings', 
-                             'key_contributions', 'limitations', 'future_work', 'keywords']
-            
-            for field in required_fields:
-                if field not in result:
-                    result[field] = [] if field in ['main_findings', 'key_contributions', 
-                                                     'limitations', 'keywords'] else ""
-            
-            return result
+            return self._extract(paper_text, max_length)
             
         except Exception as e:
             print(f"提取失败: {e}")
@@ -44,6 +28,64 @@ class PaperExtractor:
                 'keywords': []
             }
     
+    def _extract(self, paper_text: str, max_length: int) -> Dict[str, Any]:
+        """调用LLM提取信息，失败时抛出异常"""
+        
+        # 截断过长的文本
+        if len(paper_text) > max_length:
+            paper_text = paper_text[:max_length] + "\n...(文本已截断)"
+        
+        # 构建提示词
+        prompt = EXTRACTION_PROMPT.format(paper_text=paper_text)
+        
+        # 调用LLM
+        result = self.llm.generate_structured(prompt, schema={})
+        
+        # 验证必需字段
+        required_fields = ['research_question', 'methodology', 'main_findings', 
+                         'key_contributions', 'limitations', 'future_work', 'keywords']
+        
+        for field in required_fields:
+            if field not in result:
+                result[field] = [] if field in ['main_findings', 'key_contributions', 
+                                                 'limitations', 'keywords'] else ""
+        
+        return result
+    
+    def analyze_pending(self, sql_manager, limit: Optional[int] = None, batch_size: int = 20,
+                        max_length: int = 8000) -> Dict[str, Any]:
+        """分析尚无结果、或结果来自其他模型/提示词版本的论文，按批写回数据库
+        
+        待分析的论文由 sql_manager.get_unanalyzed_ids 选出，结果连同 model / prompt_version
+        通过 save_analyses_bulk 批量保存（每批一个事务）。提取失败或没有正文的论文不写入，
+        下次运行时会被重新选中。分析向量由 scripts/sync_index.py 按变更日志同步。
+        
+        Returns:
+            {'selected': 选中的论文数, 'analyzed': 成功保存数, 'failed': 失败的论文ID列表}
+        """
+        paper_ids = sql_manager.get_unanalyzed_ids(self.model, self.prompt_version, limit)
+        stats = {'selected': len(paper_ids), 'analyzed': 0, 'failed': []}
+        
+        for start in range(0, len(paper_ids), batch_size):
+            batch = sql_manager.get_papers(paper_ids[start:start + batch_size], columns=('abstract', 'raw_text'))
+            analyses = {}
+            for paper in batch:
+                text = paper.get('raw_text') or paper.get('abstract')
+                if not text:
+                    stats['failed'].append(paper['id'])
+                    continue
+                try:
+                    analyses[paper['id']] = self._extract(text, max_length)
+                except Exception as e:
+                    print(f"论文 {paper['id']} 提取失败: {e}")
+                    stats['failed'].append(paper['id'])
+            
+            if analyses:
+                sql_manager.save_analyses_bulk(analyses, model=self.model, prompt_version=self.prompt_version)
+                stats['analyzed'] += len(analyses)
+        
+        return stats
+    
     def extract_from_sections(self, sections: Dict[str, str]) -> Dict[str, Any]:
         """从章节中提取信息（更精确）"""
         
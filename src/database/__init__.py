@@ -1,4 +1,5 @@
 from .sql_manager import SQLManager
+from .async_sql_manager import AsyncSQLManager
 from .vector_manager import VectorManager
 
-__all__ = ['SQLManager', 'VectorManager']
+__all__ = ['SQLManager', 'AsyncSQLManager', 'VectorManager']
@@ -0,0 +1,116 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, List, Dict, Any, AsyncIterator, Sequence, Tuple
+
+from .sql_manager import SQLManager
+
+
+class AsyncSQLManager:
+    """SQLManager 的 asyncio 版本
+
+    读操作在专用线程池中执行（每个工作线程复用连接池里自己的连接，WAL 下可并发读），
+    写操作在单独的单线程执行器中串行执行，避免写锁竞争。
+    事件循环不会被数据库 I/O 阻塞，可以与嵌入计算、LLM 请求等并发进行。
+    """
+
+    def __init__(self, db_path: Optional[str] = None, sql_manager: Optional[SQLManager] = None,
+                 max_readers: int = 4, pragmas: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            db_path: 数据库路径（未提供 sql_manager 时使用）
+            sql_manager: 复用已有的 SQLManager
+            max_readers: 读线程数量
+        """
+        if sql_manager is None:
+            if db_path is None:
+                raise ValueError("需要提供 db_path 或 sql_manager")
+            sql_manager = SQLManager(db_path, pragmas=pragmas)
+        self.sync = sql_manager
+        self._readers = ThreadPoolExecutor(max_workers=max_readers, thread_name_prefix="sql-read")
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sql-write")
+
+    async def _read(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._readers, functools.partial(fn, *args, **kwargs))
+
+    async def _write(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._writer, functools.partial(fn, *args, **kwargs))
+
+    # ---- 读取 ----
+
+    async def get_paper(self, paper_id: int, columns: Optional[Sequence[str]] = None) -> Optional[Dict[str, Any]]:
+        return await self._read(self.sync.get_paper, paper_id, columns)
+
+    async def get_papers(self, paper_ids: Sequence[int], columns: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+        return await self._read(self.sync.get_papers, paper_ids, columns)
+
+    async def list_papers(self, columns: Optional[Sequence[str]] = None, cursor: Optional[int] = None,
+                          limit: int = 50) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        return await self._read(self.sync.list_papers, columns, cursor, limit)
+
+    async def iter_papers(self, columns: Optional[Sequence[str]] = None,
+                          batch_size: int = 500) -> AsyncIterator[Dict[str, Any]]:
+        """逐条异步遍历所有论文（按 list_papers 的游标分页，最新的在前）"""
+        cursor = None
+        while True:
+            papers, cursor = await self.list_papers(columns, cursor, batch_size)
+            for paper in papers:
+                yield paper
+            if cursor is None:
+                break
+
+    async def search_keywords(self, query: str, limit: int = 10,
+                              year_from: Optional[int] = None, year_to: Optional[int] = None,
+                              authors: Optional[List[str]] = None, venue: Optional[str] = None,
+                              include_unknown_year: bool = True) -> List[Dict[str, Any]]:
+        return await self._read(self.sync.search_keywords, query, limit, year_from, year_to, authors, venue,
+                                include_unknown_year)
+
+    async def get_paper_analysis(self, paper_id: int) -> Optional[Dict[str, Any]]:
+        return await self._read(self.sync.get_paper_analysis, paper_id)
+
+    async def get_analyses(self, paper_ids: Sequence[int]) -> Dict[int, Dict[str, Any]]:
+        return await self._read(self.sync.get_analyses, paper_ids)
+
+    async def get_library_stats(self) -> Dict[str, Any]:
+        return await self._read(self.sync.get_library_stats)
+
+    # ---- 写入 ----
+
+    async def find_ingested(self, pdf_paths: Sequence[str]) -> Dict[str, int]:
+        """检查哪些 PDF 已经导入（会写入指纹缓存，因此走写线程）"""
+        return await self._write(self.sync.find_ingested, pdf_paths)
+
+    async def add_papers_bulk(self, records: List[Dict[str, Any]], batch_size: int = 500) -> Dict[str, int]:
+        return await self._write(self.sync.add_papers_bulk, records, batch_size)
+
+    async def add_paper_from_metadata(self, metadata, pdf_path: str, raw_text: Optional[str] = None,
+                                      markdown_text: Optional[str] = None) -> int:
+        return await self._write(self.sync.add_paper_from_metadata, metadata, pdf_path, raw_text, markdown_text)
+
+    async def save_analyses_bulk(self, analyses: Dict[int, Dict[str, Any]], model: Optional[str] = None,
+                                 prompt_version: Optional[str] = None):
+        return await self._write(self.sync.save_analyses_bulk, analyses, model, prompt_version)
+
+    async def set_chunk_counts(self, counts: Dict[int, int]):
+        return await self._write(self.sync.set_chunk_counts, counts)
+
+    # ---- 生命周期 ----
+
+    async def close(self):
+        """等待未完成的操作后关闭线程池和连接"""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._shutdown)
+
+    def _shutdown(self):
+        self._readers.shutdown(wait=True)
+        self._writer.shutdown(wait=True)
+        self.sync.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
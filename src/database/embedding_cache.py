@@ -0,0 +1,120 @@
+import hashlib
+import re
+import threading
+import unicodedata
+from pathlib import Path
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+from .sql_manager import ConnectionPool
+
+
+class EmbeddingCache:
+    """持久化的文本向量缓存
+
+    以 (模型标识, 规范化文本的 sha256) 为键，向量以 float16 存储（体积为 float32 的一半，
+    对归一化向量的精度影响可以忽略）。重新导入、换解析器或重新分块时，
+    内容相同的文本块直接复用已有向量，不再调用模型。
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.pool = ConnectionPool(self.db_path)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        with self.pool.transaction() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    model_id TEXT NOT NULL,
+                    text_hash TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    PRIMARY KEY (model_id, text_hash)
+                ) WITHOUT ROWID
+            """)
+
+    @staticmethod
+    def text_hash(text: str) -> str:
+        """规范化（NFC、合并空白）后的文本哈希"""
+        normalized = re.sub(r'\s+', ' ', unicodedata.normalize('NFC', text)).strip()
+        return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+    def get_many(self, model_id: str, hashes: Sequence[str]) -> Dict[str, np.ndarray]:
+        """按哈希批量读取向量（float32）"""
+        wanted = list(dict.fromkeys(hashes))
+        conn = self.pool.connection()
+        vectors = {}
+        for i in range(0, len(wanted), 500):
+            batch = wanted[i:i + 500]
+            cursor = conn.execute(
+                f"SELECT text_hash, vector FROM embeddings WHERE model_id = ? "
+                f"AND text_hash IN ({', '.join('?' for _ in batch)})",
+                [model_id, *batch]
+            )
+            for text_hash, blob in cursor:
+                vectors[text_hash] = np.frombuffer(blob, dtype=np.float16).astype(np.float32)
+        return vectors
+
+    def put_many(self, model_id: str, vectors: Dict[str, np.ndarray]):
+        """写入 哈希 -> 向量"""
+        with self.pool.transaction() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model_id, text_hash, vector) VALUES (?, ?, ?)",
+                [(model_id, text_hash, np.asarray(vector, dtype=np.float16).tobytes())
+                 for text_hash, vector in vectors.items()]
+            )
+
+    def embed(self, embedder, texts: Sequence[str], kind: str = "ingest") -> np.ndarray:
+        """先查缓存，只对未命中的文本（同一批内相同文本只算一次）调用模型
+
+        Args:
+            embedder: SentenceTransformerEmbedder 或其子类
+        """
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        hashes = [self.text_hash(text) for text in texts]
+        cached = self.get_many(embedder.model_id, hashes)
+
+        missing: Dict[str, str] = {}
+        for text_hash, text in zip(hashes, texts):
+            if text_hash not in cached and text_hash not in missing:
+                missing[text_hash] = text
+        if missing:
+            # 新算出的向量同样经过 float16，保证命中与未命中时结果一致
+            vectors = embedder.embed(list(missing.values()), kind).astype(np.float16).astype(np.float32)
+            computed = dict(zip(missing, vectors))
+            self.put_many(embedder.model_id, computed)
+            cached.update(computed)
+
+        with self._lock:
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+        return np.stack([cached[text_hash] for text_hash in hashes]).astype(np.float32)
+
+    def clear(self, model_id: Optional[str] = None) -> int:
+        """删除缓存（指定 model_id 时只删除该模型的向量），返回删除条数"""
+        with self.pool.transaction() as conn:
+            if model_id is None:
+                return conn.execute("DELETE FROM embeddings").rowcount
+            return conn.execute("DELETE FROM embeddings WHERE model_id = ?", (model_id,)).rowcount
+
+    def info(self) -> Dict[str, object]:
+        conn = self.pool.connection()
+        by_model = {
+            row['model_id']: row['count']
+            for row in conn.execute("SELECT model_id, COUNT(*) AS count FROM embeddings GROUP BY model_id")
+        }
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'entries': by_model,
+            }
+
+    def close(self):
+        self.pool.close_all()
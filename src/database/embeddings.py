@@ -0,0 +1,319 @@
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+
+class EmbeddingStats:
+    """嵌入吞吐统计（按用途分别累计：ingest 写入 / query 查询）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals: Dict[str, Dict[str, float]] = {}
+
+    def record(self, kind: str, count: int, seconds: float):
+        with self._lock:
+            totals = self._totals.setdefault(kind, {'texts': 0, 'calls': 0, 'seconds': 0.0})
+            totals['texts'] += count
+            totals['calls'] += 1
+            totals['seconds'] += seconds
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {
+                kind: dict(totals, per_second=totals['texts'] / totals['seconds'] if totals['seconds'] else 0.0)
+                for kind, totals in self._totals.items()
+            }
+
+
+class SentenceTransformerEmbedder:
+    """共享的 sentence-transformers 嵌入函数
+
+    同一进程内相同 (模型, 设备) 只加载一次；按 batch_size 分批编码，
+    默认做 L2 归一化（与 Chroma 默认的 all-MiniLM-L6-v2 向量一致，余弦距离可直接比较）。
+    """
+
+    _models: Dict[tuple, Any] = {}
+    _models_lock = threading.Lock()
+
+    def __init__(self, model_name: str = "sentence-transformers/all-MiniLM-L6-v2", device: str = "cpu",
+                 batch_size: int = 64, normalize: bool = True, num_threads: Optional[int] = None):
+        """
+        Args:
+            model_name: sentence-transformers 模型名或本地路径
+            device: cpu / cuda / mps
+            batch_size: 每批编码的文本数
+            normalize: 是否归一化输出向量
+            num_threads: CPU 推理线程数，None 或 0 使用 torch 默认值
+        """
+        self.model_name = model_name
+        self.device = device
+        self.batch_size = batch_size
+        self.normalize = normalize
+        self.num_threads = num_threads
+        self.stats = EmbeddingStats()
+        self._model = None
+
+    @property
+    def model_id(self) -> str:
+        """标识向量空间的字符串（模型 + 是否归一化），用于区分不同模型产生的向量"""
+        return f"{self.model_name}{':norm' if self.normalize else ''}"
+
+    @property
+    def model(self):
+        if self._model is None:
+            self._model = self._load()
+        return self._model
+
+    def _load(self):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError:
+            raise ImportError("请安装 sentence-transformers: pip install sentence-transformers")
+
+        if self.num_threads:
+            import torch
+            torch.set_num_threads(self.num_threads)
+
+        key = (self.model_name, self.device)
+        with self._models_lock:
+            if key not in self._models:
+                self._models[key] = SentenceTransformer(self.model_name, device=self.device)
+            return self._models[key]
+
+    def embed(self, texts: Sequence[str], kind: str = "ingest") -> np.ndarray:
+        """编码文本，返回 float32 矩阵 (len(texts), dim)
+
+        Args:
+            texts: 文本列表
+            kind: 统计分类，ingest 或 query
+        """
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        start = time.perf_counter()
+        vectors = self._encode(list(texts))
+        self.stats.record(kind, len(texts), time.perf_counter() - start)
+        return vectors
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        vectors = self.model.encode(
+            texts,
+            batch_size=self.batch_size,
+            normalize_embeddings=self.normalize,
+            convert_to_numpy=True,
+            show_progress_bar=False,
+        )
+        return np.asarray(vectors, dtype=np.float32)
+
+    def __call__(self, input: Sequence[str]) -> List[np.ndarray]:
+        """Chroma EmbeddingFunction 接口"""
+        return list(self.embed(input))
+
+
+# 一致性检查使用的样例句子
+PARITY_SENTENCES = (
+    "Transformers have become the dominant architecture for natural language processing.",
+    "We propose a retrieval-augmented method for scientific literature review generation.",
+    "The results show a significant improvement over the baseline on three benchmarks.",
+    "深度学习在医学影像分析中的应用综述",
+    "Limitations include the small sample size and the lack of external validation.",
+    "Graph neural networks learn node representations by aggregating neighbor features.",
+    "本文提出了一种基于对比学习的文本表示方法。",
+    "Future work will explore multilingual settings and larger models.",
+)
+
+
+class OnnxEmbedder(SentenceTransformerEmbedder):
+    """ONNX Runtime 推理的嵌入函数（CPU，默认 int8 动态量化）
+
+    首次使用时把 sentence-transformers 模型导出为 ONNX 并量化（需要 torch），
+    之后推理只依赖 onnxruntime 和 tokenizers。导出时会与原始模型做一致性检查，
+    结果保存在导出目录的 meta.json 中。
+    """
+
+    # 量化后与原模型平均余弦相似度低于该值时给出警告
+    PARITY_THRESHOLD = 0.99
+
+    def __init__(self, model_name: str = "sentence-transformers/all-MiniLM-L6-v2", device: str = "cpu",
+                 batch_size: int = 64, normalize: bool = True, num_threads: Optional[int] = None,
+                 export_dir: str = "data/models/onnx", quantize: bool = True):
+        """
+        Args:
+            export_dir: 导出模型的根目录，每个模型一个子目录
+            quantize: 是否使用 int8 动态量化模型
+            其余参数同 SentenceTransformerEmbedder；num_threads 为 onnxruntime 的 intra-op 线程数
+        """
+        super().__init__(model_name, device, batch_size, normalize, num_threads)
+        self.quantize = quantize
+        self.model_dir = Path(export_dir) / model_name.replace('/', '__')
+        self.meta: Dict[str, Any] = {}
+        self._tokenizer = None
+
+    @property
+    def model_id(self) -> str:
+        return f"{super().model_id}:onnx{'-int8' if self.quantize else ''}"
+
+    @property
+    def model_path(self) -> Path:
+        return self.model_dir / ("model.int8.onnx" if self.quantize else "model.onnx")
+
+    def _load(self):
+        try:
+            import onnxruntime as ort
+            from tokenizers import Tokenizer
+        except ImportError:
+            raise ImportError("请安装 onnxruntime 和 tokenizers: pip install onnxruntime tokenizers")
+
+        if not self.model_path.exists():
+            self.export()
+        self.meta = json.loads((self.model_dir / "meta.json").read_text(encoding="utf-8"))
+
+        tokenizer = Tokenizer.from_file(str(self.model_dir / "tokenizer.json"))
+        tokenizer.enable_truncation(max_length=self.meta['max_seq_length'])
+        tokenizer.enable_padding(pad_id=self.meta['pad_token_id'], pad_token=self.meta['pad_token'])
+        self._tokenizer = tokenizer
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = self.num_threads or os.cpu_count() or 1
+        options.inter_op_num_threads = 1
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        session = ort.InferenceSession(str(self.model_path), options, providers=["CPUExecutionProvider"])
+
+        # 每种模型（float / int8）首次加载时做一次一致性检查并记录
+        parity = self.meta.setdefault('parity', {})
+        if self.variant not in parity:
+            self._model = session
+            try:
+                parity[self.variant] = self.check_parity()
+                self._write_meta()
+            except ImportError:
+                pass  # 只部署了 onnxruntime 的机器上跳过
+        return session
+
+    @property
+    def variant(self) -> str:
+        return "int8" if self.quantize else "float"
+
+    def _write_meta(self):
+        (self.model_dir / "meta.json").write_text(json.dumps(self.meta, indent=2), encoding="utf-8")
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        session = self.model
+        input_names = [i.name for i in session.get_inputs()]
+
+        # 按长度排序后分批，减少同一批内的 padding
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        vectors: List[Optional[np.ndarray]] = [None] * len(texts)
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            encodings = self._tokenizer.encode_batch([texts[i] for i in batch])
+            feeds = {
+                'input_ids': np.array([e.ids for e in encodings], dtype=np.int64),
+                'attention_mask': np.array([e.attention_mask for e in encodings], dtype=np.int64),
+                'token_type_ids': np.array([e.type_ids for e in encodings], dtype=np.int64),
+            }
+            hidden = session.run(None, {name: feeds[name] for name in input_names})[0]
+            pooled = self._pool(hidden, feeds['attention_mask'])
+            for i, vector in zip(batch, pooled):
+                vectors[i] = vector
+
+        result = np.stack(vectors).astype(np.float32)
+        if self.normalize:
+            result /= np.clip(np.linalg.norm(result, axis=1, keepdims=True), 1e-12, None)
+        return result
+
+    def _pool(self, hidden: np.ndarray, mask: np.ndarray) -> np.ndarray:
+        if self.meta.get('pooling') == 'cls':
+            return hidden[:, 0]
+        mask = mask[..., None].astype(hidden.dtype)
+        return (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+    def export(self):
+        """导出 ONNX 模型（float 与 int8 各一份）"""
+        try:
+            import torch
+            from sentence_transformers import SentenceTransformer
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+        except ImportError:
+            raise ImportError("导出 ONNX 模型需要 torch、sentence-transformers 和 onnxruntime")
+
+        self.model_dir.mkdir(parents=True, exist_ok=True)
+        st_model = SentenceTransformer(self.model_name, device="cpu")
+        transformer = st_model[0]
+        tokenizer = transformer.tokenizer
+        pooling = st_model[1] if len(st_model) > 1 else None
+
+        sample = tokenizer(["An example sentence for export."], return_tensors="pt")
+        input_names = [name for name in ('input_ids', 'attention_mask', 'token_type_ids') if name in sample]
+
+        class Encoder(torch.nn.Module):
+            def __init__(self, model):
+                super().__init__()
+                self.model = model
+
+            def forward(self, *inputs):
+                return self.model(**dict(zip(input_names, inputs))).last_hidden_state
+
+        float_path = self.model_dir / "model.onnx"
+        dynamic_axes = {name: {0: 'batch', 1: 'sequence'} for name in input_names + ['last_hidden_state']}
+        with torch.no_grad():
+            torch.onnx.export(
+                Encoder(transformer.auto_model).eval(),
+                tuple(sample[name] for name in input_names),
+                str(float_path),
+                input_names=input_names,
+                output_names=['last_hidden_state'],
+                dynamic_axes=dynamic_axes,
+                opset_version=14,
+            )
+        quantize_dynamic(str(float_path), str(self.model_dir / "model.int8.onnx"), weight_type=QuantType.QInt8)
+
+        tokenizer.save_pretrained(str(self.model_dir))
+        self.meta = {
+            'model_name': self.model_name,
+            'max_seq_length': st_model.max_seq_length,
+            'pooling': 'cls' if pooling is not None and getattr(pooling, 'pooling_mode_cls_token', False) else 'mean',
+            'pad_token': tokenizer.pad_token,
+            'pad_token_id': tokenizer.pad_token_id,
+        }
+        self._write_meta()
+
+    def check_parity(self, texts: Optional[Sequence[str]] = None) -> Dict[str, float]:
+        """与原始 sentence-transformers 模型比较输出向量的余弦相似度"""
+        texts = list(texts or PARITY_SENTENCES)
+        reference = SentenceTransformerEmbedder(self.model_name, "cpu", self.batch_size, normalize=True)
+        expected = reference.embed(texts)
+
+        # 临时以归一化方式编码，便于直接点积比较
+        normalize, self.normalize = self.normalize, True
+        try:
+            actual = self._encode(texts)
+        finally:
+            self.normalize = normalize
+
+        cosine = (expected * actual).sum(axis=1)
+        parity = {'min_cosine': float(cosine.min()), 'mean_cosine': float(cosine.mean())}
+        if parity['mean_cosine'] < self.PARITY_THRESHOLD:
+            print(f"⚠ ONNX 模型与原模型输出差异较大: {parity}")
+        return parity
+
+
+def create_embedder(backend: str = "sentence-transformers", **kwargs) -> SentenceTransformerEmbedder:
+    """按后端名称创建嵌入函数
+
+    Args:
+        backend: sentence-transformers（PyTorch）或 onnx（onnxruntime，可 int8 量化）
+        **kwargs: 传给嵌入函数的参数
+    """
+    if backend == "onnx":
+        return OnnxEmbedder(**kwargs)
+    if backend in ("sentence-transformers", "torch"):
+        kwargs.pop('export_dir', None)
+        kwargs.pop('quantize', None)
+        return SentenceTransformerEmbedder(**kwargs)
+    raise ValueError(f"未知的嵌入后端: {backend}")
@@ -0,0 +1,102 @@
+import hashlib
+import mmap
+import os
+import sqlite3
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+
+class FileFingerprinter:
+    """带持久化缓存的文件指纹（MD5，与 papers.pdf_hash 一致）
+
+    以 (解析后的绝对路径, 大小, 修改时间) 为键缓存哈希，文件未变化时不会重新读取，
+    经相对路径、符号链接或不同工作目录访问同一文件也能命中；需要计算时使用 mmap 大块读取。
+    """
+
+    # 每次喂给 hashlib 的数据量，大块可以减少 Python 层循环并让 hashlib 释放 GIL
+    CHUNK_SIZE = 8 * 1024 * 1024
+
+    def __init__(self, pool):
+        """
+        Args:
+            pool: ConnectionPool，缓存表与论文表在同一个数据库中
+        """
+        self.pool = pool
+
+    @staticmethod
+    def create_table(cursor: sqlite3.Cursor):
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS file_fingerprints (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                hash TEXT NOT NULL
+            )
+        """)
+
+    def fingerprint(self, file_path: str) -> str:
+        """获取单个文件的指纹"""
+        return self.fingerprint_many([file_path])[str(file_path)]
+
+    def fingerprint_many(self, file_paths: Sequence[str]) -> Dict[str, str]:
+        """批量获取文件指纹，只对新文件或已修改的文件计算哈希
+
+        Returns:
+            传入的路径 -> 哈希
+        """
+        paths = list(dict.fromkeys(str(p) for p in file_paths))
+        keys = {path: self._key(path) for path in paths}
+        unique = list(dict.fromkeys(keys.values()))
+        stats = {key: os.stat(key) for key in unique}
+
+        cached = {}
+        conn = self.pool.connection()
+        for i in range(0, len(unique), 500):
+            batch = unique[i:i + 500]
+            cursor = conn.execute(
+                f"SELECT path, size, mtime_ns, hash FROM file_fingerprints WHERE path IN ({', '.join('?' for _ in batch)})",
+                batch
+            )
+            for path, size, mtime_ns, file_hash in cursor:
+                stat = stats[path]
+                if size == stat.st_size and mtime_ns == stat.st_mtime_ns:
+                    cached[path] = file_hash
+
+        computed = {key: self.compute_hash(key) for key in unique if key not in cached}
+        if computed:
+            # 指纹缓存不影响论文记录，不触发记录缓存失效
+            with self.pool.transaction(notify=False) as conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO file_fingerprints (path, size, mtime_ns, hash) VALUES (?, ?, ?, ?)",
+                    [(path, stats[path].st_size, stats[path].st_mtime_ns, file_hash)
+                     for path, file_hash in computed.items()]
+                )
+
+        return {path: cached.get(keys[path]) or computed[keys[path]] for path in paths}
+
+    @staticmethod
+    def _key(file_path: str) -> str:
+        """缓存键：解析符号链接后的绝对路径"""
+        return str(Path(file_path).resolve())
+
+    @classmethod
+    def compute_hash(cls, file_path: str) -> str:
+        """直接计算文件 MD5（不使用缓存）"""
+        hasher = hashlib.md5()
+        with open(file_path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                return hasher.hexdigest()
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                view = memoryview(mm)
+                try:
+                    for offset in range(0, size, cls.CHUNK_SIZE):
+                        hasher.update(view[offset:offset + cls.CHUNK_SIZE])
+                finally:
+                    view.release()
+        return hasher.hexdigest()
+
+    def forget(self, file_paths: List[str]):
+        """删除缓存记录（文件被移动或删除后调用）"""
+        with self.pool.transaction(notify=False) as conn:
+            conn.executemany("DELETE FROM file_fingerprints WHERE path = ?", [(self._key(p),) for p in file_paths])
@@ -0,0 +1,37 @@
+from pathlib import Path
+
+from .sql_manager import ConnectionPool
+
+
+class IndexGeneration:
+    """持久化的向量库写入代数
+
+    保存在向量库目录下的 SQLite 文件中，每次写入向量后加一。导入脚本、同步任务、
+    清理任务和网页等不同进程共用同一个计数，检索结果缓存据此判断向量库是否变化。
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.pool = ConnectionPool(self.db_path)
+        with self.pool.transaction() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS generation (
+                    id INTEGER PRIMARY KEY CHECK (id = 0),
+                    value INTEGER NOT NULL
+                )
+            """)
+            conn.execute("INSERT OR IGNORE INTO generation (id, value) VALUES (0, 0)")
+
+    def value(self) -> int:
+        """当前代数"""
+        return self.pool.connection().execute("SELECT value FROM generation WHERE id = 0").fetchone()[0]
+
+    def bump(self) -> int:
+        """代数加一，返回新的代数"""
+        with self.pool.transaction() as conn:
+            conn.execute("UPDATE generation SET value = value + 1 WHERE id = 0")
+            return conn.execute("SELECT value FROM generation WHERE id = 0").fetchone()[0]
+
+    def close(self):
+        self.pool.close_all()
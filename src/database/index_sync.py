@@ -0,0 +1,146 @@
+from typing import Any, Dict, List, Sequence
+
+from .sql_manager import SQLManager
+from .metadata_filters import paper_metadata
+
+# 生成向量元数据需要的列
+METADATA_SOURCE_COLUMNS = ('title', 'year', 'venue', 'authors', 'authors_json')
+
+
+def analysis_document(paper: Dict[str, Any], analysis: Dict[str, Any]) -> str:
+    """把结构化分析结果拼成用于向量检索的文本"""
+    parts = [paper.get('title') or '']
+    for label, name in (('研究问题', 'research_question'), ('方法', 'methodology'), ('未来工作', 'future_work')):
+        if analysis.get(name):
+            parts.append(f"{label}: {analysis[name]}")
+    for label, name in (('主要发现', 'main_findings'), ('主要贡献', 'key_contributions'),
+                        ('局限性', 'limitations'), ('关键词', 'keywords')):
+        if analysis.get(name):
+            parts.append(f"{label}: {'; '.join(map(str, analysis[name]))}")
+    return '\n'.join(part for part in parts if part)
+
+
+class VectorIndexSync:
+    """按 SQLite 变更日志增量更新向量库
+
+    每批变更只取涉及的 paper_id，按数据库当前状态重建对应的向量
+    （论文已删除则删除向量），因此重复处理是安全的。处理完一批后推进检查点，
+    中途失败时下次从上一个检查点继续。
+    """
+
+    def __init__(self, sql_manager: SQLManager, vector_manager, chunker=None, consumer: str = "vector_index"):
+        """
+        Args:
+            sql_manager: SQLManager
+            vector_manager: VectorManager
+            chunker: TextChunker；提供时论文变更会重新生成全文向量，否则只更新摘要和分析向量
+            consumer: 检查点名称，不同的派生索引使用不同名称
+        """
+        self.sql_manager = sql_manager
+        self.vector_manager = vector_manager
+        self.chunker = chunker
+        self.consumer = consumer
+
+    def sync(self, batch_size: int = 500, full: bool = False) -> Dict[str, int]:
+        """把向量库更新到最新
+
+        Args:
+            batch_size: 每批处理的变更条数
+            full: 忽略检查点，按当前数据全部重建（从未同步过的消费者也会自动全量重建）
+
+        Returns:
+            统计：处理的变更数、更新的论文/分析数、删除的论文/分析数
+        """
+        stats = {'changes': 0, 'papers': 0, 'analyses': 0, 'deleted_papers': 0, 'deleted_analyses': 0}
+
+        checkpoint = self.sql_manager.get_checkpoint(self.consumer)
+        if checkpoint is None or full:
+            checkpoint = self._rebuild(batch_size, stats)
+
+        while True:
+            changes = self.sql_manager.get_changes(checkpoint, batch_size)
+            if not changes:
+                break
+            paper_ids = list(dict.fromkeys(c['paper_id'] for c in changes if c['entity'] == 'paper'))
+            analysis_ids = list(dict.fromkeys(c['paper_id'] for c in changes if c['entity'] == 'analysis'))
+            self._sync_papers(paper_ids, stats)
+            self._sync_analyses(analysis_ids, stats)
+
+            checkpoint = changes[-1]['seq']
+            self.sql_manager.advance_checkpoint(self.consumer, checkpoint)
+            stats['changes'] += len(changes)
+
+        return stats
+
+    def pending(self) -> int:
+        """尚未处理的变更条数"""
+        return self.sql_manager.count_changes(self.sql_manager.get_checkpoint(self.consumer) or 0)
+
+    def _rebuild(self, batch_size: int, stats: Dict[str, int]) -> int:
+        """全量重建，返回重建开始前的最新序号（重建期间的变更之后会再处理一次）"""
+        seq = self.sql_manager.latest_change_seq()
+        batch: List[int] = []
+        for paper in self.sql_manager.iter_papers(columns=('id',), batch_size=batch_size):
+            batch.append(paper['id'])
+            if len(batch) >= batch_size:
+                self._sync_papers(batch, stats)
+                self._sync_analyses(batch, stats, delete_missing=False)
+                batch = []
+        if batch:
+            self._sync_papers(batch, stats)
+            self._sync_analyses(batch, stats, delete_missing=False)
+        self.sql_manager.advance_checkpoint(self.consumer, seq)
+        return seq
+
+    def _sync_papers(self, paper_ids: Sequence[int], stats: Dict[str, int]):
+        if not paper_ids:
+            return
+        columns = METADATA_SOURCE_COLUMNS + (('abstract', 'raw_text') if self.chunker else ('abstract',))
+        papers = {paper['id']: paper for paper in self.sql_manager.get_papers(paper_ids, columns)}
+
+        # 已删除的论文一次批量删除向量
+        missing = [paper_id for paper_id in paper_ids if paper_id not in papers]
+        if missing:
+            self.vector_manager.delete_papers(missing)
+            stats['deleted_papers'] += len(missing)
+
+        chunk_counts = {}
+        for paper_id in paper_ids:
+            paper = papers.get(paper_id)
+            if paper is None:
+                continue
+
+            metadata = paper_metadata(paper_id, paper)
+            if paper.get('abstract'):
+                self.vector_manager.add_abstract(paper_id, paper['abstract'], metadata)
+            if self.chunker:
+                # add_fulltext 按内容比较，只写入有变化的分块（内容不变时只更新元数据）
+                chunks = self.chunker.chunk_text(paper.get('raw_text'), metadata)
+                self.vector_manager.add_fulltext(
+                    paper_id, [chunk["text"] for chunk in chunks], [chunk.get("metadata", {}) for chunk in chunks]
+                )
+                chunk_counts[paper_id] = len(chunks)
+            stats['papers'] += 1
+
+        if chunk_counts:
+            self.sql_manager.set_chunk_counts(chunk_counts)
+
+    def _sync_analyses(self, paper_ids: Sequence[int], stats: Dict[str, int], delete_missing: bool = True):
+        if not paper_ids:
+            return
+        analyses = self.sql_manager.get_analyses(paper_ids)
+        papers = {
+            paper['id']: paper for paper in self.sql_manager.get_papers(list(analyses), METADATA_SOURCE_COLUMNS)
+        }
+
+        for paper_id in paper_ids:
+            analysis = analyses.get(paper_id)
+            if analysis is None or paper_id not in papers:
+                if delete_missing:
+                    self.vector_manager.delete_analysis(paper_id)
+                    stats['deleted_analyses'] += 1
+                continue
+
+            document = analysis_document(papers[paper_id], analysis)
+            self.vector_manager.add_analysis(paper_id, document, paper_metadata(paper_id, papers[paper_id]))
+            stats['analyses'] += 1
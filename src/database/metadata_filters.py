@@ -0,0 +1,134 @@
+import json
+import re
+import unicodedata
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# 作者键在向量元数据中的前缀：每个作者存为一个布尔字段 "author:<键>": True
+AUTHOR_PREFIX = "author:"
+
+# where 比较运算符 -> SQL 运算符
+WHERE_OPERATORS = {"$eq": "=", "$ne": "!=", "$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}
+
+
+def normalize_author(name: str) -> str:
+    """作者名规范化：去掉重音符号、转小写、非字母数字字符合并为下划线"""
+    text = unicodedata.normalize('NFKD', name)
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    return re.sub(r'[\W_]+', '_', text.lower()).strip('_')
+
+
+def author_keys(names: Iterable[str]) -> List[str]:
+    """作者名 -> 过滤用的键：全名，以及多词姓名的姓（最后一个词）"""
+    keys = []
+    for name in names:
+        full = normalize_author(name)
+        if not full:
+            continue
+        keys.append(full)
+        if '_' in full:
+            keys.append(full.rsplit('_', 1)[1])
+    return list(dict.fromkeys(keys))
+
+
+def paper_author_names(paper: Dict[str, Any]) -> List[str]:
+    """从论文记录中取作者名列表（优先使用结构化的 authors_json）"""
+    authors = paper.get('authors_list')
+    if authors is None and paper.get('authors_json'):
+        authors = json.loads(paper['authors_json'])
+    if authors:
+        return [a['name'] if isinstance(a, dict) else str(a) for a in authors]
+    return [name.strip() for name in (paper.get('authors') or '').split(',') if name.strip()]
+
+
+def paper_metadata(paper_id: int, paper: Dict[str, Any]) -> Dict[str, Any]:
+    """生成写入向量库的论文元数据（paper_id、标题、年份、会议/期刊、作者键）
+
+    Args:
+        paper_id: 论文ID
+        paper: 论文记录（build_record 生成的记录或 SQLManager 返回的论文）
+    """
+    metadata: Dict[str, Any] = {"paper_id": paper_id}
+    if paper.get('title'):
+        metadata["title"] = paper['title']
+    if paper.get('year'):
+        metadata["year"] = int(paper['year'])
+    if paper.get('venue'):
+        metadata["venue"] = paper['venue']
+    for key in author_keys(paper_author_names(paper)):
+        metadata[AUTHOR_PREFIX + key] = True
+    return metadata
+
+
+def build_where(year_from: Optional[int] = None, year_to: Optional[int] = None,
+                authors: Optional[List[str]] = None, venue: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """把检索条件转换为 Chroma where 过滤条件
+
+    Args:
+        year_from / year_to: 年份范围（包含边界；指定后没有年份的论文不会返回）
+        authors: 作者列表，任意一位匹配即可（按全名或姓匹配）
+        venue: 会议/期刊（完全匹配）
+
+    Returns:
+        where 字典，没有条件时为 None
+    """
+    conditions: List[Dict[str, Any]] = []
+    if year_from:
+        conditions.append({"year": {"$gte": int(year_from)}})
+    if year_to:
+        conditions.append({"year": {"$lte": int(year_to)}})
+    if venue:
+        conditions.append({"venue": {"$eq": venue}})
+    if authors:
+        keys = list(dict.fromkeys(normalize_author(a) for a in authors if normalize_author(a)))
+        author_conditions = [{AUTHOR_PREFIX + key: {"$eq": True}} for key in keys]
+        if len(author_conditions) == 1:
+            conditions.append(author_conditions[0])
+        elif author_conditions:
+            conditions.append({"$or": author_conditions})
+
+    if not conditions:
+        return None
+    if len(conditions) == 1:
+        return conditions[0]
+    return {"$and": conditions}
+
+
+def where_to_sql(where: Dict[str, Any], column: str = "metadata") -> Tuple[str, List[Any]]:
+    """把 where 过滤条件转换为 SQL 条件（元数据以 JSON 存放在 column 列中）
+
+    支持 $and/$or 以及 $eq/$ne/$gt/$gte/$lt/$lte/$in/$nin，直接写值等同于 $eq。
+    缺少该字段的记录不满足任何比较条件（与 Chroma 一致）。
+
+    Returns:
+        (SQL 条件, 参数)
+    """
+    clauses: List[str] = []
+    params: List[Any] = []
+    for key, condition in where.items():
+        if key in ("$and", "$or"):
+            parts = [where_to_sql(item, column) for item in condition]
+            joiner = " AND " if key == "$and" else " OR "
+            clauses.append("(" + (joiner.join(sql for sql, _ in parts) or "1 = 1") + ")")
+            for _, part_params in parts:
+                params.extend(part_params)
+            continue
+        if '"' in key:
+            raise ValueError(f"不支持的元数据字段名: {key}")
+
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for operator, value in condition.items():
+            field = f"json_extract({column}, ?)"
+            params.append(f'$."{key}"')
+            if operator in ("$in", "$nin"):
+                placeholders = ', '.join('?' for _ in value)
+                negate = "NOT " if operator == "$nin" else ""
+                clauses.append(f"{field} {negate}IN ({placeholders})")
+                params.extend(value)
+            elif operator in WHERE_OPERATORS:
+                clauses.append(f"{field} {WHERE_OPERATORS[operator]} ?")
+                params.append(value)
+            else:
+                raise ValueError(f"不支持的过滤运算符: {operator}")
+
+    return " AND ".join(clauses) or "1 = 1", params
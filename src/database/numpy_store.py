@@ -0,0 +1,637 @@
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .metadata_filters import where_to_sql
+from .quantization import create_quantizer
+from .sql_manager import ConnectionPool
+
+# 检索时每次转换为 float32 参与计算的行数，控制临时内存
+SCAN_BLOCK_ROWS = 16384
+
+
+class NumpyVectorStore:
+    """内存映射 .npy 段 + SQLite 索引表的精确向量库
+
+    每个集合的向量保存在若干只追加的 .npy 段文件中，id、元数据和文档保存在
+    index.sqlite 的 vectors 表里，记录每个 id 所在的 (段, 行)。
+    打开时不读取任何向量，段文件在第一次查询时以 mmap 方式映射；
+    查询对所有存活的行做精确的点积计算，用 argpartition 取 top-k。
+    启用量化（int8/binary）时，每个段另存一份量化编码，首轮只扫描编码取出
+    k × oversample 个候选，再从全精度段文件中读取这些行精排。
+
+    接口与 chromadb.PersistentClient 相同（get_or_create_collection），
+    集合对象实现 VectorManager 用到的 add/upsert/update/get/delete/query。
+    """
+
+    def __init__(self, path: str, dtype: str = "float32", segment_rows: int = 65536,
+                 max_small_segments: int = 16, max_dead_ratio: float = 0.25,
+                 quantization: Optional[str] = None, oversample: Optional[int] = None):
+        """
+        Args:
+            path: 存储目录
+            dtype: 段文件中向量的存储类型；float16 体积减半，但查询时需要逐块转换为 float32
+            segment_rows: 合并后每个段的最大行数
+            max_small_segments: 未满的段超过该数量时自动合并
+            max_dead_ratio: 删除/覆盖留下的失效行超过该比例时自动合并
+            quantization: 首轮检索的量化方式 none/int8/binary
+            oversample: 首轮候选数 = k × oversample（默认使用量化器的推荐值）
+        """
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.dtype = np.dtype(dtype)
+        self.segment_rows = segment_rows
+        self.max_small_segments = max_small_segments
+        self.max_dead_ratio = max_dead_ratio
+        self.quantizer = create_quantizer(quantization)
+        self.oversample = oversample or (self.quantizer.oversample if self.quantizer else 1)
+        self.pool = ConnectionPool(self.path / "index.sqlite")
+        self._collections: Dict[str, NumpyCollection] = {}
+        self._lock = threading.Lock()
+        self._init_tables()
+
+    def _init_tables(self):
+        with self.pool.transaction() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS collections (
+                    name TEXT PRIMARY KEY,
+                    metadata TEXT,
+                    dim INTEGER,
+                    next_segment INTEGER NOT NULL DEFAULT 1
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS segments (
+                    collection TEXT NOT NULL,
+                    segment INTEGER NOT NULL,
+                    rows INTEGER NOT NULL,
+                    PRIMARY KEY (collection, segment)
+                ) WITHOUT ROWID
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS vectors (
+                    collection TEXT NOT NULL,
+                    id TEXT NOT NULL,
+                    segment INTEGER NOT NULL,
+                    row INTEGER NOT NULL,
+                    document TEXT,
+                    metadata TEXT NOT NULL DEFAULT '{}',
+                    PRIMARY KEY (collection, id)
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_vectors_position ON vectors(collection, segment, row)")
+
+    def get_or_create_collection(self, name: str, metadata: Optional[Dict[str, Any]] = None) -> "NumpyCollection":
+        """获取集合，不存在时创建"""
+        with self._lock:
+            if name not in self._collections:
+                with self.pool.transaction() as conn:
+                    conn.execute(
+                        "INSERT OR IGNORE INTO collections (name, metadata) VALUES (?, ?)",
+                        (name, json.dumps(metadata or {}, ensure_ascii=False))
+                    )
+                self._collections[name] = NumpyCollection(self, name)
+            return self._collections[name]
+
+    def compact(self) -> Dict[str, int]:
+        """合并所有集合的段文件，返回 集合名 -> 合并后的段数"""
+        conn = self.pool.connection()
+        names = [row['name'] for row in conn.execute("SELECT name FROM collections")]
+        segments = {name: self.get_or_create_collection(name).compact() for name in names}
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return segments
+
+    def close(self):
+        self.pool.close_all()
+
+
+class _Snapshot:
+    """某一时刻集合的只读视图：映射好的段文件，以及位置 -> id 的对照"""
+
+    def __init__(self, matrices: Dict[int, np.ndarray], offsets: Dict[int, int],
+                 ids: np.ndarray, alive: np.ndarray,
+                 codes: Dict[int, Tuple[np.ndarray, Optional[np.ndarray]]]):
+        self.matrices = matrices  # 段号 -> 映射的矩阵（按段号排序）
+        self.offsets = offsets    # 段号 -> 该段第一行的全局位置
+        self.ids = ids
+        self.alive = alive
+        self.codes = codes        # 段号 -> (映射的量化编码, 量化参数)
+        self.norms: Dict[int, np.ndarray] = {}  # 段号 -> 每行的平方范数（第一次全量扫描时计算）
+        self.code_norms: Dict[int, Optional[np.ndarray]] = {}  # 段号 -> 量化向量的平方范数
+        self.code_views: Dict[int, np.ndarray] = {}  # 段号 -> 首轮扫描用的编码视图（见 quantizer.scan_view）
+
+
+class NumpyCollection:
+    """NumpyVectorStore 中的一个集合"""
+
+    def __init__(self, store: NumpyVectorStore, name: str):
+        self.store = store
+        self.name = name
+        self.directory = store.path / name
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.RLock()
+        self._snapshot: Optional[_Snapshot] = None
+
+    # ---------- 写入 ----------
+
+    def add(self, ids: Sequence[str], embeddings: Sequence[Sequence[float]],
+            metadatas: Optional[Sequence[Dict[str, Any]]] = None,
+            documents: Optional[Sequence[str]] = None):
+        """添加向量，已存在的 id 保持不变（与 Chroma 一致）"""
+        existing = self._existing(ids)
+        keep = [i for i, vector_id in enumerate(ids) if vector_id not in existing]
+        if keep:
+            self._append(
+                [ids[i] for i in keep],
+                [embeddings[i] for i in keep],
+                [metadatas[i] for i in keep] if metadatas is not None else None,
+                [documents[i] for i in keep] if documents is not None else None,
+            )
+
+    def upsert(self, ids: Sequence[str], embeddings: Sequence[Sequence[float]],
+               metadatas: Optional[Sequence[Dict[str, Any]]] = None,
+               documents: Optional[Sequence[str]] = None):
+        """添加或覆盖向量（旧行成为失效行，合并时回收）
+
+        已存在的记录与 Chroma 一致：元数据按键合并，值为 None 的键被删除；未提供的文档保持不变。
+        """
+        ids = list(ids)
+        merged_metadatas, merged_documents = self._merge_stored(ids, self._stored(ids), metadatas, documents)
+        self._append(ids, embeddings, merged_metadatas, merged_documents)
+
+    def update(self, ids: Sequence[str], metadatas: Optional[Sequence[Dict[str, Any]]] = None,
+               documents: Optional[Sequence[str]] = None,
+               embeddings: Optional[Sequence[Sequence[float]]] = None):
+        """更新已有记录；元数据按键合并，值为 None 的键被删除（与 Chroma 一致）"""
+        existing = self._existing(ids)
+        if embeddings is not None:
+            stored = self._stored([vector_id for vector_id in ids if vector_id in existing])
+            keep = [i for i, vector_id in enumerate(ids) if vector_id in stored]
+            kept_ids = [ids[i] for i in keep]
+            merged_metadatas, merged_documents = self._merge_stored(
+                kept_ids, stored,
+                [metadatas[i] for i in keep] if metadatas is not None else None,
+                [documents[i] for i in keep] if documents is not None else None,
+            )
+            self._append(kept_ids, [embeddings[i] for i in keep], merged_metadatas, merged_documents)
+            return
+
+        with self.store.pool.transaction() as conn:
+            if metadatas is not None:
+                conn.executemany(
+                    "UPDATE vectors SET metadata = json_patch(metadata, ?) WHERE collection = ? AND id = ?",
+                    [(json.dumps(metadata, ensure_ascii=False), self.name, vector_id)
+                     for vector_id, metadata in zip(ids, metadatas) if vector_id in existing]
+                )
+            if documents is not None:
+                conn.executemany(
+                    "UPDATE vectors SET document = ? WHERE collection = ? AND id = ?",
+                    [(document, self.name, vector_id)
+                     for vector_id, document in zip(ids, documents) if vector_id in existing]
+                )
+
+    def delete(self, ids: Optional[Sequence[str]] = None, where: Optional[Dict[str, Any]] = None):
+        """按 id 和/或元数据条件删除"""
+        conditions, params = self._conditions(ids, where)
+        with self._lock:
+            with self.store.pool.transaction() as conn:
+                deleted = conn.execute(f"DELETE FROM vectors WHERE {conditions}", params).rowcount
+            if deleted:
+                self._snapshot = None
+                self._maybe_compact()
+
+    def _append(self, ids: List[str], embeddings, metadatas, documents):
+        """把一批向量写成一个新段，并在同一事务中更新索引表"""
+        if not ids:
+            return
+        if len(set(ids)) != len(ids):
+            raise ValueError("同一批写入中存在重复的 id")
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if vectors.ndim != 2 or len(vectors) != len(ids):
+            raise ValueError("embeddings 应为与 ids 等长的二维数组")
+
+        with self._lock:
+            with self.store.pool.transaction() as conn:
+                dim, segment = self._reserve_segments(conn, 1, vectors.shape[1])
+                self._write_segment(segment, vectors)
+                conn.execute(
+                    "INSERT INTO segments (collection, segment, rows) VALUES (?, ?, ?)",
+                    (self.name, segment, len(ids))
+                )
+                conn.executemany(
+                    "INSERT OR REPLACE INTO vectors (collection, id, segment, row, document, metadata) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    [
+                        (self.name, vector_id, segment, row,
+                         documents[row] if documents is not None else None,
+                         json.dumps(metadatas[row] if metadatas is not None else {}, ensure_ascii=False))
+                        for row, vector_id in enumerate(ids)
+                    ]
+                )
+            self._snapshot = None
+            self._maybe_compact()
+
+    def _reserve_segments(self, conn, count: int, dim: Optional[int] = None) -> Tuple[int, int]:
+        """分配 count 个新段号（段号只增不减，删除的段文件名不会被复用），返回 (维度, 第一个段号)"""
+        row = conn.execute(
+            "SELECT dim, next_segment FROM collections WHERE name = ?", (self.name,)
+        ).fetchone()
+        if dim is not None and row['dim'] is not None and row['dim'] != dim:
+            raise ValueError(f"集合 {self.name} 的向量维度为 {row['dim']}，写入的维度为 {dim}")
+        conn.execute(
+            "UPDATE collections SET next_segment = next_segment + ?, dim = COALESCE(dim, ?) WHERE name = ?",
+            (count, dim, self.name)
+        )
+        return row['dim'] or dim, row['next_segment']
+
+    def _segment_path(self, segment: int, suffix: str = "") -> Path:
+        return self.directory / f"{segment:08d}{suffix}.npy"
+
+    def _write_segment(self, segment: int, vectors: np.ndarray):
+        """写入段文件（启用量化时同时写入量化编码）"""
+        self._save(self._segment_path(segment), np.ascontiguousarray(vectors, dtype=self.store.dtype))
+        if self.store.quantizer is not None:
+            self._write_codes(segment, vectors)
+
+    def _write_codes(self, segment: int, vectors: np.ndarray):
+        quantizer = self.store.quantizer
+        codes, params = quantizer.encode(np.asarray(vectors, dtype=np.float32))
+        if params is not None:
+            self._save(self._segment_path(segment, f".{quantizer.name}.params"), params)
+        self._save(self._segment_path(segment, f".{quantizer.name}"), codes)
+
+    @staticmethod
+    def _save(path: Path, array: np.ndarray):
+        """先写临时文件再改名，读者不会看到写了一半的文件"""
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as f:
+            np.save(f, array)
+        os.replace(tmp_path, path)
+
+    # ---------- 合并 ----------
+
+    def _segment_stats(self, conn) -> List[Tuple[int, int, int]]:
+        """[(段号, 总行数, 存活行数)]"""
+        return [
+            (row['segment'], row['rows'], row['live'])
+            for row in conn.execute("""
+                SELECT s.segment, s.rows, COUNT(v.id) AS live
+                FROM segments s
+                LEFT JOIN vectors v ON v.collection = s.collection AND v.segment = s.segment
+                WHERE s.collection = ?
+                GROUP BY s.segment
+                ORDER BY s.segment
+            """, (self.name,))
+        ]
+
+    def _maybe_compact(self):
+        """写入后检查：未满的段过多时合并这些段，失效行过多时合并全部段"""
+        stats = self._segment_stats(self.store.pool.connection())
+        total = sum(rows for _, rows, _ in stats)
+        dead = sum(rows - live for _, rows, live in stats)
+        if total and dead / total > self.store.max_dead_ratio:
+            self.compact()
+            return
+        small = [segment for segment, rows, _ in stats if rows < self.store.segment_rows]
+        if len(small) > self.store.max_small_segments:
+            self._merge(small)
+
+    def compact(self) -> int:
+        """把所有存活的行重写为尽量少的段，删除旧段文件和残留文件，返回合并后的段数"""
+        with self._lock:
+            # 已满且没有失效行的段保持不动
+            self._merge([
+                segment for segment, rows, live in self._segment_stats(self.store.pool.connection())
+                if rows < self.store.segment_rows or live < rows
+            ])
+            conn = self.store.pool.connection()
+            remaining = {row['segment'] for row in conn.execute(
+                "SELECT segment FROM segments WHERE collection = ?", (self.name,)
+            )}
+            # 清理写入中断（或映射中无法删除）留下的文件
+            for path in self.directory.glob("*"):
+                if path.suffix == ".tmp" or (path.suffix == ".npy" and int(path.name.split(".")[0]) not in remaining):
+                    self._unlink(path)
+            return len(remaining)
+
+    def _merge(self, segments: List[int]):
+        """把指定段中存活的行重写为新段"""
+        if not segments:
+            return
+        with self._lock:
+            with self.store.pool.transaction() as conn:
+                placeholders = ', '.join('?' for _ in segments)
+                rows = conn.execute(
+                    f"SELECT id, segment, row FROM vectors WHERE collection = ? AND segment IN ({placeholders}) "
+                    f"ORDER BY segment, row",
+                    [self.name, *segments]
+                ).fetchall()
+
+                size = self.store.segment_rows
+                count = (len(rows) + size - 1) // size
+                _, first = self._reserve_segments(conn, count)
+                sources = {segment: np.load(self._segment_path(segment), mmap_mode="r") for segment in segments}
+
+                moves = []
+                for index in range(count):
+                    batch = rows[index * size:(index + 1) * size]
+                    new_segment = first + index
+                    vectors = np.concatenate([
+                        sources[segment][[r['row'] for r in group]]
+                        for segment, group in self._group_by_segment(batch)
+                    ])
+                    self._write_segment(new_segment, vectors)
+                    conn.execute(
+                        "INSERT INTO segments (collection, segment, rows) VALUES (?, ?, ?)",
+                        (self.name, new_segment, len(batch))
+                    )
+                    moves.extend((new_segment, row_index, self.name, r['id']) for row_index, r in enumerate(batch))
+
+                conn.executemany("UPDATE vectors SET segment = ?, row = ? WHERE collection = ? AND id = ?", moves)
+                conn.execute(
+                    f"DELETE FROM segments WHERE collection = ? AND segment IN ({placeholders})",
+                    [self.name, *segments]
+                )
+            del sources
+            self._snapshot = None
+            for segment in segments:
+                for path in self.directory.glob(f"{segment:08d}.*"):
+                    self._unlink(path)
+
+    @staticmethod
+    def _group_by_segment(rows):
+        group: List[Any] = []
+        for row in rows:
+            if group and row['segment'] != group[0]['segment']:
+                yield group[0]['segment'], group
+                group = []
+            group.append(row)
+        if group:
+            yield group[0]['segment'], group
+
+    @staticmethod
+    def _unlink(path: Path):
+        # Windows 下仍被映射的文件无法删除，留到下次 compact 时清理
+        try:
+            path.unlink()
+        except OSError:
+            pass
+
+    # ---------- 读取 ----------
+
+    def count(self) -> int:
+        conn = self.store.pool.connection()
+        return conn.execute("SELECT COUNT(*) FROM vectors WHERE collection = ?", (self.name,)).fetchone()[0]
+
+    def get(self, ids: Optional[Sequence[str]] = None, where: Optional[Dict[str, Any]] = None,
+            limit: Optional[int] = None, offset: Optional[int] = None,
+            include: Sequence[str] = ("metadatas", "documents")) -> Dict[str, Any]:
+        """按 id 和/或元数据条件读取记录，返回格式同 Chroma"""
+        conditions, params = self._conditions(ids, where)
+        sql = f"SELECT id, segment, row, document, metadata FROM vectors WHERE {conditions} ORDER BY rowid"
+        if limit is not None or offset is not None:
+            sql += f" LIMIT {int(limit) if limit is not None else -1} OFFSET {int(offset or 0)}"
+        rows = self.store.pool.connection().execute(sql, params).fetchall()
+
+        result: Dict[str, Any] = {"ids": [row['id'] for row in rows], "included": list(include)}
+        result["metadatas"] = [json.loads(row['metadata']) for row in rows] if "metadatas" in include else None
+        result["documents"] = [row['document'] for row in rows] if "documents" in include else None
+        if "embeddings" in include:
+            matrices = self._load().matrices
+            result["embeddings"] = [
+                np.asarray(matrices[row['segment']][row['row']], dtype=np.float32) for row in rows
+            ]
+        else:
+            result["embeddings"] = None
+        return result
+
+    def query(self, query_embeddings: Sequence[Sequence[float]], n_results: int = 10,
+              where: Optional[Dict[str, Any]] = None,
+              include: Sequence[str] = ("metadatas", "documents", "distances")) -> Dict[str, Any]:
+        """最近邻查询
+
+        距离为平方 L2 距离（与 Chroma 默认的 l2 空间一致，归一化向量时等于 2 - 2·余弦相似度）。
+        启用量化时先用量化编码取候选，返回的距离仍由全精度向量计算。
+        """
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        snapshot = self._load()
+
+        positions = None
+        if where:
+            sql, params = where_to_sql(where)
+            rows = self.store.pool.connection().execute(
+                f"SELECT segment, row FROM vectors WHERE collection = ? AND ({sql})",
+                [self.name, *params]
+            ).fetchall()
+            positions = np.fromiter(
+                (snapshot.offsets[row['segment']] + row['row'] for row in rows if row['segment'] in snapshot.offsets),
+                dtype=np.int64
+            )
+            positions.sort()
+
+        quantizer = self.store.quantizer
+        if quantizer is None:
+            distances, found = self._top_k(self._exact_blocks(snapshot, queries, positions), len(queries), n_results)
+        else:
+            _, candidates = self._top_k(
+                self._code_blocks(snapshot, queries, positions), len(queries), n_results * self.store.oversample
+            )
+            # 所有查询的候选合并后一次读取全精度向量精排
+            union = np.unique(np.concatenate(candidates)) if candidates else np.empty(0, dtype=np.int64)
+            distances, found = self._top_k(self._exact_blocks(snapshot, queries, union), len(queries), n_results)
+
+        # 元数据和文档从索引表读取；快照之后被其他线程或进程删除的记录不再返回
+        hits = [[(snapshot.ids[p], distance) for p, distance in zip(positions_row, distances_row)]
+                for positions_row, distances_row in zip(found, distances)]
+        wanted = {"metadatas", "documents"}.intersection(include)
+        stored = self.get(ids=list({vector_id for row in hits for vector_id, _ in row}), include=list(wanted))
+        metadatas = dict(zip(stored["ids"], stored["metadatas"] or [None] * len(stored["ids"])))
+        documents = dict(zip(stored["ids"], stored["documents"] or [None] * len(stored["ids"])))
+        hits = [[(vector_id, distance) for vector_id, distance in row if vector_id in metadatas] for row in hits]
+
+        ids = [[vector_id for vector_id, _ in row] for row in hits]
+        return {
+            "ids": ids,
+            "distances": [[float(distance) for _, distance in row] for row in hits] if "distances" in include else None,
+            "metadatas": [[metadatas[i] for i in row] for row in ids] if "metadatas" in include else None,
+            "documents": [[documents[i] for i in row] for row in ids] if "documents" in include else None,
+            "embeddings": None,
+            "included": list(include),
+        }
+
+    @staticmethod
+    def _top_k(blocks, n_queries: int, k: int) -> Tuple[List[np.ndarray], List[np.ndarray]]:
+        """逐块合并 (全局位置, 距离矩阵)，用 argpartition 保留每个查询当前最近的 k 个位置"""
+        best_distances = np.empty((n_queries, 0), dtype=np.float32)
+        best_positions = np.empty((n_queries, 0), dtype=np.int64)
+        for block_positions, distances in blocks:
+            best_distances = np.concatenate([best_distances, distances], axis=1)
+            best_positions = np.concatenate(
+                [best_positions, np.broadcast_to(block_positions, distances.shape)], axis=1
+            )
+            if best_distances.shape[1] > k:
+                keep = np.argpartition(best_distances, k - 1, axis=1)[:, :k]
+                best_distances = np.take_along_axis(best_distances, keep, axis=1)
+                best_positions = np.take_along_axis(best_positions, keep, axis=1)
+
+        order = np.argsort(best_distances, axis=1, kind="stable")
+        return (
+            list(np.take_along_axis(best_distances, order, axis=1)),
+            list(np.take_along_axis(best_positions, order, axis=1)),
+        )
+
+    def _exact_blocks(self, snapshot: _Snapshot, queries: np.ndarray, positions: Optional[np.ndarray]):
+        """全精度距离；全量扫描时使用缓存的范数，只读取部分行时（过滤、精排）直接计算"""
+        query_norms = (queries * queries).sum(axis=1)[:, None]
+        for segment, rows, block_positions in self._row_blocks(snapshot, positions):
+            block = np.asarray(snapshot.matrices[segment][rows], dtype=np.float32)
+            if positions is None:
+                block_norms = self._segment_norms(
+                    snapshot.norms, segment, snapshot.matrices[segment],
+                    lambda block: np.einsum('ij,ij->i', block, block)
+                )[rows]
+            else:
+                block_norms = np.einsum('ij,ij->i', block, block)
+            yield block_positions, np.maximum(query_norms + block_norms[None, :] - 2 * queries @ block.T, 0)
+
+    def _code_blocks(self, snapshot: _Snapshot, queries: np.ndarray, positions: Optional[np.ndarray]):
+        """量化编码上的近似距离"""
+        quantizer = self.store.quantizer
+        for segment, rows, block_positions in self._row_blocks(snapshot, positions):
+            codes, params = snapshot.codes[segment]
+            norms = self._segment_norms(
+                snapshot.code_norms, segment, codes, lambda block: quantizer.code_norms(block, params)
+            )
+            if segment not in snapshot.code_views:
+                snapshot.code_views[segment] = quantizer.scan_view(codes)
+            yield block_positions, quantizer.distances(
+                queries, snapshot.code_views[segment][rows], params, norms[rows] if norms is not None else None
+            )
+
+    @staticmethod
+    def _row_blocks(snapshot: _Snapshot, positions: Optional[np.ndarray]):
+        """依次产出 (段号, 段内行选择, 全局位置)；positions 为 None 时扫描所有存活的行"""
+        for segment, matrix in snapshot.matrices.items():
+            offset = snapshot.offsets[segment]
+            if positions is None:
+                for start in range(0, len(matrix), SCAN_BLOCK_ROWS):
+                    stop = min(start + SCAN_BLOCK_ROWS, len(matrix))
+                    alive = snapshot.alive[offset + start:offset + stop]
+                    if alive.all():
+                        yield segment, slice(start, stop), np.arange(offset + start, offset + stop)
+                    elif alive.any():
+                        rows = np.flatnonzero(alive) + start
+                        yield segment, rows, rows + offset
+            else:
+                lo, hi = np.searchsorted(positions, [offset, offset + len(matrix)])
+                for start in range(lo, hi, SCAN_BLOCK_ROWS):
+                    block_positions = positions[start:min(start + SCAN_BLOCK_ROWS, hi)]
+                    yield segment, block_positions - offset, block_positions
+
+    @staticmethod
+    def _segment_norms(cache: Dict[int, Optional[np.ndarray]], segment: int, matrix: np.ndarray,
+                       compute) -> Optional[np.ndarray]:
+        """段内每行的平方范数，分块计算一次后随快照缓存（compute 返回 None 表示不需要范数）"""
+        if segment not in cache:
+            parts = []
+            for start in range(0, len(matrix), SCAN_BLOCK_ROWS):
+                block = matrix[start:start + SCAN_BLOCK_ROWS]
+                parts.append(compute(np.asarray(block, dtype=np.float32) if block.dtype.kind == 'f' else block))
+            cache[segment] = None if not parts or parts[0] is None else np.concatenate(parts).astype(np.float32)
+        return cache[segment]
+
+    def _load(self) -> _Snapshot:
+        """获取当前快照；本进程写入后或其他连接提交写入后重新加载"""
+        with self._lock:
+            if self.store.pool.external_changes():
+                self._snapshot = None
+            if self._snapshot is not None:
+                return self._snapshot
+
+            conn = self.store.pool.connection()
+            matrices, codes, offsets, total = {}, {}, {}, 0
+            for row in conn.execute(
+                "SELECT segment, rows FROM segments WHERE collection = ? ORDER BY segment", (self.name,)
+            ):
+                matrices[row['segment']] = np.load(self._segment_path(row['segment']), mmap_mode="r")
+                if self.store.quantizer is not None:
+                    codes[row['segment']] = self._load_codes(row['segment'], matrices[row['segment']])
+                offsets[row['segment']] = total
+                total += row['rows']
+
+            ids = np.empty(total, dtype=object)
+            alive = np.zeros(total, dtype=bool)
+            for row in conn.execute("SELECT id, segment, row FROM vectors WHERE collection = ?", (self.name,)):
+                position = offsets[row['segment']] + row['row']
+                ids[position] = row['id']
+                alive[position] = True
+
+            self._snapshot = _Snapshot(matrices, offsets, ids, alive, codes)
+            return self._snapshot
+
+    def _load_codes(self, segment: int, matrix: np.ndarray) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """映射段的量化编码；启用量化前写入的段在这里补生成"""
+        name = self.store.quantizer.name
+        path = self._segment_path(segment, f".{name}")
+        if not path.exists():
+            self._write_codes(segment, matrix)
+        params_path = self._segment_path(segment, f".{name}.params")
+        params = np.load(params_path) if params_path.exists() else None
+        return np.load(path, mmap_mode="r"), params
+
+    def memory_usage(self) -> Dict[str, int]:
+        """段文件大小（字节）：vectors 为全精度向量，codes 为当前量化方式的编码，
+        code_views 为已缓存的首轮扫描视图占用的内存（int8 转换后的 float32，见 quantizer.scan_view）
+
+        启用量化时首轮检索只扫描编码，全精度向量只读取候选行。
+        """
+        snapshot = self._load()
+        usage = {"vectors": sum(matrix.nbytes for matrix in snapshot.matrices.values()), "codes": 0, "code_views": 0}
+        for segment, (codes, params) in snapshot.codes.items():
+            usage["codes"] += codes.nbytes + (params.nbytes if params is not None else 0)
+            view = snapshot.code_views.get(segment)
+            if view is not None and view is not codes:
+                usage["code_views"] += view.nbytes
+        return usage
+
+    def _stored(self, ids: Sequence[str]) -> Dict[str, Tuple[Dict[str, Any], Optional[str]]]:
+        """已存在记录的 id -> (元数据, 文档)"""
+        if not ids:
+            return {}
+        current = self.get(ids=list(ids), include=["metadatas", "documents"])
+        return dict(zip(current["ids"], zip(current["metadatas"], current["documents"])))
+
+    @staticmethod
+    def _merge_stored(ids: Sequence[str], stored: Dict[str, Tuple[Dict[str, Any], Optional[str]]],
+               metadatas: Optional[Sequence[Dict[str, Any]]],
+               documents: Optional[Sequence[str]]) -> Tuple[List[Dict[str, Any]], List[Optional[str]]]:
+        """新值与已有记录合并：元数据按键合并并去掉值为 None 的键，未提供的文档沿用旧值"""
+        merged_metadatas, merged_documents = [], []
+        for row, vector_id in enumerate(ids):
+            old_metadata, old_document = stored.get(vector_id, ({}, None))
+            metadata = dict(old_metadata or {})
+            if metadatas is not None:
+                metadata.update(metadatas[row] or {})
+            merged_metadatas.append({key: value for key, value in metadata.items() if value is not None})
+            merged_documents.append(documents[row] if documents is not None else old_document)
+        return merged_metadatas, merged_documents
+
+    def _existing(self, ids: Sequence[str]) -> set:
+        if not ids:
+            return set()
+        return set(self.get(ids=list(ids), include=[])["ids"])
+
+    def _conditions(self, ids: Optional[Sequence[str]], where: Optional[Dict[str, Any]]) -> Tuple[str, List[Any]]:
+        conditions, params = ["collection = ?"], [self.name]
+        if ids is not None:
+            conditions.append(f"id IN ({', '.join('?' for _ in ids)})" if ids else "0")
+            params.extend(ids)
+        if where:
+            sql, where_params = where_to_sql(where)
+            conditions.append(f"({sql})")
+            params.extend(where_params)
+        return " AND ".join(conditions), params
@@ -0,0 +1,149 @@
+from pathlib import Path
+from typing import Any, Dict, List, Sequence
+
+from .sql_manager import SQLManager
+
+
+def disk_usage(path: Path) -> int:
+    """文件或目录占用的字节数"""
+    path = Path(path)
+    if path.is_file():
+        return path.stat().st_size
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file()) if path.exists() else 0
+
+
+def sqlite_usage(db_path: Path) -> int:
+    """SQLite 数据库文件及其 WAL/共享内存文件的大小"""
+    db_path = Path(db_path)
+    return sum(disk_usage(Path(f"{db_path}{suffix}")) for suffix in ("", "-wal", "-shm"))
+
+
+def delete_papers(sql_manager: SQLManager, vector_manager, paper_ids: Sequence[int]) -> Dict[str, Any]:
+    """同时从 SQLite 和向量库删除论文
+
+    先在一个事务中删除 SQLite 记录，再删除向量；向量删除失败时 SQLite 的删除
+    已经提交，残留的向量由 StoreReconciler 清理（变更日志同步时也会再次删除）。
+
+    Returns:
+        {papers: 删除的论文数, vectors: 集合名 -> 删除的向量数}
+    """
+    papers = sql_manager.delete_papers(paper_ids)
+    vectors = vector_manager.delete_papers(paper_ids)
+    return {'papers': papers, 'vectors': vectors}
+
+
+class StoreReconciler:
+    """比对 SQLite 与向量库，清理没有对应论文的孤立向量
+
+    导入中途失败、删除不完整等情况会在向量库中留下孤立分块，它们会占用空间
+    并出现在检索结果中。这里按批读取各集合的元数据，与 SQLite 中的论文ID比较，
+    删除孤立向量、清理不再被引用的全文，然后回收向量库空间并报告回收的大小。
+    """
+
+    def __init__(self, sql_manager: SQLManager, vector_manager):
+        self.sql_manager = sql_manager
+        self.vector_manager = vector_manager
+
+    def find_orphans(self, batch_size: int = 1000) -> Dict[str, Any]:
+        """扫描所有集合，返回孤立向量与缺少向量的论文
+
+        Returns:
+            paper_ids: SQLite 中的论文ID集合
+            scanned: 集合名 -> 扫描的向量数
+            orphans: 集合名 -> 孤立向量ID列表
+            papers_without_vectors: 在任何集合中都没有向量的论文ID
+        """
+        paper_ids = set(self.sql_manager.paper_ids())
+        indexed = set()
+        scanned, orphans = {}, {}
+        for name, collection in self.vector_manager.collections.items():
+            scanned[name], orphans[name] = 0, []
+            offset = 0
+            while True:
+                page = collection.get(include=["metadatas"], limit=batch_size, offset=offset)
+                if not page["ids"]:
+                    break
+                for vector_id, metadata in zip(page["ids"], page["metadatas"]):
+                    paper_id = (metadata or {}).get("paper_id")
+                    if paper_id in paper_ids:
+                        indexed.add(paper_id)
+                    else:
+                        orphans[name].append(vector_id)
+                scanned[name] += len(page["ids"])
+                offset += len(page["ids"])
+        return {
+            'paper_ids': paper_ids,
+            'scanned': scanned,
+            'orphans': orphans,
+            'papers_without_vectors': sorted(paper_ids - indexed),
+        }
+
+    def reconcile(self, batch_size: int = 1000, dry_run: bool = False,
+                  compact: bool = True, vacuum: bool = False) -> Dict[str, Any]:
+        """清理孤立向量和全文
+
+        Args:
+            batch_size: 每批读取/删除的向量数
+            dry_run: 只统计，不删除
+            compact: 删除后回收向量库空间（numpy 合并段文件，chroma 运行 `chroma vacuum`，见 VectorManager.compact）
+            vacuum: 删除后 VACUUM SQLite，回收空闲页
+
+        Returns:
+            papers / scanned / orphans（集合名 -> 数量）/ papers_without_vectors /
+            skipped（集合名 -> 删除前核对时发现论文已存在而保留的向量数）/
+            deleted_texts / vector_bytes / sqlite_bytes（(清理前, 清理后) 字节数）/
+            compact_error（回收向量库空间失败时的错误信息，否则为 None）
+        """
+        vector_before = disk_usage(self.vector_manager.db_path)
+        sqlite_before = sqlite_usage(self.sql_manager.db_path)
+        found = self.find_orphans(batch_size)
+
+        deleted_texts = 0
+        compact_error = None
+        skipped = {name: 0 for name in found['orphans']}
+        if not dry_run:
+            try:
+                for name, vector_ids in found['orphans'].items():
+                    collection = self.vector_manager.collections[name]
+                    for i in range(0, len(vector_ids), batch_size):
+                        batch = vector_ids[i:i + batch_size]
+                        orphaned = self._still_orphaned(collection, batch)
+                        skipped[name] += len(batch) - len(orphaned)
+                        if orphaned:
+                            collection.delete(ids=orphaned)
+            finally:
+                self.vector_manager.mark_changed()
+            with self.sql_manager.transaction() as conn:
+                deleted_texts = self.sql_manager.text_store.delete_unreferenced(conn)
+            if compact:
+                # 孤立向量已经删除，回收空间失败时只记录错误，仍然返回清理结果
+                try:
+                    self.vector_manager.compact()
+                except RuntimeError as e:
+                    compact_error = str(e)
+            if vacuum:
+                self.sql_manager.vacuum()
+
+        return {
+            'papers': len(found['paper_ids']),
+            'scanned': found['scanned'],
+            'orphans': {name: len(ids) for name, ids in found['orphans'].items()},
+            'papers_without_vectors': found['papers_without_vectors'],
+            'skipped': skipped,
+            'deleted_texts': deleted_texts,
+            'vector_bytes': (vector_before, disk_usage(self.vector_manager.db_path)),
+            'sqlite_bytes': (sqlite_before, sqlite_usage(self.sql_manager.db_path)),
+            'compact_error': compact_error,
+        }
+
+    def _still_orphaned(self, collection, vector_ids: Sequence[str]) -> List[str]:
+        """删除前重新核对一批孤立向量
+
+        扫描使用的是开始时的论文ID快照，扫描期间导入的论文（先写 SQLite 再写向量）
+        的向量会被误判为孤立。这里重新读取这些向量当前的 paper_id 并查询 SQLite，
+        只返回仍然没有对应论文的向量ID。
+        """
+        current = collection.get(ids=list(vector_ids), include=["metadatas"])
+        paper_ids = [(metadata or {}).get("paper_id") for metadata in current["metadatas"]]
+        existing = self.sql_manager.existing_paper_ids(paper_id for paper_id in paper_ids if paper_id is not None)
+        return [vector_id for vector_id, paper_id in zip(current["ids"], paper_ids) if paper_id not in existing]
@@ -0,0 +1,86 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+
+class RecordCache:
+    """已解析论文记录的进程内 LRU 缓存
+
+    缓存的是解析过 JSON 字段的元数据记录（不含全文），命中时既省去 SQL 查询，
+    也省去 json.loads。每次数据库写入后调用 invalidate() 使代数加一并清空缓存；
+    读取数据库前记下代数，写回时代数已变化的结果会被丢弃，避免并发写入时缓存旧数据。
+    """
+
+    # 需要复制的派生列表字段，防止调用方修改影响缓存
+    LIST_FIELDS = ('authors_list', 'keywords_list', 'contributions_list')
+
+    def __init__(self, maxsize: int = 2048):
+        """
+        Args:
+            maxsize: 最多缓存的记录数，0 表示禁用缓存
+        """
+        self.maxsize = maxsize
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self._records: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, ids: Sequence[int]) -> Tuple[Dict[int, Dict[str, Any]], List[int]]:
+        """批量查找
+
+        Returns:
+            (命中的 id -> 记录副本, 未命中的 id 列表)
+        """
+        found = {}
+        missing = []
+        with self._lock:
+            for paper_id in ids:
+                record = self._records.get(paper_id)
+                if record is None:
+                    missing.append(paper_id)
+                else:
+                    self._records.move_to_end(paper_id)
+                    found[paper_id] = self.copy(record)
+            self.hits += len(found)
+            self.misses += len(missing)
+        return found, missing
+
+    def put_many(self, records: Iterable[Dict[str, Any]], generation: int):
+        """写入记录；generation 与当前代数不一致（期间发生过写入）时忽略"""
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            if generation != self.generation:
+                return
+            for record in records:
+                self._records[record['id']] = self.copy(record)
+                self._records.move_to_end(record['id'])
+            while len(self._records) > self.maxsize:
+                self._records.popitem(last=False)
+
+    def invalidate(self):
+        """数据已变化：代数加一并清空缓存"""
+        with self._lock:
+            self.generation += 1
+            self._records.clear()
+
+    def info(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'size': len(self._records),
+                'maxsize': self.maxsize,
+                'generation': self.generation,
+            }
+
+    @classmethod
+    def copy(cls, record: Dict[str, Any]) -> Dict[str, Any]:
+        result = dict(record)
+        for name in cls.LIST_FIELDS:
+            if name in result:
+                result[name] = list(result[name])
+        return result
@@ -1,25 +1,274 @@
 import sqlite3
+import threading
+import weakref
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Callable, Iterable, Iterator, Sequence, Set, Tuple
 from datetime import datetime
 from scripts.analyze_papers import ArticleMetadata
-import hashlib
+from .text_store import TextStore
+from .fingerprint import FileFingerprinter
+from .record_cache import RecordCache
 import json
+import re
+
+# 默认连接参数：WAL 允许写入时并发读取
+DEFAULT_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",      # WAL 下 NORMAL 已保证崩溃一致性
+    "cache_size": -64000,         # 负数单位为 KB，约 64MB
+    "mmap_size": 268435456,       # 256MB
+    "temp_store": "MEMORY",
+    "foreign_keys": "ON",
+}
+
+# papers 表中可写入的列（id 和时间戳由数据库生成）
+PAPER_FIELDS = (
+    'title', 'authors', 'authors_json', 'year', 'venue', 'abstract', 'keywords',
+    'contributions', 'ai_summary', 'raw_text', 'markdown_text', 'pdf_path', 'pdf_hash',
+)
+
+# 大文本字段：压缩后存放在 text_blobs 表，papers 表只保存 <字段>_hash
+TEXT_FIELDS = ('raw_text', 'markdown_text')
+
+# 实际写入 papers 表的列
+INSERT_COLUMNS = tuple(
+    name for name in PAPER_FIELDS if name not in TEXT_FIELDS
+) + tuple(f"{name}_hash" for name in TEXT_FIELDS)
+
+# 不含大文本字段的元数据列，用于搜索结果等只需要元数据的场景
+METADATA_COLUMNS = ('id',) + tuple(
+    name for name in PAPER_FIELDS if name not in TEXT_FIELDS
+) + ('chunk_count', 'created_at', 'updated_at')
+
+ALL_COLUMNS = METADATA_COLUMNS + TEXT_FIELDS
+
+# 记录缓存保存的列：元数据 + 大文本哈希（全文按需从压缩存储读取）
+CACHED_COLUMNS = METADATA_COLUMNS + tuple(f"{name}_hash" for name in TEXT_FIELDS)
+
+# JSON 列 -> 解析后的字段
+JSON_FIELDS = {
+    'authors_json': 'authors_list',
+    'keywords': 'keywords_list',
+    'contributions': 'contributions_list',
+}
+
+# paper_analysis 表中的字段（与 PaperExtractor.extract_info 的输出对应）
+ANALYSIS_TEXT_FIELDS = ('research_question', 'methodology', 'future_work')
+ANALYSIS_LIST_FIELDS = ('main_findings', 'key_contributions', 'limitations', 'keywords')  # 以JSON数组存储
+ANALYSIS_COLUMNS = ANALYSIS_TEXT_FIELDS + ANALYSIS_LIST_FIELDS + ('extra_json',)
+
+# 修改后需要写入变更日志的 papers 列（chunk_count 由向量索引回写，单独记为 index 变更，见 _log_chunk_counts）
+CHANGE_LOG_COLUMNS = tuple(
+    name for name in INSERT_COLUMNS if name not in ('pdf_path', 'pdf_hash')
+)
+
+
+def _stats_delta(row: str, sign: str) -> str:
+    """生成统计表增量更新语句（用于触发器）
+
+    已分析数（analyzed）由 paper_analysis 表上的触发器维护，见 _count_analyses。
+    """
+    return f"""
+        UPDATE library_stats SET value = value {sign} 1 WHERE name = 'papers';
+        UPDATE library_stats SET value = value {sign} {row}.chunk_count WHERE name = 'chunks';
+        INSERT INTO library_year_stats (year, count) VALUES (COALESCE({row}.year, 0), {sign}1)
+            ON CONFLICT(year) DO UPDATE SET count = count {sign} 1;
+    """
+
+
+# bm25 列权重：title, authors, abstract, keywords, text
+FTS_WEIGHTS = (10.0, 2.0, 5.0, 5.0, 1.0)
+
+
+def _close_quietly(conn: sqlite3.Connection):
+    try:
+        conn.close()
+    except sqlite3.ProgrammingError:
+        pass
+
+
+class _ThreadConnection:
+    """线程本地保存的连接；线程退出后 thread-local 被回收，连接随之关闭"""
+    
+    __slots__ = ('conn', '__weakref__')
+    
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        weakref.finalize(self, _close_quietly, conn)
+
+
+class ConnectionPool:
+    """按线程复用的 SQLite 连接池
+
+    每个线程第一次访问时创建连接并应用 PRAGMA，之后一直复用，
+    避免每条语句都重新 connect。连接只由线程本地存储持有，线程退出时自动关闭
+    （Streamlit 每次交互都在新线程中运行脚本，不能让连接一直留在池里）。
+    """
+    
+    def __init__(self, db_path: Path, pragmas: Optional[Dict[str, Any]] = None,
+                 timeout: float = 30.0):
+        self.db_path = db_path
+        self.pragmas = dict(DEFAULT_PRAGMAS)
+        if pragmas:
+            self.pragmas.update(pragmas)
+        self.timeout = timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # 只保存弱引用，用于 close_all 和统计打开的连接数
+        self._connections: "weakref.WeakSet[_ThreadConnection]" = weakref.WeakSet()
+        # 本连接池内的事务产生写入后调用（用于缓存失效）
+        self.write_listeners: List[Callable[[], None]] = []
+    
+    def connection(self) -> sqlite3.Connection:
+        """获取当前线程的连接"""
+        holder = getattr(self._local, 'holder', None)
+        if holder is None:
+            conn = sqlite3.connect(self.db_path, timeout=self.timeout, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            for name, value in self.pragmas.items():
+                conn.execute(f"PRAGMA {name} = {value}")
+            holder = _ThreadConnection(conn)
+            self._local.holder = holder
+            self._local.depth = 0
+            self._local.data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+            with self._lock:
+                self._connections.add(holder)
+        return holder.conn
+    
+    def open_connections(self) -> int:
+        """当前仍打开的连接数（每个存活且访问过连接池的线程一个）"""
+        with self._lock:
+            return len(self._connections)
+    
+    @contextmanager
+    def transaction(self, notify: bool = True):
+        """在当前线程连接上开启事务，嵌套调用只在最外层提交
+        
+        Args:
+            notify: 提交后是否通知 write_listeners；只写辅助表（如文件指纹缓存）、
+                    不影响论文记录的事务传 False，避免无谓地清空记录缓存（以最外层为准）
+        """
+        conn = self.connection()
+        if self._local.depth == 0:
+            self._local.changes = conn.total_changes
+            self._local.notify = notify
+        self._local.depth += 1
+        try:
+            yield conn
+        except BaseException:
+            self._local.depth -= 1
+            if self._local.depth == 0:
+                conn.rollback()
+                self._notify_write(conn)
+            raise
+        else:
+            self._local.depth -= 1
+            if self._local.depth == 0:
+                conn.commit()
+                self._notify_write(conn)
+    
+    def _notify_write(self, conn: sqlite3.Connection):
+        # 回滚也通知：事务内读到的未提交数据可能已进入缓存
+        if self._local.notify and conn.total_changes != self._local.changes:
+            for listener in self.write_listeners:
+                listener()
+    
+    def external_changes(self) -> bool:
+        """自上次检查以来，其他连接（其他线程或进程）是否提交过写入"""
+        conn = self.connection()
+        version = conn.execute("PRAGMA data_version").fetchone()[0]
+        changed = version != self._local.data_version
+        self._local.data_version = version
+        return changed
+    
+    def close_all(self):
+        """关闭所有线程的连接"""
+        with self._lock:
+            holders = list(self._connections)
+            self._connections = weakref.WeakSet()
+        for holder in holders:
+            _close_quietly(holder.conn)
+        self._local = threading.local()
+
 
 class SQLManager:
-    def __init__(self, db_path: str):
+    def __init__(self, db_path: str, pragmas: Optional[Dict[str, Any]] = None, cache_size: int = 2048):
+        """
+        Args:
+            db_path: 数据库路径
+            pragmas: 覆盖默认 PRAGMA
+            cache_size: 论文记录缓存条数，0 表示禁用
+        """
         self.db_path = Path(db_path)
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.pool = ConnectionPool(self.db_path, pragmas)
+        self.text_store = TextStore()
+        self.fingerprints = FileFingerprinter(self.pool)
+        self.cache = RecordCache(cache_size)
+        self.pool.write_listeners.append(self.cache.invalidate)
         self.init_database()
     
-    def get_connection(self):
-        return sqlite3.connect(self.db_path)
+    def get_connection(self) -> sqlite3.Connection:
+        """获取当前线程复用的连接（不要手动 close）"""
+        return self.pool.connection()
+    
+    def transaction(self):
+        """事务上下文，正常退出时提交，异常时回滚"""
+        return self.pool.transaction()
+    
+    def close(self):
+        """关闭连接池"""
+        self.pool.close_all()
     
     def init_database(self):
-        """初始化数据库表"""
+        """初始化数据库：按 PRAGMA user_version 依次执行尚未执行的迁移"""
         conn = self.get_connection()
-        cursor = conn.cursor()
+        migrations = self._migrations()
         
+        with self.transaction():
+            # 显式开启写事务：表结构与版本号一起提交，多个进程同时启动时只有一个执行迁移
+            conn.execute("BEGIN IMMEDIATE")
+            cursor = conn.cursor()
+            version = cursor.execute("PRAGMA user_version").fetchone()[0]
+            if version > len(migrations):
+                raise RuntimeError(f"数据库版本 ({version}) 高于当前程序支持的版本 ({len(migrations)})")
+            
+            for target, migrate in enumerate(migrations[version:], version + 1):
+                migrate(cursor)
+                cursor.execute(f"PRAGMA user_version = {target}")
+        
+        self.fts_enabled = self._table_exists('papers_fts')
+    
+    @property
+    def schema_version(self) -> int:
+        return self.get_connection().execute("PRAGMA user_version").fetchone()[0]
+    
+    def _migrations(self) -> List[Callable[[sqlite3.Cursor], None]]:
+        """按顺序排列的迁移，第 n 个迁移把 user_version 升到 n
+        
+        只能在末尾追加，已发布的迁移不要修改。
+        """
+        return [
+            self._migrate_base_schema,      # 1: 引入版本号之前的全部表结构
+            self._migrate_typed_analysis,   # 2: paper_analysis 拆分为类型化的列
+            self._create_change_log,        # 3: 变更日志与同步检查点
+            self._log_chunk_counts,         # 4: chunk_count 变化记入变更日志
+            self._count_analyses,           # 5: 已分析数改为按 paper_analysis 统计
+            self._index_created_at,         # 6: 按添加时间倒序遍历的索引
+        ]
+    
+    def _table_exists(self, name: str) -> bool:
+        return self.get_connection().execute(
+            "SELECT 1 FROM sqlite_master WHERE name = ?", (name,)
+        ).fetchone() is not None
+    
+    def _migrate_base_schema(self, cursor: sqlite3.Cursor):
+        """引入版本号之前的表结构
+        
+        旧数据库的 user_version 都是 0，但可能处于之前任一版本的结构，
+        因此这里的每一步都需要可重复执行。
+        """
         # 论文表
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS papers (
@@ -32,57 +281,282 @@ class SQLManager:
                 keywords TEXT,
                 contributions TEXT,
                 ai_summary TEXT,
+                authors_json TEXT,
+                raw_text_hash TEXT,
+                markdown_text_hash TEXT,
                 pdf_path TEXT NOT NULL,
                 pdf_hash TEXT UNIQUE,
+                chunk_count INTEGER NOT NULL DEFAULT 0,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
         """)
         
+        # 补齐旧数据库缺少的列
+        existing = {row[1] for row in cursor.execute("PRAGMA table_info(papers)")}
+        for name in ('authors_json', 'raw_text_hash', 'markdown_text_hash'):
+            if name not in existing:
+                cursor.execute(f"ALTER TABLE papers ADD COLUMN {name} TEXT")
+        if 'chunk_count' not in existing:
+            cursor.execute("ALTER TABLE papers ADD COLUMN chunk_count INTEGER NOT NULL DEFAULT 0")
+        
         # 创建索引
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_papers_title ON papers(title)")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_papers_year ON papers(year)")
         
-        conn.commit()
-        conn.close()
+        self._create_fts_index(cursor, 'raw_text' in existing)
+        self._create_stats_tables(cursor)
+        
+        # 压缩文本存储；旧版本把全文直接存在 papers 表中，迁移过去
+        TextStore.create_table(cursor)
+        FileFingerprinter.create_table(cursor)
+        if 'raw_text' in existing:
+            self._migrate_inline_texts(cursor)
+        
+        # 论文分析结果表
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS paper_analysis (
+                paper_id INTEGER PRIMARY KEY REFERENCES papers(id) ON DELETE CASCADE,
+                analysis_json TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
     
-    def add_paper(self, pdf_path: str, meta: ArticleMetadata) -> int:
-        """添加论文"""
-        pdf_hash = self._compute_file_hash(pdf_path)
+    def _migrate_typed_analysis(self, cursor: sqlite3.Cursor):
+        """paper_analysis 从单个 JSON 列改为类型化的列，并记录模型与提示词版本"""
+        cursor.execute("""
+            CREATE TABLE paper_analysis_new (
+                paper_id INTEGER PRIMARY KEY REFERENCES papers(id) ON DELETE CASCADE,
+                research_question TEXT,
+                methodology TEXT,
+                main_findings TEXT,
+                key_contributions TEXT,
+                limitations TEXT,
+                future_work TEXT,
+                keywords TEXT,
+                extra_json TEXT,
+                model TEXT,
+                prompt_version TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
         
-        # 序列化作者列表
-        authors_json = json.dumps([a.dict() for a in meta.authors], ensure_ascii=False) if meta.authors else None
+        rows = cursor.execute("SELECT paper_id, analysis_json, created_at, updated_at FROM paper_analysis").fetchall()
+        cursor.executemany(
+            f"""INSERT INTO paper_analysis_new
+                (paper_id, {', '.join(ANALYSIS_COLUMNS)}, model, prompt_version, created_at, updated_at)
+                VALUES (?, {', '.join('?' for _ in ANALYSIS_COLUMNS)}, NULL, NULL, ?, ?)""",
+            [(row['paper_id'], *self._analysis_values(json.loads(row['analysis_json'])),
+              row['created_at'], row['updated_at']) for row in rows]
+        )
         
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        cursor.execute("DROP TABLE paper_analysis")
+        cursor.execute("ALTER TABLE paper_analysis_new RENAME TO paper_analysis")
+        cursor.execute("CREATE INDEX idx_analysis_version ON paper_analysis(model, prompt_version)")
+        cursor.execute("CREATE INDEX idx_analysis_updated ON paper_analysis(updated_at)")
+    
+    def _create_change_log(self, cursor: sqlite3.Cursor):
+        """只追加的变更日志：触发器记录 papers / paper_analysis 的增删改，
+        派生索引（向量库等）按检查点增量消费，不需要全量扫描
+        """
+        cursor.execute("""
+            CREATE TABLE paper_changes (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                paper_id INTEGER NOT NULL,
+                entity TEXT NOT NULL,       -- paper / analysis / index（chunk_count 回写）
+                op TEXT NOT NULL,           -- insert / update / delete
+                changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE sync_checkpoints (
+                consumer TEXT PRIMARY KEY,
+                seq INTEGER NOT NULL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+
+        for table, entity, key in (('papers', 'paper', 'id'), ('paper_analysis', 'analysis', 'paper_id')):
+            watched = ', '.join(CHANGE_LOG_COLUMNS) if table == 'papers' else ', '.join(ANALYSIS_COLUMNS)
+            for op, event, row in (('insert', 'INSERT', 'new'), ('update', f'UPDATE OF {watched}', 'new'),
+                                   ('delete', 'DELETE', 'old')):
+                cursor.execute(f"""
+                    CREATE TRIGGER {table}_log_{op} AFTER {event} ON {table} BEGIN
+                        INSERT INTO paper_changes (paper_id, entity, op) VALUES ({row}.{key}, '{entity}', '{op}');
+                    END
+                """)
+
+    def _log_chunk_counts(self, cursor: sqlite3.Cursor):
+        """向量索引回写 chunk_count 时记一条 entity = 'index' 的变更
+        
+        VectorIndexSync 只处理 paper / analysis 变更，不会因此重建向量；
+        change_epoch 随之变化，缓存的检索结果中的 chunk_count 不会过期。
+        """
+        cursor.execute("""
+            CREATE TRIGGER papers_log_chunk_count AFTER UPDATE OF chunk_count ON papers
+            WHEN old.chunk_count IS NOT new.chunk_count BEGIN
+                INSERT INTO paper_changes (paper_id, entity, op) VALUES (new.id, 'index', 'update');
+            END
+        """)
+    
+    def _count_analyses(self, cursor: sqlite3.Cursor):
+        """已分析数改为统计 paper_analysis 中有分析结果的论文
+        
+        与论文列表（get_analyses）和待分析集合（get_unanalyzed_ids）保持一致；
+        旧的 papers 触发器按 ai_summary 计数，删除后重建，并重新统计。
+        """
+        for op in ('insert', 'delete', 'update'):
+            cursor.execute(f"DROP TRIGGER IF EXISTS papers_stats_{op}")
+        self._create_stats_tables(cursor)
+        
+        # 删除论文时分析结果随外键级联删除，同样会触发 analysis_stats_delete
+        for op, event, sign in (('insert', 'INSERT', '+'), ('delete', 'DELETE', '-')):
+            cursor.execute(f"""
+                CREATE TRIGGER analysis_stats_{op} AFTER {event} ON paper_analysis BEGIN
+                    UPDATE library_stats SET value = value {sign} 1 WHERE name = 'analyzed';
+                END
+            """)
+        self._rebuild_stats(cursor)
+    
+    def _index_created_at(self, cursor: sqlite3.Cursor):
+        """按添加时间倒序遍历论文（iter_papers(newest_first=True)）时不需要排序"""
+        cursor.execute("CREATE INDEX idx_papers_created ON papers(created_at DESC, id DESC)")
+    
+    def _create_fts_index(self, cursor: sqlite3.Cursor, inline_text: bool = False) -> bool:
+        """创建 FTS5 全文索引，并用触发器与 papers 表保持同步
+        
+        正文（text 列）保存在压缩存储中，触发器读不到，由 add_papers_bulk 写入。
+        
+        Args:
+            inline_text: papers 表是否还有旧版本的 raw_text 列（用于首次建立索引）
+        
+        Returns:
+            当前 SQLite 是否支持 FTS5
+        """
+        exists = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'papers_fts'"
+        ).fetchone()
         
         try:
             cursor.execute("""
-                INSERT INTO papers (title, authors, year, venue, abstract, 
-                                  keywords, contributions, ai_summary, pdf_path, pdf_hash)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                meta.title,
-                authors_json,
-                meta.year if meta.year > 0 else None,
-                meta.venue,
-                meta.abstract, 
-                json.dumps(meta.keywords, ensure_ascii=False) if meta.keywords else None,
-                json.dumps(meta.contributions, ensure_ascii=False) if meta.contributions else None,
-                meta.ai_summary, 
-                pdf_path, 
-                pdf_hash
-            ))
+                CREATE VIRTUAL TABLE IF NOT EXISTS papers_fts USING fts5(
+                    title, authors, abstract, keywords, text,
+                    tokenize = 'unicode61 remove_diacritics 2'
+                )
+            """)
+        except sqlite3.OperationalError:
+            # 编译时未启用 FTS5
+            return False
+        
+        # 旧版本的触发器引用了 raw_text 列，重新创建
+        cursor.execute("DROP TRIGGER IF EXISTS papers_fts_insert")
+        cursor.execute("DROP TRIGGER IF EXISTS papers_fts_update")
+        
+        cursor.execute("""
+            CREATE TRIGGER papers_fts_insert AFTER INSERT ON papers BEGIN
+                INSERT INTO papers_fts (rowid, title, authors, abstract, keywords)
+                VALUES (new.id, new.title, new.authors, new.abstract, new.keywords);
+            END
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS papers_fts_delete AFTER DELETE ON papers BEGIN
+                DELETE FROM papers_fts WHERE rowid = old.id;
+            END
+        """)
+        cursor.execute("""
+            CREATE TRIGGER papers_fts_update
+            AFTER UPDATE OF title, authors, abstract, keywords ON papers BEGIN
+                UPDATE papers_fts
+                SET title = new.title, authors = new.authors, abstract = new.abstract,
+                    keywords = new.keywords
+                WHERE rowid = new.id;
+            END
+        """)
+        
+        # 首次创建时为已有论文建立索引
+        if not exists:
+            cursor.execute(f"""
+                INSERT INTO papers_fts (rowid, title, authors, abstract, keywords, text)
+                SELECT id, title, authors, abstract, keywords, {'raw_text' if inline_text else 'NULL'} FROM papers
+            """)
+        
+        return True
+    
+    def _migrate_inline_texts(self, cursor: sqlite3.Cursor, batch_size: int = 200):
+        """把旧版本 papers 表中的 raw_text / markdown_text 移到压缩存储"""
+        conn = cursor.connection
+        while True:
+            rows = cursor.execute("""
+                SELECT id, raw_text, markdown_text FROM papers
+                WHERE raw_text IS NOT NULL OR markdown_text IS NOT NULL
+                LIMIT ?
+            """, (batch_size,)).fetchall()
+            if not rows:
+                break
             
-            paper_id = cursor.lastrowid
-            conn.commit()
-            return paper_id
-        except sqlite3.IntegrityError:
-            # 论文已存在
-            cursor.execute("SELECT id FROM papers WHERE pdf_hash = ?", (pdf_hash,))
-            return cursor.fetchone()[0]
-        finally:
-            conn.close()
+            raw_hashes = self.text_store.put_many(conn, [row['raw_text'] for row in rows])
+            markdown_hashes = self.text_store.put_many(conn, [row['markdown_text'] for row in rows])
+            cursor.executemany("""
+                UPDATE papers
+                SET raw_text_hash = ?, markdown_text_hash = ?, raw_text = NULL, markdown_text = NULL
+                WHERE id = ?
+            """, [(raw, markdown, row['id']) for raw, markdown, row in zip(raw_hashes, markdown_hashes, rows)])
+    
+    def _create_stats_tables(self, cursor: sqlite3.Cursor):
+        """创建统计表，由触发器随 papers 的增删改增量维护（统计数据在迁移 5 中重建）"""
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS library_stats (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        # year = 0 表示年份未知
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS library_year_stats (
+                year INTEGER PRIMARY KEY,
+                count INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS papers_stats_insert AFTER INSERT ON papers BEGIN
+                {_stats_delta('new', '+')}
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS papers_stats_delete AFTER DELETE ON papers BEGIN
+                {_stats_delta('old', '-')}
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS papers_stats_update
+            AFTER UPDATE OF year, chunk_count ON papers BEGIN
+                {_stats_delta('old', '-')}
+                {_stats_delta('new', '+')}
+            END
+        """)
+    
+    def _rebuild_stats(self, cursor: sqlite3.Cursor):
+        """用聚合查询重建统计表"""
+        cursor.execute("DELETE FROM library_stats")
+        cursor.execute("DELETE FROM library_year_stats")
+        cursor.execute("""
+            INSERT INTO library_stats (name, value)
+            SELECT 'papers', COUNT(*) FROM papers
+            UNION ALL SELECT 'analyzed', COUNT(*) FROM paper_analysis
+            UNION ALL SELECT 'chunks', COALESCE(SUM(chunk_count), 0) FROM papers
+        """)
+        cursor.execute("""
+            INSERT INTO library_year_stats (year, count)
+            SELECT COALESCE(year, 0), COUNT(*) FROM papers GROUP BY COALESCE(year, 0)
+        """)
+    
+    def add_paper(self, pdf_path: str, meta: ArticleMetadata) -> int:
+        """添加论文，已存在（pdf_hash 相同）时返回已有ID"""
+        record = self.build_record(pdf_path, meta)
+        return self.add_papers_bulk([record])[record['pdf_path']]
     
     def add_paper_from_metadata(self, metadata, pdf_path: str, 
                                 raw_text: Optional[str] = None, 
@@ -95,86 +569,659 @@ class SQLManager:
             raw_text: 原始文本
             markdown_text: Markdown文本
         """
-        # 处理作者列表
-        authors_str = None
-        authors_json = None
-        if hasattr(metadata, 'authors') and metadata.authors:
-            # 生成简单的作者字符串
-            authors_str = ', '.join([a.name if hasattr(a, 'name') else str(a) for a in metadata.authors])
-            # 保存完整的JSON
-            authors_json = json.dumps(
-                [{'name': a.name, 'affiliation': a.affiliation} if hasattr(a, 'name') 
-                 else {'name': str(a), 'affiliation': ''} for a in metadata.authors],
-                ensure_ascii=False
+        record = self.build_record(pdf_path, metadata, raw_text=raw_text, markdown_text=markdown_text)
+        return self.add_papers_bulk([record])[record['pdf_path']]
+    
+    def build_record(self, pdf_path: str, metadata=None, **fields) -> Dict[str, Any]:
+        """构造 add_papers_bulk 使用的论文记录
+        
+        Args:
+            pdf_path: PDF文件路径
+            metadata: ArticleMetadata / ParsedPaper 对象或字典，可为空
+            **fields: 直接指定的列值（raw_text、markdown_text、pdf_hash 等），优先级高于 metadata
+        """
+        if isinstance(metadata, dict):
+            source = dict(metadata)
+        elif metadata is not None:
+            source = {name: getattr(metadata, name) for name in PAPER_FIELDS if hasattr(metadata, name)}
+        else:
+            source = {}
+        source.update({k: v for k, v in fields.items() if v is not None})
+        
+        record = {name: source.get(name) for name in PAPER_FIELDS}
+        record['title'] = record['title'] or Path(pdf_path).stem
+        record['pdf_path'] = str(pdf_path)
+        
+        # 处理作者列表：authors 存可读字符串，authors_json 存完整信息
+        authors = source.get('authors')
+        if isinstance(authors, (list, tuple)):
+            record['authors'] = ', '.join(a.name if hasattr(a, 'name') else str(a) for a in authors) or None
+            if record['authors_json'] is None and authors:
+                record['authors_json'] = json.dumps(
+                    [{'name': a.name, 'affiliation': a.affiliation} if hasattr(a, 'name')
+                     else {'name': str(a), 'affiliation': ''} for a in authors],
+                    ensure_ascii=False
+                )
+        
+        for name in ('keywords', 'contributions'):
+            if isinstance(record[name], (list, tuple)):
+                record[name] = json.dumps(list(record[name]), ensure_ascii=False) if record[name] else None
+        
+        if not record['year'] or record['year'] <= 0:
+            record['year'] = None
+        
+        return record
+    
+    def add_papers_bulk(self, records: List[Dict[str, Any]], batch_size: int = 500) -> Dict[str, int]:
+        """批量添加论文（单个事务）
+        
+        先按 pdf_hash 批量查重，只插入新论文，整批只提交一次。
+        
+        Args:
+            records: build_record 生成的记录列表（缺少 pdf_hash 时按文件计算）
+            batch_size: 每次 executemany / IN 查询的行数
+            
+        Returns:
+            pdf_path -> paper_id 映射（重复论文映射到已有ID）
+        """
+        rows = [{name: record.get(name) for name in PAPER_FIELDS} for record in records]
+        
+        # 缺少 pdf_hash 的记录批量计算指纹（命中缓存时不读文件）
+        missing = [row['pdf_path'] for row in rows if not row['pdf_hash']]
+        if missing:
+            fingerprints = self.fingerprints.fingerprint_many(missing)
+            for row in rows:
+                row['pdf_hash'] = row['pdf_hash'] or fingerprints[row['pdf_path']]
+        
+        hashes = list(dict.fromkeys(row['pdf_hash'] for row in rows))
+        columns = ', '.join(INSERT_COLUMNS)
+        placeholders = ', '.join('?' for _ in INSERT_COLUMNS)
+        
+        with self.transaction() as conn:
+            ids = self._ids_by_hash(conn, hashes, batch_size)
+            
+            # 同一批次内相同 hash 只插入第一条
+            pending = {}
+            for row in rows:
+                if row['pdf_hash'] not in ids and row['pdf_hash'] not in pending:
+                    pending[row['pdf_hash']] = row
+            new_rows = list(pending.values())
+            
+            # 大文本写入压缩存储（相同内容只存一份）
+            for name in TEXT_FIELDS:
+                text_hashes = self.text_store.put_many(conn, [row[name] for row in new_rows])
+                for row, text_hash in zip(new_rows, text_hashes):
+                    row[f"{name}_hash"] = text_hash
+            
+            values = [tuple(row[name] for name in INSERT_COLUMNS) for row in new_rows]
+            for i in range(0, len(values), batch_size):
+                conn.executemany(
+                    f"INSERT INTO papers ({columns}) VALUES ({placeholders})",
+                    values[i:i + batch_size]
+                )
+            
+            new_ids = self._ids_by_hash(conn, list(pending), batch_size)
+            ids.update(new_ids)
+            
+            if self.fts_enabled:
+                conn.executemany(
+                    "UPDATE papers_fts SET text = ? WHERE rowid = ?",
+                    [(row['raw_text'], new_ids[row['pdf_hash']]) for row in new_rows if row['raw_text']]
+                )
+        
+        return {row['pdf_path']: ids[row['pdf_hash']] for row in rows}
+    
+    def _ids_by_hash(self, conn: sqlite3.Connection, hashes: List[str], batch_size: int = 500) -> Dict[str, int]:
+        """按 pdf_hash 批量查询论文ID"""
+        rows = self._select_in(conn, "SELECT pdf_hash, id FROM papers WHERE pdf_hash IN ({})", hashes, batch_size)
+        return {row['pdf_hash']: row['id'] for row in rows}
+    
+    def _select_in(self, conn: sqlite3.Connection, sql: str, values: Sequence[Any],
+                   batch_size: int = 500) -> Iterator[sqlite3.Row]:
+        """分批执行 IN (...) 查询，避免超过 SQLite 参数数量上限
+        
+        Args:
+            sql: 包含一个 {} 占位的查询语句，{} 会被替换为参数占位符
+            values: IN 列表的值
+        """
+        for i in range(0, len(values), batch_size):
+            batch = list(values[i:i + batch_size])
+            yield from conn.execute(sql.format(', '.join('?' for _ in batch)), batch)
+    
+    def get_paper(self, paper_id: int, columns: Optional[Sequence[str]] = None) -> Optional[Dict[str, Any]]:
+        """获取论文信息
+        
+        Args:
+            paper_id: 论文ID
+            columns: 需要的列，默认只取元数据列；需要全文时显式包含 raw_text / markdown_text
+        """
+        papers = self.get_papers([paper_id], columns)
+        return papers[0] if papers else None
+    
+    def get_all_papers(self) -> List[Dict[str, Any]]:
+        """获取所有论文（包含全文，大库请使用 list_papers / iter_papers）"""
+        ids = [row[0] for row in self.get_connection().execute("SELECT id FROM papers ORDER BY created_at DESC, id DESC")]
+        return self.get_papers(ids, ALL_COLUMNS)
+    
+    def get_papers(self, paper_ids: Sequence[int], columns: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+        """批量获取论文，按请求的ID顺序返回，不存在的ID被跳过
+        
+        元数据优先从记录缓存读取，只对未命中的ID执行一次 IN 查询；全文按需批量解压。
+        
+        Args:
+            paper_ids: 论文ID列表
+            columns: 需要的列，默认只取元数据列（不含全文）
+        """
+        ids = list(dict.fromkeys(paper_ids))
+        columns = METADATA_COLUMNS if columns is None else tuple(columns)
+        _, text_fields = self._projection(columns)
+        conn = self.get_connection()
+        records = self._cached_records(conn, ids)
+        
+        texts = {}
+        if text_fields:
+            texts = self.text_store.get_many(
+                conn, (records[i][f"{name}_hash"] for i in ids if i in records for name in text_fields)
             )
         
-        return self.add_paper(
-            title=metadata.title if hasattr(metadata, 'title') else '',
-            pdf_path=pdf_path,
-            authors=authors_str,
-            authors_json=authors_json,
-            year=metadata.year if hasattr(metadata, 'year') and metadata.year > 0 else None,
-            venue=metadata.venue if hasattr(metadata, 'venue') else None,
-            abstract=metadata.abstract if hasattr(metadata, 'abstract') else None,
-            keywords=metadata.keywords if hasattr(metadata, 'keywords') else None,
-            contributions=metadata.contributions if hasattr(metadata, 'contributions') else None,
-            ai_summary=metadata.ai_summary if hasattr(metadata, 'ai_summary') else None,
-            raw_text=raw_text,
-            markdown_text=markdown_text
-        )
+        papers = []
+        for paper_id in ids:
+            record = records.get(paper_id)
+            if record is None:
+                continue
+            paper = {name: record[name] for name in dict.fromkeys(('id',) + columns) if name not in TEXT_FIELDS}
+            for source, name in JSON_FIELDS.items():
+                if source in paper and name in record:
+                    paper[name] = record[name]
+            for name in text_fields:
+                paper[name] = texts.get(record[f"{name}_hash"])
+            papers.append(paper)
+        return papers
     
-    def get_paper(self, paper_id: int) -> Optional[Dict[str, Any]]:
-        """获取论文信息"""
+    def _cached_records(self, conn: sqlite3.Connection, ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """读取完整的元数据记录（CACHED_COLUMNS），未命中缓存的部分查库并写回缓存"""
+        if self.pool.external_changes():
+            self.cache.invalidate()
+        generation = self.cache.generation
+        records, missing = self.cache.get_many(ids)
+        if missing:
+            rows = self._select_in(conn, f"SELECT {', '.join(CACHED_COLUMNS)} FROM papers WHERE id IN ({{}})", missing)
+            fetched = [self._row_to_dict(row) for row in rows]
+            self.cache.put_many(fetched, generation)
+            records.update((record['id'], record) for record in fetched)
+        return records
+    
+    def cache_info(self) -> Dict[str, Any]:
+        """记录缓存的命中统计"""
+        return self.cache.info()
+    
+    def list_papers(
+        self,
+        columns: Optional[Sequence[str]] = None,
+        cursor: Optional[int] = None,
+        limit: int = 50
+    ) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """分页列出论文（按ID倒序，即最新添加的在前）
+        
+        Args:
+            columns: 需要的列，默认只取元数据列（不含全文）
+            cursor: 上一页返回的游标，None 表示第一页
+            limit: 每页数量
+            
+        Returns:
+            (论文列表, 下一页游标)，没有更多数据时游标为 None
+        """
+        projection, text_fields = self._projection(columns)
         conn = self.get_connection()
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
         
-        cursor.execute("SELECT * FROM papers WHERE id = ?", (paper_id,))
-        row = cursor.fetchone()
-        conn.close()
+        # 多取一行判断是否还有下一页
+        if cursor is None:
+            rows = conn.execute(
+                f"SELECT {projection} FROM papers ORDER BY id DESC LIMIT ?", (limit + 1,)
+            ).fetchall()
+        else:
+            rows = conn.execute(
+                f"SELECT {projection} FROM papers WHERE id < ? ORDER BY id DESC LIMIT ?", (cursor, limit + 1)
+            ).fetchall()
         
-        if row:
-            result = dict(row)
-            # 解析JSON字段
-            if result.get('authors_json'):
-                result['authors_list'] = json.loads(result['authors_json'])
-            if result.get('keywords'):
-                result['keywords_list'] = json.loads(result['keywords'])
-            if result.get('contributions'):
-                result['contributions_list'] = json.loads(result['contributions'])
-            return result
-        return None
+        papers = self._hydrate(conn, rows[:limit], text_fields)
+        next_cursor = papers[-1]['id'] if len(rows) > limit else None
+        return papers, next_cursor
     
-    def get_all_papers(self) -> List[Dict[str, Any]]:
-        """获取所有论文"""
+    def iter_papers(self, columns: Optional[Sequence[str]] = None, batch_size: int = 500,
+                    newest_first: bool = False) -> Iterator[Dict[str, Any]]:
+        """逐条遍历所有论文（按ID升序），用于重建索引、导出等批处理任务
+        
+        内部使用 fetchmany 分批读取，内存占用与论文总数无关。
+        
+        Args:
+            columns: 需要的列，默认只取元数据列（不含全文）
+            batch_size: 每次从游标读取的行数
+            newest_first: 按添加时间倒序（与 get_all_papers 相同），沿 idx_papers_created 索引读取，不需要排序
+        """
+        projection, text_fields = self._projection(columns)
         conn = self.get_connection()
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
+        order = "created_at DESC, id DESC" if newest_first else "id"
+        cursor = conn.execute(f"SELECT {projection} FROM papers ORDER BY {order}")
+        try:
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                # 全文按批解压
+                yield from self._hydrate(conn, rows, text_fields)
+        finally:
+            cursor.close()
+    
+    def _projection(self, columns: Optional[Sequence[str]]) -> Tuple[str, List[str]]:
+        """校验列名并生成 SELECT 列表（始终包含 id）
         
-        cursor.execute("SELECT * FROM papers ORDER BY created_at DESC")
-        rows = cursor.fetchall()
-        conn.close()
+        Returns:
+            (SELECT 列表, 需要从压缩存储读取的大文本字段)
+        """
+        if columns is None:
+            columns = METADATA_COLUMNS
+        
+        unknown = set(columns) - set(ALL_COLUMNS)
+        if unknown:
+            raise ValueError(f"未知的列: {', '.join(sorted(unknown))}")
+        
+        text_fields = list(dict.fromkeys(name for name in columns if name in TEXT_FIELDS))
+        selected = ('id',) + tuple(name for name in columns if name not in TEXT_FIELDS)
+        selected += tuple(f"{name}_hash" for name in text_fields)
+        return ', '.join(dict.fromkeys(selected)), text_fields
+    
+    def _hydrate(self, conn: sqlite3.Connection, rows: Sequence[sqlite3.Row],
+                 text_fields: Sequence[str] = ()) -> List[Dict[str, Any]]:
+        """行转字典；请求了大文本字段时批量解压"""
+        papers = [self._row_to_dict(row) for row in rows]
+        if text_fields:
+            texts = self.text_store.get_many(
+                conn, (paper[f"{name}_hash"] for paper in papers for name in text_fields)
+            )
+            for paper in papers:
+                for name in text_fields:
+                    paper[name] = texts.get(paper.pop(f"{name}_hash"))
+        return papers
+    
+    def _row_to_dict(self, row: sqlite3.Row) -> Dict[str, Any]:
+        """行转字典并解析JSON字段"""
+        result = dict(row)
+        for source, name in JSON_FIELDS.items():
+            if result.get(source):
+                result[name] = json.loads(result[source])
+        return result
+    
+    def save_paper_analysis(self, paper_id: int, analysis: Dict[str, Any],
+                            model: Optional[str] = None, prompt_version: Optional[str] = None):
+        """保存论文分析结果（PaperExtractor.extract_info 的输出）"""
+        self.save_analyses_bulk({paper_id: analysis}, model, prompt_version)
+    
+    def save_analyses_bulk(self, analyses: Dict[int, Dict[str, Any]],
+                           model: Optional[str] = None, prompt_version: Optional[str] = None):
+        """批量保存分析结果（单个事务），已存在的记录会被覆盖
+        
+        Args:
+            analyses: paper_id -> 分析结果
+            model: 生成分析结果的模型
+            prompt_version: 提示词版本（见 PaperExtractor.prompt_version）
+        """
+        columns = ANALYSIS_COLUMNS + ('model', 'prompt_version')
+        updates = ', '.join(f"{name} = excluded.{name}" for name in columns)
+        
+        with self.transaction() as conn:
+            conn.executemany(f"""
+                INSERT INTO paper_analysis (paper_id, {', '.join(columns)})
+                VALUES (?, {', '.join('?' for _ in columns)})
+                ON CONFLICT(paper_id) DO UPDATE SET {updates}, updated_at = CURRENT_TIMESTAMP
+            """, [
+                (paper_id, *self._analysis_values(analysis), model, prompt_version)
+                for paper_id, analysis in analyses.items()
+            ])
+    
+    def get_paper_analysis(self, paper_id: int) -> Optional[Dict[str, Any]]:
+        """获取论文分析结果"""
+        return self.get_analyses([paper_id]).get(paper_id)
+    
+    def get_analyses(self, paper_ids: Sequence[int]) -> Dict[int, Dict[str, Any]]:
+        """批量获取论文分析结果（单次 IN 查询）
+        
+        Returns:
+            paper_id -> 分析结果，按请求的ID顺序排列，没有分析结果的论文不包含在内
+        """
+        ids = list(dict.fromkeys(paper_ids))
+        rows = self._select_in(self.get_connection(), "SELECT * FROM paper_analysis WHERE paper_id IN ({})", ids)
+        analyses = {row['paper_id']: self._analysis_to_dict(row) for row in rows}
+        return {paper_id: analyses[paper_id] for paper_id in ids if paper_id in analyses}
+    
+    def get_unanalyzed_ids(self, model: Optional[str] = None, prompt_version: Optional[str] = None,
+                           limit: Optional[int] = None) -> List[int]:
+        """需要（重新）分析的论文ID
+        
+        没有分析结果的论文，以及指定 model / prompt_version 时结果版本不一致的论文。
+        """
+        conditions = ["a.paper_id IS NULL"]
+        params: List[Any] = []
+        if model is not None:
+            conditions.append("a.model IS NOT ?")
+            params.append(model)
+        if prompt_version is not None:
+            conditions.append("a.prompt_version IS NOT ?")
+            params.append(prompt_version)
+        
+        sql = f"""
+            SELECT p.id FROM papers p LEFT JOIN paper_analysis a ON a.paper_id = p.id
+            WHERE {' OR '.join(conditions)}
+            ORDER BY p.id
+        """
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        
+        return [row['id'] for row in self.get_connection().execute(sql, params)]
+    
+    def _analysis_values(self, analysis: Dict[str, Any]) -> Tuple:
+        """分析结果转为 ANALYSIS_COLUMNS 顺序的列值，未知字段放入 extra_json"""
+        values = []
+        for name in ANALYSIS_TEXT_FIELDS:
+            value = analysis.get(name) or None
+            values.append(value if value is None or isinstance(value, str) else json.dumps(value, ensure_ascii=False))
+        for name in ANALYSIS_LIST_FIELDS:
+            value = analysis.get(name)
+            values.append(json.dumps(value, ensure_ascii=False) if value is not None else None)
+        
+        known = ANALYSIS_TEXT_FIELDS + ANALYSIS_LIST_FIELDS + ('model', 'prompt_version', 'created_at', 'updated_at')
+        extra = {k: v for k, v in analysis.items() if k not in known}
+        values.append(json.dumps(extra, ensure_ascii=False) if extra else None)
+        return tuple(values)
+    
+    def _analysis_to_dict(self, row: sqlite3.Row) -> Dict[str, Any]:
+        """数据库行转为与 PaperExtractor.extract_info 相同结构的字典"""
+        analysis = json.loads(row['extra_json']) if row['extra_json'] else {}
+        for name in ANALYSIS_TEXT_FIELDS:
+            analysis[name] = row[name] or ""
+        for name in ANALYSIS_LIST_FIELDS:
+            analysis[name] = json.loads(row[name]) if row[name] else []
+        for name in ('model', 'prompt_version', 'created_at', 'updated_at'):
+            analysis[name] = row[name]
+        return analysis
+    
+    def set_chunk_counts(self, counts: Dict[int, int]):
+        """记录论文的向量分块数量（用于统计）
+        
+        Args:
+            counts: paper_id -> 分块数量
+        """
+        with self.transaction() as conn:
+            conn.executemany(
+                "UPDATE papers SET chunk_count = ? WHERE id = ?",
+                [(count, paper_id) for paper_id, count in counts.items()]
+            )
+    
+    def delete_papers(self, paper_ids: Sequence[int], batch_size: int = 500) -> int:
+        """删除论文，分析结果级联删除，不再被引用的全文一并清理
+        
+        删除会写入变更日志，向量索引同步时删除对应向量；
+        需要立即删除向量时使用 reconcile.delete_papers。
+        
+        Returns:
+            删除的论文数
+        """
+        ids = list(dict.fromkeys(paper_ids))
+        deleted = 0
+        with self.transaction() as conn:
+            for i in range(0, len(ids), batch_size):
+                batch = ids[i:i + batch_size]
+                deleted += conn.execute(
+                    f"DELETE FROM papers WHERE id IN ({', '.join('?' for _ in batch)})", batch
+                ).rowcount
+            if deleted:
+                self.text_store.delete_unreferenced(conn)
+        return deleted
+    
+    def delete_paper(self, paper_id: int) -> bool:
+        """删除单篇论文，返回是否存在"""
+        return self.delete_papers([paper_id]) > 0
+    
+    def paper_ids(self) -> List[int]:
+        """所有论文ID（只扫描主键）"""
+        return [row[0] for row in self.get_connection().execute("SELECT id FROM papers ORDER BY id")]
+    
+    def existing_paper_ids(self, paper_ids: Iterable[int]) -> Set[int]:
+        """给定ID中仍存在于 papers 表的ID（不经过记录缓存）"""
+        ids = list(dict.fromkeys(paper_ids))
+        return {row[0] for row in self._select_in(self.get_connection(), "SELECT id FROM papers WHERE id IN ({})", ids)}
+    
+    def vacuum(self):
+        """重写数据库文件回收空闲页，并截断 WAL 文件（大量删除后使用）"""
+        conn = self.get_connection()
+        conn.execute("VACUUM")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    
+    def get_library_stats(self) -> Dict[str, Any]:
+        """获取文献库统计信息（读取触发器维护的统计表，不扫描 papers）
+        
+        Returns:
+            papers: 论文总数
+            analyzed / unanalyzed: 已有/没有分析结果（paper_analysis）的论文数
+            chunks: 向量分块总数
+            by_year: 年份 -> 论文数（年份未知为 None）
+        """
+        conn = self.get_connection()
+        stats = {row['name']: row['value'] for row in conn.execute("SELECT name, value FROM library_stats")}
+        by_year = {
+            (row['year'] or None): row['count']
+            for row in conn.execute("SELECT year, count FROM library_year_stats WHERE count > 0 ORDER BY year")
+        }
+        
+        papers = stats.get('papers', 0)
+        analyzed = stats.get('analyzed', 0)
+        return {
+            'papers': papers,
+            'analyzed': analyzed,
+            'unanalyzed': papers - analyzed,
+            'chunks': stats.get('chunks', 0),
+            'by_year': by_year,
+        }
+    
+    def rebuild_stats(self):
+        """重新统计（统计表与实际数据不一致时使用）"""
+        with self.transaction() as conn:
+            self._rebuild_stats(conn.cursor())
+    
+    def search_keywords(self, query: str, limit: int = 10,
+                        year_from: Optional[int] = None, year_to: Optional[int] = None,
+                        authors: Optional[List[str]] = None, venue: Optional[str] = None,
+                        include_unknown_year: bool = True) -> List[Dict[str, Any]]:
+        """关键词搜索
+        
+        使用 FTS5 MATCH + bm25 排序，结果中 keyword_score 越大越相关；
+        SQLite 不支持 FTS5 时退化为 LIKE 匹配。
         
-        results = []
-        for row in rows:
-            result = dict(row)
-            # 解析JSON字段
-            if result.get('authors_json'):
-                result['authors_list'] = json.loads(result['authors_json'])
-            if result.get('keywords'):
-                result['keywords_list'] = json.loads(result['keywords'])
-            if result.get('contributions'):
-                result['contributions_list'] = json.loads(result['contributions'])
-            results.append(result)
-        return results
+        Args:
+            query: 查询文本
+            limit: 返回结果数量
+            year_from / year_to: 年份范围（包含边界）
+            authors: 作者列表，任意一位出现在作者字段中即可（子串匹配，可以只写姓）
+            venue: 会议/期刊（完全匹配）
+            include_unknown_year: 指定年份范围时是否保留年份未知的论文（默认保留，与旧版 advanced_search 相同）
+        """
+        # 只查出 ID 和分数，元数据走记录缓存
+        scores = dict(self.search_keyword_scores(query, limit, year_from, year_to, authors, venue,
+                                                 include_unknown_year))
+        papers = self.get_papers(list(scores))
+        for paper in papers:
+            paper['keyword_score'] = scores[paper['id']]
+        return papers
+    
+    def search_keyword_scores(self, query: str, limit: int = 10,
+                              year_from: Optional[int] = None, year_to: Optional[int] = None,
+                              authors: Optional[List[str]] = None, venue: Optional[str] = None,
+                              include_unknown_year: bool = True) -> List[Tuple[int, float]]:
+        """关键词搜索，只返回按相关度降序的 [(论文ID, keyword_score), ...]（参数同 search_keywords）"""
+        # 提取查询关键词
+        keywords = list(dict.fromkeys(k.lower() for k in re.findall(r'\w+', query) if len(k) > 2))
+        if not keywords:
+            return []
+        
+        conn = self.get_connection()
+        filters, filter_params = self._paper_filters(year_from, year_to, authors, venue, include_unknown_year)
+        
+        if self.fts_enabled:
+            match = ' OR '.join(f'"{k}"' for k in keywords)
+            cursor = conn.execute(f"""
+                SELECT p.id, -bm25(papers_fts, {', '.join(map(str, FTS_WEIGHTS))}) AS keyword_score
+                FROM papers_fts JOIN papers p ON p.id = papers_fts.rowid
+                WHERE papers_fts MATCH ?{filters}
+                ORDER BY bm25(papers_fts, {', '.join(map(str, FTS_WEIGHTS))})
+                LIMIT ?
+            """, [match] + filter_params + [limit])
+        else:
+            # 标题命中权重更高
+            score = ' + '.join(
+                "(CASE WHEN lower(p.title) LIKE ? THEN 3.0 ELSE 0 END)"
+                " + (CASE WHEN lower(coalesce(p.authors, '') || ' ' || coalesce(p.abstract, '')"
+                " || ' ' || coalesce(p.keywords, '')) LIKE ? THEN 1.0 ELSE 0 END)"
+                for _ in keywords
+            )
+            params = [f"%{k}%" for k in keywords for _ in range(2)]
+            cursor = conn.execute(f"""
+                SELECT * FROM (SELECT p.id, {score} AS keyword_score FROM papers p WHERE 1 = 1{filters})
+                WHERE keyword_score > 0
+                ORDER BY keyword_score DESC
+                LIMIT ?
+            """, params + filter_params + [limit])
+        
+        return [(row['id'], row['keyword_score']) for row in cursor.fetchall()]
+    
+    def filter_paper_ids(self, year_from: Optional[int] = None, year_to: Optional[int] = None,
+                         authors: Optional[List[str]] = None, venue: Optional[str] = None,
+                         include_unknown_year: bool = True) -> Optional[List[int]]:
+        """满足过滤条件的论文ID（条件与 search_keywords 相同），没有任何条件时返回 None
+        
+        语义检索用它限定候选论文，两路检索的过滤结果因此一致，也不依赖向量元数据。
+        """
+        filters, params = self._paper_filters(year_from, year_to, authors, venue, include_unknown_year)
+        if not filters:
+            return None
+        return [row[0] for row in self.get_connection().execute(
+            f"SELECT p.id FROM papers p WHERE 1 = 1{filters} ORDER BY p.id", params
+        )]
+    
+    def _paper_filters(self, year_from: Optional[int] = None, year_to: Optional[int] = None,
+                       authors: Optional[List[str]] = None, venue: Optional[str] = None,
+                       include_unknown_year: bool = True) -> Tuple[str, List[Any]]:
+        """生成论文过滤条件（papers 表别名为 p），返回以 AND 开头的 SQL 片段和参数
+        
+        作者不区分大小写，只要是作者字段的子串即可；年份未知的论文默认不受年份范围限制
+        （均与旧版 advanced_search 相同）。
+        """
+        clauses, params = [], []
+        years = []
+        if year_from:
+            years.append("p.year >= ?")
+            params.append(year_from)
+        if year_to:
+            years.append("p.year <= ?")
+            params.append(year_to)
+        if years:
+            year_clause = " AND ".join(years)
+            if include_unknown_year:
+                year_clause = f"(COALESCE(p.year, 0) = 0 OR ({year_clause}))"
+            clauses.append(year_clause)
+        if venue:
+            clauses.append("p.venue = ?")
+            params.append(venue)
+        if authors:
+            clauses.append("(" + " OR ".join("lower(coalesce(p.authors, '')) LIKE ?" for _ in authors) + ")")
+            params.extend(f"%{author.lower()}%" for author in authors)
+        return ''.join(f" AND {clause}" for clause in clauses), params
+    
+    def latest_change_seq(self) -> int:
+        """变更日志的最新序号（没有变更时为 0）"""
+        row = self.get_connection().execute("SELECT MAX(seq) FROM paper_changes").fetchone()
+        return row[0] or 0
+
+    def change_epoch(self) -> Tuple[int, int]:
+        """数据版本：(已分配的最大变更序号, 各消费者检查点之和)
+        
+        论文或分析的任何增删改、chunk_count 回写都会使第一项增加（清理变更日志后也不会回退），
+        向量同步进程处理完一批变更后第二项增加，可用于判断检索结果是否仍然有效。
+        """
+        row = self.get_connection().execute("""
+            SELECT (SELECT seq FROM sqlite_sequence WHERE name = 'paper_changes'),
+                   (SELECT SUM(seq) FROM sync_checkpoints)
+        """).fetchone()
+        return row[0] or 0, row[1] or 0
+
+    def get_changes(self, since_seq: int = 0, limit: int = 1000,
+                    entity: Optional[str] = None) -> List[Dict[str, Any]]:
+        """读取 since_seq 之后的变更（按序号升序）
+
+        Args:
+            since_seq: 起始序号（不含）
+            limit: 最多返回条数
+            entity: 只返回 paper 或 analysis 的变更
+        """
+        sql = "SELECT seq, paper_id, entity, op, changed_at FROM paper_changes WHERE seq > ?"
+        params: List[Any] = [since_seq]
+        if entity is not None:
+            sql += " AND entity = ?"
+            params.append(entity)
+        sql += " ORDER BY seq LIMIT ?"
+        params.append(limit)
+        return [dict(row) for row in self.get_connection().execute(sql, params)]
+
+    def count_changes(self, since_seq: int = 0) -> int:
+        """since_seq 之后的变更条数"""
+        row = self.get_connection().execute("SELECT COUNT(*) FROM paper_changes WHERE seq > ?", (since_seq,)).fetchone()
+        return row[0]
+
+    def get_checkpoint(self, consumer: str) -> Optional[int]:
+        """消费者已处理到的序号，从未同步过时返回 None"""
+        row = self.get_connection().execute(
+            "SELECT seq FROM sync_checkpoints WHERE consumer = ?", (consumer,)
+        ).fetchone()
+        return row['seq'] if row else None
+
+    def advance_checkpoint(self, consumer: str, seq: int):
+        """记录消费者已处理到 seq（只前进不后退）"""
+        with self.transaction() as conn:
+            conn.execute("""
+                INSERT INTO sync_checkpoints (consumer, seq) VALUES (?, ?)
+                ON CONFLICT(consumer) DO UPDATE SET seq = MAX(seq, excluded.seq), updated_at = CURRENT_TIMESTAMP
+            """, (consumer, seq))
+
+    def prune_changes(self) -> int:
+        """删除所有消费者都已处理过的变更，返回删除条数"""
+        with self.transaction() as conn:
+            row = conn.execute("SELECT MIN(seq) FROM sync_checkpoints").fetchone()
+            if row[0] is None:
+                return 0
+            return conn.execute("DELETE FROM paper_changes WHERE seq <= ?", (row[0],)).rowcount
+
+    def find_ingested(self, pdf_paths: Sequence[str]) -> Dict[str, int]:
+        """解析前检查哪些 PDF 已经导入
+        
+        只计算文件指纹（未变化的文件直接命中缓存），不需要解析PDF。
+        
+        Returns:
+            已导入文件的 路径 -> paper_id
+        """
+        fingerprints = self.fingerprints.fingerprint_many(pdf_paths)
+        ids = self._ids_by_hash(self.get_connection(), list(set(fingerprints.values())))
+        return {path: ids[file_hash] for path, file_hash in fingerprints.items() if file_hash in ids}
+    
+    def is_ingested(self, pdf_path: str) -> Optional[int]:
+        """PDF 已导入时返回论文ID，否则返回 None"""
+        return self.find_ingested([pdf_path]).get(str(pdf_path))
     
+    def get_paper_id_by_hash(self, pdf_hash: str) -> Optional[int]:
+        """按已经算好的文件指纹查询论文ID，不存在时返回 None"""
+        return self._ids_by_hash(self.get_connection(), [pdf_hash]).get(pdf_hash)
     
     def _compute_file_hash(self, file_path: str) -> str:
-        """计算文件哈希值"""
-        hasher = hashlib.md5()
-        with open(file_path, 'rb') as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                hasher.update(chunk)
-        return hasher.hexdigest()
+        """计算文件哈希值（带缓存）"""
+        return self.fingerprints.fingerprint(file_path)
 if __name__ == "__main__":
     ...
\ No newline at end of file
@@ -0,0 +1,120 @@
+import hashlib
+import sqlite3
+import zlib
+from typing import Dict, Iterable, List, Optional
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+class TextStore:
+    """压缩的内容寻址文本存储
+
+    大文本（raw_text / markdown_text）按 sha256 去重后压缩存放在独立的
+    text_blobs 表中，papers 表只保存哈希，扫描元数据时不会读到这些页。
+    优先使用 zstd，未安装 zstandard 时使用 zlib；每条记录保存编码方式，
+    两种格式可以混合读取。
+    """
+
+    def __init__(self, level: Optional[int] = None):
+        if zstandard is not None:
+            self.codec = "zstd"
+            self.level = level or 9
+        else:
+            self.codec = "zlib"
+            self.level = level or 6
+
+    @staticmethod
+    def create_table(cursor: sqlite3.Cursor):
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS text_blobs (
+                hash TEXT PRIMARY KEY,
+                codec TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                data BLOB NOT NULL
+            ) WITHOUT ROWID
+        """)
+
+    @staticmethod
+    def hash_text(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def put_many(self, conn: sqlite3.Connection, texts: Iterable[Optional[str]]) -> List[Optional[str]]:
+        """写入文本，返回对应的哈希（空文本返回 None）
+
+        已存在的内容不会重复压缩和写入。
+        """
+        hashes = []
+        pending = {}
+        for text in texts:
+            if not text:
+                hashes.append(None)
+                continue
+            text_hash = self.hash_text(text)
+            hashes.append(text_hash)
+            pending.setdefault(text_hash, text)
+
+        if pending:
+            existing = self._existing(conn, list(pending))
+            compress = self._compressor()
+            rows = [
+                (text_hash, self.codec, len(text), compress(text.encode("utf-8")))
+                for text_hash, text in pending.items() if text_hash not in existing
+            ]
+            conn.executemany(
+                "INSERT OR IGNORE INTO text_blobs (hash, codec, size, data) VALUES (?, ?, ?, ?)", rows
+            )
+
+        return hashes
+
+    def get_many(self, conn: sqlite3.Connection, hashes: Iterable[Optional[str]]) -> Dict[str, str]:
+        """按哈希批量读取并解压文本"""
+        wanted = list(dict.fromkeys(h for h in hashes if h))
+        decompressors = {}
+        texts = {}
+        for i in range(0, len(wanted), 500):
+            batch = wanted[i:i + 500]
+            cursor = conn.execute(
+                f"SELECT hash, codec, data FROM text_blobs WHERE hash IN ({', '.join('?' for _ in batch)})",
+                batch
+            )
+            for text_hash, codec, data in cursor:
+                if codec not in decompressors:
+                    decompressors[codec] = self._decompressor(codec)
+                texts[text_hash] = decompressors[codec](data).decode("utf-8")
+        return texts
+
+    def delete_unreferenced(self, conn: sqlite3.Connection) -> int:
+        """删除不再被任何论文引用的文本，返回删除数量"""
+        cursor = conn.execute("""
+            DELETE FROM text_blobs WHERE hash NOT IN (
+                SELECT raw_text_hash FROM papers WHERE raw_text_hash IS NOT NULL
+                UNION SELECT markdown_text_hash FROM papers WHERE markdown_text_hash IS NOT NULL
+            )
+        """)
+        return cursor.rowcount
+
+    def _existing(self, conn: sqlite3.Connection, hashes: List[str]) -> set:
+        existing = set()
+        for i in range(0, len(hashes), 500):
+            batch = hashes[i:i + 500]
+            cursor = conn.execute(
+                f"SELECT hash FROM text_blobs WHERE hash IN ({', '.join('?' for _ in batch)})", batch
+            )
+            existing.update(row[0] for row in cursor)
+        return existing
+
+    # zstd 压缩/解压对象不是线程安全的，每次批量操作单独创建
+    def _compressor(self):
+        if self.codec == "zstd":
+            return zstandard.ZstdCompressor(level=self.level).compress
+        return lambda data: zlib.compress(data, self.level)
+
+    def _decompressor(self, codec: str):
+        if codec == "zstd":
+            if zstandard is None:
+                raise RuntimeError("该文本使用 zstd 压缩，请安装 zstandard")
+            return zstandard.ZstdDecompressor().decompress
+        return zlib.decompress
@@ -1,18 +1,68 @@
-import chromadb
-from chromadb.config import Settings
-from typing import List, Dict, Any, Optional
+import hashlib
+import shutil
+import subprocess
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional, Sequence
 from pathlib import Path
+from config import settings
+from .embeddings import create_embedder
+from .embedding_cache import EmbeddingCache
+from .index_generation import IndexGeneration
 
 class VectorManager:
-    def __init__(self, db_path: str, embedding_model: str = "sentence-transformers/all-MiniLM-L6-v2"):
+    def __init__(self, db_path: str, embedding_model: Optional[str] = None,
+                 device: Optional[str] = None, batch_size: Optional[int] = None,
+                 normalize: Optional[bool] = None, num_threads: Optional[int] = None,
+                 backend: Optional[str] = None, embedding_cache: Optional[bool] = None,
+                 vector_backend: Optional[str] = None):
+        """
+        Args:
+            db_path: Chroma 持久化目录
+            embedding_model / device / batch_size / normalize / num_threads / backend:
+                嵌入模型配置，未指定时使用 settings 中的 EMBEDDING_* 配置
+            embedding_cache: 是否使用持久化向量缓存（默认 settings.EMBEDDING_CACHE）
+            vector_backend: 向量库后端 chroma/numpy（默认 settings.VECTOR_BACKEND）
+        """
         self.db_path = Path(db_path)
         self.db_path.mkdir(parents=True, exist_ok=True)
+        # 每次写入向量后加一（持久化，其他进程的写入同样可见），用于判断检索结果缓存是否失效
+        self.generation = IndexGeneration(str(self.db_path / "index_generation.sqlite"))
         
-        self.client = chromadb.PersistentClient(
-            path=str(self.db_path),
-            settings=Settings(anonymized_telemetry=False)
+        # 三个集合共用一个嵌入函数；向量由这里显式计算后传给 Chroma
+        self.embedder = create_embedder(
+            backend or settings.EMBEDDING_BACKEND,
+            model_name=embedding_model or settings.EMBEDDING_MODEL,
+            device=device or settings.EMBEDDING_DEVICE,
+            batch_size=batch_size or settings.EMBEDDING_BATCH_SIZE,
+            normalize=settings.EMBEDDING_NORMALIZE if normalize is None else normalize,
+            num_threads=num_threads if num_threads is not None else settings.EMBEDDING_THREADS,
+            export_dir=str(settings.embedding_onnx_path),
+            quantize=settings.EMBEDDING_QUANTIZE
         )
         
+        # 写入时先查向量缓存，相同内容的文本不重复计算
+        use_cache = settings.EMBEDDING_CACHE if embedding_cache is None else embedding_cache
+        self.embedding_cache = EmbeddingCache(str(self.db_path / "embedding_cache.sqlite")) if use_cache else None
+        
+        self.vector_backend = vector_backend or settings.VECTOR_BACKEND
+        if self.vector_backend == "numpy":
+            # 启动时不导入 chromadb、不加载索引，向量在第一次查询时按需映射
+            from .numpy_store import NumpyVectorStore
+            self.client = NumpyVectorStore(
+                str(self.db_path / "numpy"),
+                dtype=settings.VECTOR_DTYPE,
+                quantization=settings.VECTOR_QUANTIZATION
+            )
+        elif self.vector_backend == "chroma":
+            import chromadb
+            from chromadb.config import Settings
+            self.client = chromadb.PersistentClient(
+                path=str(self.db_path),
+                settings=Settings(anonymized_telemetry=False)
+            )
+        else:
+            raise ValueError(f"不支持的向量库后端: {self.vector_backend}")
+        
         # 创建集合
         self.fulltext_collection = self.client.get_or_create_collection(
             name="paper_fulltext",
@@ -29,81 +79,297 @@ class VectorManager:
             metadata={"description": "AI-extracted information embeddings"}
         )
     
-    def add_fulltext(self, paper_id: int, text_chunks: List[str], metadatas: Optional[List[Dict]] = None):
-        """添加全文向量"""
-        ids = [f"paper_{paper_id}_chunk_{i}" for i in range(len(text_chunks))]
+    @property
+    def collections(self) -> Dict[str, Any]:
+        """集合名 -> 集合"""
+        return {
+            "fulltext": self.fulltext_collection,
+            "abstracts": self.abstract_collection,
+            "analysis": self.analysis_collection,
+        }
+    
+    def add_fulltext(self, paper_id: int, text_chunks: List[str],
+                     metadatas: Optional[List[Dict]] = None) -> Dict[str, int]:
+        """添加或更新论文的全文向量（可重复调用）
+        
+        分块ID由内容哈希生成，与库中该论文已有的分块比较：只对新内容计算向量并写入，
+        内容未变的分块只在元数据变化时更新元数据，新分块集合中没有的旧分块被删除。
         
+        Returns:
+            {added: 新增, unchanged: 未变, metadata_updated: 只更新元数据, deleted: 删除}
+        """
         if metadatas is None:
-            metadatas = [{"paper_id": paper_id, "chunk_index": i} for i in range(len(text_chunks))]
+            metadatas = [{} for _ in text_chunks]
         
-        self.fulltext_collection.add(
-            documents=text_chunks,
-            ids=ids,
-            metadatas=metadatas
-        )
+        ids, chunk_metadatas = [], []
+        occurrences: Dict[str, int] = {}
+        for index, (text, metadata) in enumerate(zip(text_chunks, metadatas)):
+            content_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+            # 同一篇论文中重复的分块加序号区分
+            occurrence = occurrences.get(content_hash, 0)
+            occurrences[content_hash] = occurrence + 1
+            ids.append(f"paper_{paper_id}_chunk_{content_hash[:16]}" + (f"_{occurrence}" if occurrence else ""))
+            chunk_metadatas.append(dict(metadata or {}, paper_id=paper_id, chunk_index=index, content_hash=content_hash))
+        
+        stored = self.fulltext_collection.get(where={"paper_id": paper_id}, include=["metadatas"])
+        stored_metadatas = dict(zip(stored["ids"], stored["metadatas"]))
+        
+        new_ids = set(ids)
+        added = [i for i, chunk_id in enumerate(ids) if chunk_id not in stored_metadatas]
+        relabeled = [
+            i for i, chunk_id in enumerate(ids)
+            if chunk_id in stored_metadatas and stored_metadatas[chunk_id] != chunk_metadatas[i]
+        ]
+        leftover = [chunk_id for chunk_id in stored_metadatas if chunk_id not in new_ids]
+        
+        if leftover or added or relabeled:
+            with self._writing():
+                if leftover:
+                    self.fulltext_collection.delete(ids=leftover)
+                if added:
+                    self.fulltext_collection.add(
+                        documents=[text_chunks[i] for i in added],
+                        embeddings=self._embed([text_chunks[i] for i in added]),
+                        ids=[ids[i] for i in added],
+                        metadatas=[chunk_metadatas[i] for i in added]
+                    )
+                if relabeled:
+                    # update 按键合并元数据，旧元数据中已不存在的键（如被删除的作者）显式写为 None 删除
+                    self.fulltext_collection.update(
+                        ids=[ids[i] for i in relabeled],
+                        metadatas=[self._replacing(stored_metadatas[ids[i]], chunk_metadatas[i]) for i in relabeled]
+                    )
+        
+        return {
+            "added": len(added),
+            "unchanged": len(ids) - len(added) - len(relabeled),
+            "metadata_updated": len(relabeled),
+            "deleted": len(leftover),
+        }
     
     def add_abstract(self, paper_id: int, abstract: str, metadata: Optional[Dict] = None):
-        """添加摘要向量"""
-        if metadata is None:
-            metadata = {"paper_id": paper_id}
-        
-        self.abstract_collection.add(
-            documents=[abstract],
-            ids=[f"paper_{paper_id}_abstract"],
-            metadatas=[metadata]
-        )
+        """添加或替换摘要向量"""
+        self._upsert_one(self.abstract_collection, f"paper_{paper_id}_abstract", abstract,
+                         metadata if metadata is not None else {"paper_id": paper_id})
     
     def add_analysis(self, paper_id: int, analysis_text: str, metadata: Optional[Dict] = None):
-        """添加分析信息向量"""
-        if metadata is None:
-            metadata = {"paper_id": paper_id}
-        
-        self.analysis_collection.add(
-            documents=[analysis_text],
-            ids=[f"paper_{paper_id}_analysis"],
-            metadatas=[metadata]
-        )
+        """添加或替换分析信息向量"""
+        self._upsert_one(self.analysis_collection, f"paper_{paper_id}_analysis", analysis_text,
+                         metadata if metadata is not None else {"paper_id": paper_id})
     
-    def search_fulltext(self, query: str, n_results: int = 10) -> Dict[str, Any]:
-        """搜索全文"""
-        results = self.fulltext_collection.query(
-            query_texts=[query],
-            n_results=n_results
-        )
-        return results
+    def _upsert_one(self, collection, vector_id: str, text: str, metadata: Dict[str, Any]):
+        """写入一条向量，已存在时元数据整体替换
+        
+        两种后端的 upsert 都按键合并元数据，已有记录中多出的键（如被删除的作者）显式写为 None 删除。
+        """
+        stored = collection.get(ids=[vector_id], include=["metadatas"])
+        old = stored["metadatas"][0] if stored["ids"] else None
+        
+        with self._writing():
+            collection.upsert(
+                documents=[text],
+                embeddings=self._embed([text]),
+                ids=[vector_id],
+                metadatas=[self._replacing(old, metadata)]
+            )
+    
+    def search_fulltext(self, query: str, n_results: int = 10,
+                        where: Optional[Dict[str, Any]] = None,
+                        query_embedding: Optional[List[float]] = None) -> Dict[str, Any]:
+        """搜索全文
+        
+        Args:
+            where: 元数据过滤条件（见 metadata_filters.build_where），在向量检索时直接过滤
+            query_embedding: 预先计算的查询向量，提供时不再调用模型
+        """
+        return self.search_fulltext_batch([query], n_results, where, self._single(query_embedding))[0]
     
-    def search_abstracts(self, query: str, n_results: int = 10) -> Dict[str, Any]:
+    def search_abstracts(self, query: str, n_results: int = 10,
+                         where: Optional[Dict[str, Any]] = None,
+                         query_embedding: Optional[List[float]] = None) -> Dict[str, Any]:
         """搜索摘要"""
-        results = self.abstract_collection.query(
-            query_texts=[query],
-            n_results=n_results
-        )
-        return results
+        return self.search_abstracts_batch([query], n_results, where, self._single(query_embedding))[0]
     
-    def search_analysis(self, query: str, n_results: int = 10) -> Dict[str, Any]:
+    def search_analysis(self, query: str, n_results: int = 10,
+                        where: Optional[Dict[str, Any]] = None,
+                        query_embedding: Optional[List[float]] = None) -> Dict[str, Any]:
         """搜索分析信息"""
-        results = self.analysis_collection.query(
-            query_texts=[query],
-            n_results=n_results
-        )
-        return results
+        return self.search_analysis_batch([query], n_results, where, self._single(query_embedding))[0]
     
-    def delete_paper(self, paper_id: int):
-        """删除论文的所有向量"""
-        # 删除全文
-        try:
-            self.fulltext_collection.delete(where={"paper_id": paper_id})
-        except:
-            pass
+    def search_fulltext_batch(self, queries: Sequence[str], n_results: int = 10,
+                              where: Optional[Dict[str, Any]] = None,
+                              query_embeddings: Optional[List[List[float]]] = None) -> List[Dict[str, Any]]:
+        """批量搜索全文：所有查询一次编码、一次查询，返回每个查询的结果（格式同 search_fulltext）"""
+        embeddings = self._query_embeddings(queries, query_embeddings)
+        return self._query(self.fulltext_collection, embeddings, n_results, where)
+    
+    def search_abstracts_batch(self, queries: Sequence[str], n_results: int = 10,
+                               where: Optional[Dict[str, Any]] = None,
+                               query_embeddings: Optional[List[List[float]]] = None) -> List[Dict[str, Any]]:
+        """批量搜索摘要"""
+        embeddings = self._query_embeddings(queries, query_embeddings)
+        return self._query(self.abstract_collection, embeddings, n_results, where)
+    
+    def search_analysis_batch(self, queries: Sequence[str], n_results: int = 10,
+                              where: Optional[Dict[str, Any]] = None,
+                              query_embeddings: Optional[List[List[float]]] = None) -> List[Dict[str, Any]]:
+        """批量搜索分析信息"""
+        embeddings = self._query_embeddings(queries, query_embeddings)
+        return self._query(self.analysis_collection, embeddings, n_results, where)
+    
+    def search_batch(self, queries: Sequence[str], n_results: int = 10,
+                     collections: Sequence[str] = ("fulltext", "abstracts", "analysis"),
+                     where: Optional[Dict[str, Any]] = None,
+                     query_embeddings: Optional[List[List[float]]] = None) -> Dict[str, List[Dict[str, Any]]]:
+        """同一批查询在多个集合中搜索，查询向量只计算一次
         
-        # 删除摘要
-        try:
-            self.abstract_collection.delete(ids=[f"paper_{paper_id}_abstract"])
-        except:
-            pass
+        Returns:
+            集合名 -> 每个查询的结果
+        """
+        embeddings = self._query_embeddings(queries, query_embeddings)
+        targets = self.collections
+        return {name: self._query(targets[name], embeddings, n_results, where) for name in collections}
+    
+    def _query(self, collection, query_embeddings: List[List[float]], n_results: int,
+               where: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """执行一次多查询请求，并拆分为每个查询各自的结果"""
+        if not query_embeddings:
+            return []
+        options = {"where": where} if where else {}
+        results = collection.query(query_embeddings=query_embeddings, n_results=n_results, **options)
+        
+        # 按查询拆分，每个结果保持单查询时的嵌套格式（results['ids'][0] 等）
+        per_query = []
+        for i in range(len(query_embeddings)):
+            per_query.append({
+                key: [value[i]] if isinstance(value, list) and len(value) == len(query_embeddings) and key != "included"
+                else value
+                for key, value in results.items()
+            })
+        return per_query
+    
+    def embed_queries(self, queries: Sequence[str]) -> List[List[float]]:
+        """计算查询向量（可缓存后传给 search_* 的 query_embeddings）"""
+        return self._embed(queries, kind="query")
+    
+    def _query_embeddings(self, queries: Sequence[str],
+                          query_embeddings: Optional[List[List[float]]]) -> List[List[float]]:
+        """使用预先计算的查询向量，未提供时调用模型"""
+        if query_embeddings is None:
+            return self.embed_queries(queries)
+        if len(query_embeddings) != len(queries):
+            raise ValueError("query_embeddings 与 queries 数量不一致")
+        return [list(map(float, vector)) for vector in query_embeddings]
+    
+    @staticmethod
+    def _replacing(old: Optional[Dict[str, Any]], new: Dict[str, Any]) -> Dict[str, Any]:
+        """用于按键合并的 update/upsert：new 中没有的旧键写为 None，写入后元数据与 new 完全一致"""
+        return dict({key: None for key in old or {} if key not in new}, **new)
+    
+    @staticmethod
+    def _single(query_embedding: Optional[List[float]]) -> Optional[List[List[float]]]:
+        return None if query_embedding is None else [query_embedding]
+    
+    def _embed(self, texts: Sequence[str], kind: str = "ingest"):
+        """计算向量（ingest 用于写入，query 用于查询，分别统计吞吐）
+
+        写入时查询持久化缓存，统计中只计入实际调用模型的文本。
+        """
+        if kind == "ingest" and self.embedding_cache is not None:
+            return self.embedding_cache.embed(self.embedder, texts, kind).tolist()
+        return self.embedder.embed(texts, kind).tolist()
+    
+    def embedding_stats(self) -> Dict[str, Dict[str, float]]:
+        """嵌入吞吐统计：{ingest/query: {texts, calls, seconds, per_second}}"""
+        stats = self.embedder.stats.snapshot()
+        if self.embedding_cache is not None:
+            stats['cache'] = self.embedding_cache.info()
+        return stats
+    
+    @property
+    def write_generation(self) -> int:
+        """向量库的写入代数（持久化，包括其他进程的写入），用于判断检索结果缓存是否失效"""
+        return self.generation.value()
+    
+    def mark_changed(self):
+        """记录一次向量写入（直接操作 collections 时需要在写入完成后调用）"""
+        self.generation.bump()
+    
+    @contextmanager
+    def _writing(self):
+        """包住一次向量写入，结束后（包括失败时）记录写入
         
-        # 删除分析
+        写入完成后才增加代数：写入期间开始的查询在存入结果缓存前会发现代数已变化而不缓存。
+        """
         try:
+            yield
+        finally:
+            self.mark_changed()
+    
+    def compact(self, timeout: int = 3600):
+        """回收删除留下的空间
+
+        numpy 后端合并段文件，返回 集合名 -> 合并后的段数；chroma 后端运行
+        `chroma vacuum`（VACUUM 其 SQLite 文件并清理已应用的写入日志），返回 None。
+
+        Raises:
+            RuntimeError: 找不到 chroma 命令或 vacuum 失败
+        """
+        if self.vector_backend == "numpy":
+            return self.client.compact()
+
+        chroma = shutil.which("chroma")
+        if chroma is None:
+            raise RuntimeError(f"找不到 chroma 命令，无法回收空间（可手动运行 `chroma vacuum --path {self.db_path}`）")
+        cmd = [chroma, "vacuum", "--path", str(self.db_path), "--force"]
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+        if result.returncode != 0:
+            raise RuntimeError(f"chroma vacuum 失败: {result.stderr.strip() or result.stdout.strip()}")
+        return None
+    
+    def delete_fulltext(self, paper_id: int):
+        """删除论文的全文向量（重新分块前调用）"""
+        with self._writing():
+            self.fulltext_collection.delete(where={"paper_id": paper_id})
+    
+    def delete_analysis(self, paper_id: int):
+        """删除论文的分析信息向量"""
+        with self._writing():
             self.analysis_collection.delete(ids=[f"paper_{paper_id}_analysis"])
-        except:
-            pass
+    
+    def delete_papers(self, paper_ids: Sequence[int], batch_size: int = 500) -> Dict[str, int]:
+        """批量删除论文在所有集合中的向量
+        
+        每个集合单独处理，某个集合失败时仍继续删除其他集合，最后抛出 RuntimeError
+        列出失败的集合（残留的向量可以由 reconcile 清理）。
+        
+        Returns:
+            集合名 -> 删除的向量数
+        """
+        ids = list(dict.fromkeys(int(paper_id) for paper_id in paper_ids))
+        deleted = {name: 0 for name in self.collections}
+        errors = {}
+        for name, collection in self.collections.items():
+            try:
+                for i in range(0, len(ids), batch_size):
+                    batch = ids[i:i + batch_size]
+                    if name == "fulltext":
+                        where = {"paper_id": {"$in": batch}}
+                        vector_ids = collection.get(where=where, include=[])["ids"]
+                    else:
+                        suffix = "abstract" if name == "abstracts" else "analysis"
+                        vector_ids = collection.get(ids=[f"paper_{pid}_{suffix}" for pid in batch], include=[])["ids"]
+                    if vector_ids:
+                        collection.delete(ids=list(vector_ids))
+                        deleted[name] += len(vector_ids)
+            except Exception as e:
+                print(f"删除 {name} 向量失败（{len(ids)} 篇论文）: {e}")
+                errors[name] = e
+        self.mark_changed()
+        if errors:
+            raise RuntimeError(f"部分集合删除失败: {', '.join(errors)}（已删除: {deleted}）")
+        return deleted
+    
+    def delete_paper(self, paper_id: int) -> Dict[str, int]:
+        """删除论文的所有向量"""
+        return self.delete_papers([paper_id])
@@ -0,0 +1,113 @@
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# 一路检索结果：按相关度降序排列的 (论文ID数组, 原始分数数组)
+Run = Tuple[np.ndarray, np.ndarray]
+
+
+def make_run(pairs: Sequence[Tuple[int, float]]) -> Run:
+    """由 [(论文ID, 分数), ...]（已按相关度排序）构造一路结果"""
+    ids = np.fromiter((paper_id for paper_id, _ in pairs), dtype=np.int64, count=len(pairs))
+    scores = np.fromiter((score for _, score in pairs), dtype=np.float64, count=len(pairs))
+    return ids, scores
+
+
+def min_max(scores: np.ndarray) -> np.ndarray:
+    """线性缩放到 [0, 1]，所有分数相同时都为 1"""
+    if not len(scores):
+        return scores
+    low, high = scores.min(), scores.max()
+    if high == low:
+        return np.ones_like(scores)
+    return (scores - low) / (high - low)
+
+
+def z_score(scores: np.ndarray) -> np.ndarray:
+    """标准化为均值 0、标准差 1，只有一个结果或分数都相同时都为 0"""
+    if not len(scores):
+        return scores
+    std = scores.std()
+    if std == 0:
+        return np.zeros_like(scores)
+    return (scores - scores.mean()) / std
+
+
+def max_scale(scores: np.ndarray) -> np.ndarray:
+    """除以最大值（旧版混合搜索的归一化方式，最大值不为正时保持原值）"""
+    if not len(scores) or scores.max() <= 0:
+        return scores
+    return scores / scores.max()
+
+
+def _score_fusion(normalize: Callable[[np.ndarray], np.ndarray], shift_to_min: bool = False):
+    """分数标准化后加权求和；没有出现在某一路结果中的论文在该路计 0 分
+
+    shift_to_min: 标准化后的分数可能为负（z-score），先减去该路最低分，
+    使缺席的论文不会比该路排在末尾的论文得分更高。
+    """
+    def fuse_scores(runs: Sequence[Run], weights: Sequence[float], k: int) -> Tuple[np.ndarray, np.ndarray]:
+        contributions = []
+        for (_, scores), weight in zip(runs, weights):
+            normalized = normalize(scores)
+            if shift_to_min and len(normalized):
+                normalized = normalized - normalized.min()
+            contributions.append(normalized * weight)
+        return _combine(runs, contributions)
+    return fuse_scores
+
+
+def _rrf(runs: Sequence[Run], weights: Sequence[float], k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """倒数排名融合：sum(weight / (k + rank))，只看名次，不受各路分数尺度影响
+
+    结果除以理论最大值（每一路都排第一），得分范围为 [0, 1]。
+    """
+    contributions = [weight / (k + np.arange(1, len(ids) + 1)) for (ids, _), weight in zip(runs, weights)]
+    ids, scores = _combine(runs, contributions)
+    best = sum(weights) / (k + 1)
+    return ids, scores / best if best > 0 else scores
+
+
+def _combine(runs: Sequence[Run], contributions: Sequence[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """按论文ID累加各路贡献，得分降序返回（得分相同时按在各路结果中首次出现的顺序）"""
+    if not any(len(ids) for ids, _ in runs):
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+    all_ids = np.concatenate([ids for ids, _ in runs])
+    unique, first, inverse = np.unique(all_ids, return_index=True, return_inverse=True)
+    totals = np.bincount(inverse, weights=np.concatenate(contributions), minlength=len(unique))
+    order = np.lexsort((first, -totals))
+    return unique[order], totals[order]
+
+
+FUSION_METHODS: Dict[str, Callable] = {
+    "rrf": _rrf,
+    "zscore": _score_fusion(z_score, shift_to_min=True),
+    "minmax": _score_fusion(min_max),
+    "max": _score_fusion(max_scale),
+}
+
+
+def fuse(runs: Sequence[Run], weights: Optional[Sequence[float]] = None,
+         method: str = "rrf", k: int = 60) -> Tuple[np.ndarray, np.ndarray]:
+    """融合多路排序结果
+
+    Args:
+        runs: 每路按相关度降序的 (论文ID数组, 分数数组)
+        weights: 每路的权重，默认都为 1
+        method: rrf（倒数排名）/ zscore / minmax（分数标准化后加权求和）/ max（除以最大值，旧版行为）
+        k: rrf 的平滑常数，越大名次之间的差距越小
+
+    Returns:
+        (论文ID数组, 融合得分数组)，按得分降序
+    """
+    if method not in FUSION_METHODS:
+        raise ValueError(f"不支持的融合方式: {method}（可选: {'/'.join(FUSION_METHODS)}）")
+    weights = [1.0] * len(runs) if weights is None else list(weights)
+    if len(weights) != len(runs):
+        raise ValueError("weights 与 runs 数量不一致")
+    return FUSION_METHODS[method](runs, weights, k)
+
+
+def top_n(ids: np.ndarray, scores: np.ndarray, n: int) -> List[Tuple[int, float]]:
+    """取融合结果的前 n 项"""
+    return list(zip(ids[:n].tolist(), scores[:n].tolist()))
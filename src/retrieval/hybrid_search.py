@@ -1,131 +1,112 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
+from config import settings
 from src.database import VectorManager, SQLManager
 from .semantic_search import SemanticSearch
-import re
+from .query_cache import QueryEmbeddingCache
+from .fusion import FUSION_METHODS, Run, fuse, make_run, top_n
 
 class HybridSearch:
-    def __init__(self, vector_manager: VectorManager, sql_manager: SQLManager):
+    def __init__(self, vector_manager: VectorManager, sql_manager: SQLManager,
+                 query_cache: Optional[QueryEmbeddingCache] = None,
+                 fusion: Optional[str] = None, rrf_k: Optional[int] = None):
+        """
+        Args:
+            fusion: 语义与关键词结果的融合方式 rrf/zscore/minmax/max（默认 settings.FUSION_METHOD，见 fusion.fuse）
+            rrf_k: rrf 的平滑常数（默认 settings.FUSION_RRF_K）
+        """
         self.vector_manager = vector_manager
         self.sql_manager = sql_manager
-        self.semantic_search = SemanticSearch(vector_manager, sql_manager)
+        self.semantic_search = SemanticSearch(vector_manager, sql_manager, query_cache)
+        self.fusion = fusion or settings.FUSION_METHOD
+        if self.fusion not in FUSION_METHODS:
+            raise ValueError(f"不支持的融合方式: {self.fusion}（可选: {'/'.join(FUSION_METHODS)}）")
+        self.rrf_k = rrf_k or settings.FUSION_RRF_K
     
     def search(
         self, 
         query: str, 
         n_results: int = 10,
         semantic_weight: float = 0.7,
-        keyword_weight: float = 0.3
+        keyword_weight: float = 0.3,
+        filters: Optional[Dict[str, Any]] = None,
+        query_embedding: Optional[List[float]] = None,
+        fusion: Optional[str] = None
     ) -> List[Dict[str, Any]]:
         """混合搜索（语义 + 关键词）
         
+        两路检索只取 (论文ID, 分数)，融合后只读取前 n_results 篇论文的详情。
+        
         Args:
             query: 查询文本
             n_results: 返回结果数量
             semantic_weight: 语义搜索权重
             keyword_weight: 关键词搜索权重
+            filters: 过滤条件 year_from / year_to / authors / venue / include_unknown_year（见 SQLManager.search_keywords），
+                     先在 SQL 中求出满足条件的论文，两路检索都只在这些论文中进行
+            query_embedding: 预先计算的查询向量
+            fusion: 本次查询使用的融合方式，默认使用初始化时的设置
+        
+        Returns:
+            论文列表，带 final_score（融合得分），以及各路命中时的原始分数
+            relevance_score（1 - 距离）/ keyword_score（bm25）
         """
-        
-        # 语义搜索
-        semantic_results = self.semantic_search.search_papers(query, n_results * 2)
-        
-        # 关键词搜索
-        keyword_results = self._keyword_search(query, n_results * 2)
-        
-        # 合并结果
-        merged = self._merge_results(
-            semantic_results, 
-            keyword_results,
-            semantic_weight,
-            keyword_weight
+        runs = self.candidate_runs(query, n_results * 2, filters, query_embedding)
+        ids, scores = fuse(
+            [runs['semantic'], runs['keyword']],
+            [semantic_weight, keyword_weight],
+            method=fusion or self.fusion,
+            k=self.rrf_k
         )
-        
-        return merged[:n_results]
+        return self._hydrate(top_n(ids, scores, n_results), runs)
     
-    def _keyword_search(self, query: str, n_results: int) -> List[Dict[str, Any]]:
-        """关键词搜索（基于SQL LIKE）"""
-        
-        papers = self.sql_manager.get_all_papers()
-        
-        # 提取查询关键词
-        keywords = [k.lower() for k in re.findall(r'\w+', query) if len(k) > 2]
-        
-        # 计算匹配分数
-        scored_papers = []
-        for paper in papers:
-            score = self._calculate_keyword_score(paper, keywords)
-            if score > 0:
-                paper['keyword_score'] = score
-                scored_papers.append(paper)
-        
-        # 排序
-        scored_papers.sort(key=lambda x: x['keyword_score'], reverse=True)
+    def candidate_runs(
+        self,
+        query: str,
+        depth: int,
+        filters: Optional[Dict[str, Any]] = None,
+        query_embedding: Optional[List[float]] = None
+    ) -> Dict[str, Run]:
+        """两路检索的候选：{semantic, keyword} -> (论文ID数组, 分数数组)，按相关度降序
         
-        return scored_papers[:n_results]
+        Args:
+            depth: 每路最多返回的论文数
+        """
+        filters = {k: v for k, v in (filters or {}).items() if v is not None}
+        
+        # 语义搜索：过滤条件由 SQL 求值，向量库只按 paper_id 限定，与关键词搜索的匹配规则一致，
+        # 也不依赖旧向量中可能缺少的 year / venue / 作者元数据
+        allowed_ids = self.sql_manager.filter_paper_ids(**filters) if filters else None
+        query_embeddings = None if query_embedding is None else [query_embedding]
+        paper_ids, scores, _ = self.semantic_search.rank_papers_batch(
+            [query], depth, query_embeddings=query_embeddings, allowed_ids=allowed_ids
+        )[0]
+        
+        return {
+            'semantic': make_run([(paper_id, scores[paper_id]) for paper_id in paper_ids]),
+            'keyword': make_run(self._keyword_search(query, depth, filters)),
+        }
     
-    def _calculate_keyword_score(self, paper: Dict[str, Any], keywords: List[str]) -> float:
-        """计算关键词匹配分数"""
-        
-        # 构建搜索文本
-        search_text = " ".join([
-            paper.get('title', ''),
-            paper.get('authors', ''),
-            paper.get('raw_text', '')[:1000]  # 只搜索前1000字符
-        ]).lower()
-        
-        # 计算匹配
-        score = 0.0
-        for keyword in keywords:
-            count = search_text.count(keyword)
-            if count > 0:
-                # 标题匹配权重更高
-                if keyword in paper.get('title', '').lower():
-                    score += 3.0
-                score += count * 0.5
-        
-        return score
+    def _keyword_search(self, query: str, n_results: int,
+                        filters: Optional[Dict[str, Any]] = None) -> List[Tuple[int, float]]:
+        """关键词搜索（基于SQLite FTS5，bm25排序），返回 [(论文ID, 分数), ...]"""
+        return self.sql_manager.search_keyword_scores(query, n_results, **(filters or {}))
     
-    def _merge_results(
-        self,
-        semantic_results: List[Dict[str, Any]],
-        keyword_results: List[Dict[str, Any]],
-        semantic_weight: float,
-        keyword_weight: float
-    ) -> List[Dict[str, Any]]:
-        """合并搜索结果"""
-        
-        # 归一化分数
-        if semantic_results:
-            max_semantic = max(p.get('relevance_score', 0) for p in semantic_results)
-            if max_semantic > 0:
-                for p in semantic_results:
-                    p['relevance_score'] = p.get('relevance_score', 0) / max_semantic
-        
-        if keyword_results:
-            max_keyword = max(p.get('keyword_score', 0) for p in keyword_results)
-            if max_keyword > 0:
-                for p in keyword_results:
-                    p['keyword_score'] = p.get('keyword_score', 0) / max_keyword
-        
-        # 合并
-        merged = {}
-        
-        for paper in semantic_results:
-            paper_id = paper['id']
-            merged[paper_id] = paper.copy()
-            merged[paper_id]['final_score'] = paper.get('relevance_score', 0) * semantic_weight
-        
-        for paper in keyword_results:
-            paper_id = paper['id']
-            if paper_id in merged:
-                merged[paper_id]['final_score'] += paper.get('keyword_score', 0) * keyword_weight
-            else:
-                merged[paper_id] = paper.copy()
-                merged[paper_id]['final_score'] = paper.get('keyword_score', 0) * keyword_weight
-        
-        # 排序
-        results = list(merged.values())
-        results.sort(key=lambda x: x.get('final_score', 0), reverse=True)
-        
+    def _hydrate(self, fused: List[Tuple[int, float]], runs: Dict[str, Run]) -> List[Dict[str, Any]]:
+        """读取融合结果中论文的详情，附上融合得分与各路原始分数"""
+        papers = {paper['id']: paper for paper in self.sql_manager.get_papers([paper_id for paper_id, _ in fused])}
+        raw = {name: dict(zip(ids.tolist(), scores.tolist())) for name, (ids, scores) in runs.items()}
+        
+        results = []
+        for paper_id, score in fused:
+            paper = papers.get(paper_id)
+            if paper is None:
+                continue
+            if paper_id in raw['semantic']:
+                paper['relevance_score'] = raw['semantic'][paper_id]
+            if paper_id in raw['keyword']:
+                paper['keyword_score'] = raw['keyword'][paper_id]
+            paper['final_score'] = score
+            results.append(paper)
         return results
     
     def advanced_search(
@@ -134,34 +115,19 @@ class HybridSearch:
         year_from: Optional[int] = None,
         year_to: Optional[int] = None,
         authors: Optional[List[str]] = None,
-        n_results: int = 10
+        n_results: int = 10,
+        venue: Optional[str] = None,
+        query_embedding: Optional[List[float]] = None,
+        include_unknown_year: bool = True
     ) -> List[Dict[str, Any]]:
-        """高级搜索（带过滤条件）"""
-        
-        # 先进行混合搜索
-        results = self.search(query, n_results * 3)
+        """高级搜索（带过滤条件）
         
-        # 应用过滤
-        filtered = []
-        for paper in results:
-            # 年份过滤
-            if year_from and paper.get('year'):
-                if paper['year'] < year_from:
-                    continue
-            
-            if year_to and paper.get('year'):
-                if paper['year'] > year_to:
-                    continue
-            
-            # 作者过滤
-            if authors:
-                paper_authors = paper.get('authors', '').lower()
-                if not any(author.lower() in paper_authors for author in authors):
-                    continue
-            
-            filtered.append(paper)
-            
-            if len(filtered) >= n_results:
-                break
+        过滤条件下推到向量检索和 SQL 查询中，选择性强的条件也能返回足够的结果。
+        作者按子串匹配（可以只写姓或名的一部分）。
         
-        return filtered
+        Args:
+            include_unknown_year: 指定年份范围时是否保留年份未知的论文（默认保留，与旧版相同）
+        """
+        filters = {'year_from': year_from, 'year_to': year_to, 'authors': authors, 'venue': venue,
+                   'include_unknown_year': include_unknown_year}
+        return self.search(query, n_results, filters=filters, query_embedding=query_embedding)
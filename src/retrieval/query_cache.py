@@ -0,0 +1,105 @@
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from config import settings
+from src.database.embedding_cache import EmbeddingCache
+
+
+class QueryEmbeddingCache:
+    """查询向量 LRU 缓存
+
+    以 (模型标识, 规范化查询) 为键缓存查询向量：同一查询在 Streamlit 重新运行、
+    混合搜索、综述生成中重复出现时不再调用模型。可选持久化到 SQLite
+    （与写入端的 EmbeddingCache 格式相同，float16 存储），进程重启后仍然有效。
+    """
+
+    def __init__(self, maxsize: int = 1024, path: Optional[str] = None):
+        """
+        Args:
+            maxsize: 内存中最多缓存的查询数
+            path: 持久化数据库路径，None 表示只缓存在内存中
+        """
+        self.maxsize = maxsize
+        self.store = EmbeddingCache(path) if path else None
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple[str, str], np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        """NFC 规范化并合并空白"""
+        return re.sub(r'\s+', ' ', unicodedata.normalize('NFC', query)).strip()
+
+    def embed(self, vector_manager, queries: Sequence[str]) -> List[List[float]]:
+        """返回查询向量，只对内存和磁盘中都没有的查询调用模型（同一批内重复的查询只算一次）
+
+        Args:
+            vector_manager: VectorManager（使用其嵌入模型和 embed_queries）
+        """
+        model_id = vector_manager.embedder.model_id
+        keys = [(model_id, self.normalize(query)) for query in queries]
+
+        vectors: Dict[Tuple[str, str], np.ndarray] = {}
+        with self._lock:
+            for key in keys:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    vectors[key] = self._entries[key]
+        missing = [key for key in dict.fromkeys(keys) if key not in vectors]
+
+        if missing and self.store is not None:
+            hashes = {key: EmbeddingCache.text_hash(key[1]) for key in missing}
+            stored = self.store.get_many(model_id, list(hashes.values()))
+            vectors.update({key: stored[text_hash] for key, text_hash in hashes.items() if text_hash in stored})
+            missing = [key for key in missing if key not in vectors]
+
+        if missing:
+            computed = np.asarray(vector_manager.embed_queries([text for _, text in missing]), dtype=np.float32)
+            if self.store is not None:
+                # 持久化为 float16，新算出的向量同样经过 float16，保证命中与未命中时结果一致
+                computed = computed.astype(np.float16).astype(np.float32)
+                self.store.put_many(model_id, {
+                    EmbeddingCache.text_hash(text): vector for (_, text), vector in zip(missing, computed)
+                })
+            vectors.update(zip(missing, computed))
+
+        with self._lock:
+            self.hits += len(keys) - len(missing)
+            self.misses += len(missing)
+            for key in dict.fromkeys(keys):
+                self._entries[key] = vectors[key]
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return [vectors[key].tolist() for key in keys]
+
+    def clear(self):
+        """清空内存缓存（持久化的向量保留）"""
+        with self._lock:
+            self._entries.clear()
+
+    def info(self) -> Dict[str, float]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+            }
+
+
+def create_query_cache(vector_manager) -> Optional[QueryEmbeddingCache]:
+    """按 settings 创建查询向量缓存（QUERY_CACHE_SIZE 为 0 且不持久化时返回 None）"""
+    if not settings.QUERY_CACHE_SIZE and not settings.QUERY_CACHE_PERSIST:
+        return None
+    path = Path(vector_manager.db_path) / "query_cache.sqlite" if settings.QUERY_CACHE_PERSIST else None
+    return QueryEmbeddingCache(settings.QUERY_CACHE_SIZE, str(path) if path else None)
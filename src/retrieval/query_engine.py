@@ -1,7 +1,11 @@
-from typing import List, Dict, Any, Optional
+import time
+from typing import List, Dict, Any, Optional, Hashable
+from config import settings
 from src.database import VectorManager, SQLManager
 from .semantic_search import SemanticSearch
 from .hybrid_search import HybridSearch
+from .query_cache import QueryEmbeddingCache, create_query_cache
+from .result_cache import ResultCache
 
 class QueryEngine:
     """统一的查询接口"""
@@ -9,8 +13,12 @@ class QueryEngine:
     def __init__(self, vector_manager: VectorManager, sql_manager: SQLManager):
         self.vector_manager = vector_manager
         self.sql_manager = sql_manager
-        self.semantic_search = SemanticSearch(vector_manager, sql_manager)
-        self.hybrid_search = HybridSearch(vector_manager, sql_manager)
+        # 语义搜索与混合搜索共用查询向量缓存
+        self.query_cache = create_query_cache(vector_manager)
+        self.semantic_search = SemanticSearch(vector_manager, sql_manager, self.query_cache)
+        self.hybrid_search = HybridSearch(vector_manager, sql_manager, self.query_cache)
+        # 查询结果缓存，论文或向量有任何增删改时整体失效
+        self.result_cache = ResultCache(settings.RESULT_CACHE_SIZE)
     
     def query(
         self,
@@ -25,17 +33,42 @@ class QueryEngine:
             query: 查询文本
             method: 搜索方法 (semantic, hybrid, keyword, advanced)
             n_results: 返回结果数量
-            **kwargs: 其他参数
+            **kwargs: 其他参数（query_embedding: 预先计算的查询向量，见 embed_query；
+                      fusion: 混合搜索的融合方式，见 fusion.fuse）
+        
+        结果按 (查询, 方法, 结果数, 其他参数, 索引版本) 缓存，见 result_cache_info。
         """
+        if self.result_cache.maxsize <= 0:
+            return self._search(query, method, n_results, **kwargs)
+        
+        # query_embedding 由查询文本决定，不参与缓存键
+        params = {name: value for name, value in kwargs.items() if name != 'query_embedding'}
+        key = ResultCache.make_key(QueryEmbeddingCache.normalize(query), method, n_results, params)
+        epoch = self.index_epoch()
+        results = self.result_cache.get(key, epoch)
+        if results is not None:
+            return results
+        
+        start = time.perf_counter()
+        results = self._search(query, method, n_results, **kwargs)
+        self.result_cache.put(key, epoch, results, time.perf_counter() - start)
+        return results
+    
+    def _search(self, query: str, method: str, n_results: int, **kwargs) -> List[Dict[str, Any]]:
+        """执行查询（不经过结果缓存）"""
+        query_embedding = kwargs.get('query_embedding')
         
         if method == "semantic":
             search_type = kwargs.get('search_type', 'fulltext')
-            return self.semantic_search.search_papers(query, n_results, search_type)
+            return self.semantic_search.search_papers(query, n_results, search_type, query_embedding=query_embedding)
         
         elif method == "hybrid":
             semantic_weight = kwargs.get('semantic_weight', 0.7)
             keyword_weight = kwargs.get('keyword_weight', 0.3)
-            return self.hybrid_search.search(query, n_results, semantic_weight, keyword_weight)
+            return self.hybrid_search.search(
+                query, n_results, semantic_weight, keyword_weight,
+                query_embedding=query_embedding, fusion=kwargs.get('fusion')
+            )
         
         elif method == "advanced":
             return self.hybrid_search.advanced_search(
@@ -43,12 +76,57 @@ class QueryEngine:
                 year_from=kwargs.get('year_from'),
                 year_to=kwargs.get('year_to'),
                 authors=kwargs.get('authors'),
-                n_results=n_results
+                n_results=n_results,
+                venue=kwargs.get('venue'),
+                query_embedding=query_embedding,
+                include_unknown_year=kwargs.get('include_unknown_year', True)
             )
         
         else:
             raise ValueError(f"不支持的搜索方法: {method}")
     
+    def semantic_query_batch(
+        self,
+        queries: List[str],
+        n_results: int = 10,
+        search_type: str = "fulltext"
+    ) -> List[List[Dict[str, Any]]]:
+        """批量语义查询（查询扩展、综述生成等一次发出多个相关查询的场景）
+        
+        所有查询一次编码、每个集合一次向量查询，返回与 queries 对应的结果列表。
+        """
+        return self.semantic_search.search_papers_batch(queries, n_results, search_type)
+    
+    def index_epoch(self) -> Hashable:
+        """索引版本：SQLite 变更序号与同步检查点、向量库的写入代数
+        
+        两部分都读自持久化状态：任何进程对论文或分析的增删改、chunk_count 回写、
+        向量同步进度推进，以及任何进程通过 VectorManager 写入或删除向量都会使其变化。
+        """
+        return self.sql_manager.change_epoch(), self.vector_manager.write_generation
+    
+    def search_stats(self) -> Dict[str, Any]:
+        """语义检索累计统计（语义搜索与混合搜索合计）：查询数、检查的分块候选数、加深检索次数"""
+        stats = {'queries': 0, 'candidates': 0, 'requeries': 0}
+        for search in (self.semantic_search, self.hybrid_search.semantic_search):
+            for name, value in search.search_stats().items():
+                if name in stats:
+                    stats[name] += value
+        stats['candidates_per_query'] = stats['candidates'] / stats['queries'] if stats['queries'] else 0.0
+        return stats
+    
+    def result_cache_info(self) -> Dict[str, Any]:
+        """结果缓存统计：命中率、失效次数、命中节省的计算时间（秒）"""
+        return self.result_cache.info()
+    
+    def embed_query(self, query: str) -> List[float]:
+        """计算（或从缓存取出）查询向量，可传给 query(..., query_embedding=...) 重复使用"""
+        return self.semantic_search.embed_queries([query])[0]
+    
+    def query_cache_info(self) -> Optional[Dict[str, Any]]:
+        """查询向量缓存统计，未启用缓存时为 None"""
+        return self.query_cache.info() if self.query_cache is not None else None
+    
     def find_similar(self, paper_id: int, n_results: int = 5) -> List[Dict[str, Any]]:
         """查找相似论文"""
         return self.semantic_search.search_similar_papers(paper_id, n_results)
@@ -69,26 +147,35 @@ class QueryEngine:
         
         return paper
     
-    def get_all_papers_summary(self) -> List[Dict[str, Any]]:
-        """获取所有论文的摘要信息"""
-        papers = self.sql_manager.get_all_papers()
+    def get_all_papers_summary(self, batch_size: int = 500) -> List[Dict[str, Any]]:
+        """获取所有论文的摘要信息（最新添加的在前）"""
+        papers = self.sql_manager.iter_papers(columns=('title', 'authors', 'year', 'created_at'), newest_first=True)
         
         summaries = []
+        batch = []
         for paper in papers:
-            summary = {
+            batch.append({
                 'id': paper['id'],
                 'title': paper['title'],
                 'authors': paper['authors'],
                 'year': paper['year'],
                 'created_at': paper['created_at']
-            }
-            
-            # 添加分析信息
-            analysis = self.sql_manager.get_paper_analysis(paper['id'])
+            })
+            if len(batch) >= batch_size:
+                summaries.extend(self._attach_analysis(batch))
+                batch = []
+        
+        summaries.extend(self._attach_analysis(batch))
+        return summaries
+    
+    def _attach_analysis(self, summaries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """批量添加分析信息"""
+        analyses = self.sql_manager.get_analyses([summary['id'] for summary in summaries])
+        
+        for summary in summaries:
+            analysis = analyses.get(summary['id'])
             if analysis:
                 summary['keywords'] = analysis.get('keywords', [])
                 summary['research_question'] = analysis.get('research_question', '')
-            
-            summaries.append(summary)
         
         return summaries
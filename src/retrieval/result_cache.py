@@ -0,0 +1,81 @@
+import copy
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+
+class ResultCache:
+    """检索结果 LRU 缓存，按索引版本（epoch）精确失效
+
+    键为 (查询, 方法, 结果数, 其他参数)，只保存当前 epoch 下的结果：
+    查询前读取 epoch，与缓存记录的不一致（期间论文或向量发生过增删改）时清空缓存。
+    写入时 epoch 已变化的结果会被丢弃。每条结果记下计算耗时，命中时累计为节省的时间。
+    """
+
+    def __init__(self, maxsize: int = 256):
+        """
+        Args:
+            maxsize: 最多缓存的查询数，0 表示禁用缓存
+        """
+        self.maxsize = maxsize
+        self.epoch: Optional[Hashable] = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.saved_seconds = 0.0
+        self._entries: "OrderedDict[Hashable, Tuple[List[Dict[str, Any]], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(query: str, method: str, n_results: int, params: Dict[str, Any]) -> Hashable:
+        """参数按名称排序后序列化，列表等不可哈希的值也能作为键"""
+        return (query, method, n_results, json.dumps(params, sort_keys=True, ensure_ascii=False, default=str))
+
+    def get(self, key: Hashable, epoch: Hashable) -> Optional[List[Dict[str, Any]]]:
+        """查找结果（返回副本），epoch 变化时先清空缓存"""
+        with self._lock:
+            if epoch != self.epoch:
+                if self._entries:
+                    self.invalidations += 1
+                self._entries.clear()
+                self.epoch = epoch
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self.saved_seconds += entry[1]
+            results = entry[0]
+        return copy.deepcopy(results)
+
+    def put(self, key: Hashable, epoch: Hashable, results: List[Dict[str, Any]], seconds: float):
+        """写入结果；epoch 与当前不一致（计算期间发生过写入）时忽略"""
+        if self.maxsize <= 0:
+            return
+        results = copy.deepcopy(results)
+        with self._lock:
+            if epoch != self.epoch:
+                return
+            self._entries[key] = (results, seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def info(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'invalidations': self.invalidations,
+                'saved_seconds': self.saved_seconds,
+            }
@@ -1,16 +1,44 @@
-from typing import List, Dict, Any, Optional
+import threading
+from typing import List, Dict, Any, Optional, Sequence, Tuple
+
+import numpy as np
+
+from config import settings
 from src.database import VectorManager, SQLManager
+from .query_cache import QueryEmbeddingCache, create_query_cache
 
 class SemanticSearch:
-    def __init__(self, vector_manager: VectorManager, sql_manager: SQLManager):
+    def __init__(self, vector_manager: VectorManager, sql_manager: SQLManager,
+                 query_cache: Optional[QueryEmbeddingCache] = None,
+                 aggregation: Optional[str] = None, top_m: Optional[int] = None,
+                 max_candidates: Optional[int] = None, filter_pushdown: Optional[int] = None):
+        """
+        Args:
+            query_cache: 查询向量缓存（多个检索对象可共用一个），未指定时按 settings 创建
+            aggregation: 论文得分 max（最相关分块）或 sum（最相关的 top_m 个分块之和），默认 settings.SEARCH_AGGREGATION
+            top_m: sum 汇总时每篇论文计入的分块数（默认 settings.SEARCH_TOP_M）
+            max_candidates: 加深检索时最多检查的分块数（默认 settings.SEARCH_MAX_CANDIDATES）
+            filter_pushdown: 限定的论文不超过该数量时作为 paper_id 条件下推到向量库（默认 settings.SEARCH_FILTER_PUSHDOWN）
+        """
         self.vector_manager = vector_manager
         self.sql_manager = sql_manager
+        self.query_cache = query_cache if query_cache is not None else create_query_cache(vector_manager)
+        self.aggregation = aggregation or settings.SEARCH_AGGREGATION
+        if self.aggregation not in ("max", "sum"):
+            raise ValueError(f"不支持的得分汇总方式: {self.aggregation}")
+        self.top_m = top_m or settings.SEARCH_TOP_M
+        self.max_candidates = max_candidates or settings.SEARCH_MAX_CANDIDATES
+        self.filter_pushdown = settings.SEARCH_FILTER_PUSHDOWN if filter_pushdown is None else filter_pushdown
+        self.stats = {'queries': 0, 'candidates': 0, 'requeries': 0}
+        self._stats_lock = threading.Lock()
     
     def search_papers(
         self, 
         query: str, 
         n_results: int = 10,
-        search_type: str = "fulltext"
+        search_type: str = "fulltext",
+        where: Optional[Dict[str, Any]] = None,
+        query_embedding: Optional[List[float]] = None
     ) -> List[Dict[str, Any]]:
         """语义搜索论文
         
@@ -18,44 +46,173 @@ class SemanticSearch:
             query: 查询文本
             n_results: 返回结果数量
             search_type: 搜索类型 (fulltext, abstract, analysis)
+            where: 向量元数据过滤条件（见 metadata_filters.build_where）
+            query_embedding: 预先计算的查询向量（见 embed_queries），提供时不再编码查询
         """
+        query_embeddings = None if query_embedding is None else [query_embedding]
+        return self.search_papers_batch([query], n_results, search_type, where, query_embeddings)[0]
+    
+    def search_papers_batch(
+        self,
+        queries: Sequence[str],
+        n_results: int = 10,
+        search_type: str = "fulltext",
+        where: Optional[Dict[str, Any]] = None,
+        query_embeddings: Optional[List[List[float]]] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """批量语义搜索：所有查询一次编码、一次向量查询，论文详情一次批量读取
+        
+        分块按论文汇总得分（见 aggregation / top_m），某个查询不足 n_results 篇论文时
+        只对这些查询加深检索，直到找够或检查的分块数达到 max_candidates。
+        
+        Returns:
+            与 queries 对应的结果列表，每篇论文带 relevance_score 和 matched_chunks（命中的分块数）
+        """
+        ranked = self.rank_papers_batch(queries, n_results, search_type, where, query_embeddings)
+        
+        # 所有查询涉及的论文一次取出
+        all_ids = list(dict.fromkeys(paper_id for paper_ids, _, _ in ranked for paper_id in paper_ids))
+        papers = {paper['id']: paper for paper in self.sql_manager.get_papers(all_ids)}
+        
+        batches = []
+        for paper_ids, scores, matched in ranked:
+            batch = []
+            for paper_id in paper_ids:
+                if paper_id in papers:
+                    # 同一论文可能出现在多个查询结果中，分别复制后添加相关度分数
+                    paper = dict(papers[paper_id])
+                    paper['relevance_score'] = scores[paper_id]
+                    paper['matched_chunks'] = matched[paper_id]
+                    batch.append(paper)
+            batches.append(batch)
+        return batches
+    
+    def rank_papers_batch(
+        self,
+        queries: Sequence[str],
+        n_results: int = 10,
+        search_type: str = "fulltext",
+        where: Optional[Dict[str, Any]] = None,
+        query_embeddings: Optional[List[List[float]]] = None,
+        allowed_ids: Optional[Sequence[int]] = None
+    ) -> List[Tuple[List[int], Dict[int, float], Dict[int, int]]]:
+        """只做向量检索与按论文汇总，不读取论文详情（参数同 search_papers_batch）
+        
+        Args:
+            allowed_ids: 只返回这些论文（如 SQLManager.filter_paper_ids 的结果）；不超过 filter_pushdown 篇时
+                         作为 paper_id $in 条件下推到向量库，否则在检索结果中过滤，不足时同样加深检索
         
-        # 向量搜索
+        Returns:
+            每个查询的 (按得分降序的论文ID, 论文ID -> 得分, 论文ID -> 命中的分块数)
+        """
         if search_type == "fulltext":
-            results = self.vector_manager.search_fulltext(query, n_results * 2)
+            search = self.vector_manager.search_fulltext_batch
+            # 每篇论文可能命中多个分块，先多取一些
+            fetch = n_results * max(self.top_m, 2)
         elif search_type == "abstract":
-            results = self.vector_manager.search_abstracts(query, n_results)
+            search = self.vector_manager.search_abstracts_batch
+            fetch = n_results
         elif search_type == "analysis":
-            results = self.vector_manager.search_analysis(query, n_results)
+            search = self.vector_manager.search_analysis_batch
+            fetch = n_results
         else:
             raise ValueError(f"不支持的搜索类型: {search_type}")
         
-        # 提取paper_id并去重
-        paper_ids = []
-        seen = set()
-        
-        if results['metadatas']:
-            for metadata in results['metadatas'][0]:
-                paper_id = metadata.get('paper_id')
-                if paper_id and paper_id not in seen:
-                    paper_ids.append(paper_id)
-                    seen.add(paper_id)
-                    if len(paper_ids) >= n_results:
-                        break
-        
-        # 获取论文详情
-        papers = []
-        for paper_id in paper_ids:
-            paper = self.sql_manager.get_paper(paper_id)
-            if paper:
-                # 添加相关度分数
-                idx = results['metadatas'][0].index(
-                    next(m for m in results['metadatas'][0] if m.get('paper_id') == paper_id)
-                )
-                paper['relevance_score'] = 1 - results['distances'][0][idx] if results['distances'] else 0
-                papers.append(paper)
-        
-        return papers
+        allowed = None
+        if allowed_ids is not None:
+            if not allowed_ids:
+                return [([], {}, {}) for _ in queries]
+            if len(allowed_ids) <= self.filter_pushdown:
+                condition = {"paper_id": {"$in": [int(paper_id) for paper_id in allowed_ids]}}
+                where = {"$and": [where, condition]} if where else condition
+            else:
+                allowed = np.unique(np.asarray(allowed_ids, dtype=np.int64))
+        
+        if query_embeddings is None:
+            query_embeddings = self.embed_queries(queries)
+        
+        ranked: List[Optional[Tuple[List[int], Dict[int, float], Dict[int, int]]]] = [None] * len(queries)
+        pending = list(range(len(queries)))
+        candidates = requeries = 0
+        while pending:
+            results = search([queries[i] for i in pending], fetch, where, [query_embeddings[i] for i in pending])
+            unfinished = []
+            for i, result in zip(pending, results):
+                paper_ids, distances = self._chunk_hits(result)
+                ranked[i] = self._rank_papers(paper_ids, distances, n_results, allowed)
+                candidates += len(paper_ids)
+                # 返回的分块数小于请求数说明已经取完
+                if len(ranked[i][0]) < n_results and len(paper_ids) >= fetch and fetch < self.max_candidates:
+                    unfinished.append(i)
+            pending = unfinished
+            if pending:
+                fetch = min(fetch * 2, self.max_candidates)
+                requeries += 1
+        
+        with self._stats_lock:
+            self.stats['queries'] += len(queries)
+            self.stats['candidates'] += candidates
+            self.stats['requeries'] += requeries
+        return ranked
+    
+    def embed_queries(self, queries: Sequence[str]) -> List[List[float]]:
+        """计算查询向量，优先使用缓存（相同或只差空白的查询不再调用模型）"""
+        if self.query_cache is None:
+            return self.vector_manager.embed_queries(queries)
+        return self.query_cache.embed(self.vector_manager, queries)
+    
+    def search_stats(self) -> Dict[str, Any]:
+        """累计统计：查询数、检查的分块候选数、加深检索次数"""
+        with self._stats_lock:
+            stats = dict(self.stats)
+        stats['candidates_per_query'] = stats['candidates'] / stats['queries'] if stats['queries'] else 0.0
+        return stats
+    
+    @staticmethod
+    def _chunk_hits(result: Dict[str, Any]) -> Tuple[np.ndarray, np.ndarray]:
+        """单个查询结果中每个分块的 (paper_id, 距离)，没有 paper_id 的分块记为 0"""
+        metadatas = result['metadatas'][0] if result.get('metadatas') else []
+        paper_ids = np.fromiter(((metadata or {}).get('paper_id') or 0 for metadata in metadatas),
+                                dtype=np.int64, count=len(metadatas))
+        distances = result['distances'][0] if result.get('distances') else None
+        distances = np.asarray(distances if distances else [1.0] * len(metadatas), dtype=np.float64)
+        return paper_ids, distances
+    
+    def _rank_papers(self, paper_ids: np.ndarray, distances: np.ndarray, n_results: int,
+                     allowed: Optional[np.ndarray] = None) -> Tuple[List[int], Dict[int, float], Dict[int, int]]:
+        """按论文汇总分块得分（一次向量化计算）
+        
+        分块已按距离升序排列：每篇论文取排名最靠前的 m 个分块（max 时 m=1）得分之和，
+        得分相同的论文按最先出现的顺序排列。allowed 不为空时只保留其中的论文。
+        
+        Returns:
+            (前 n_results 篇论文ID, 论文ID -> 得分, 论文ID -> 命中的分块数)
+        """
+        valid = paper_ids > 0
+        if allowed is not None:
+            valid &= np.isin(paper_ids, allowed)
+        paper_ids, scores = paper_ids[valid], 1 - distances[valid]
+        if not len(paper_ids):
+            return [], {}, {}
+        
+        unique, first, inverse, counts = np.unique(paper_ids, return_index=True, return_inverse=True,
+                                                   return_counts=True)
+        # 每个分块在本论文内的名次
+        order = np.argsort(inverse, kind='stable')
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(len(order)) - starts[inverse[order]]
+        
+        top_m = 1 if self.aggregation == "max" else self.top_m
+        keep = rank < top_m
+        totals = np.bincount(inverse[keep], weights=scores[keep], minlength=len(unique))
+        
+        best = np.lexsort((first, -totals))[:n_results]
+        return (
+            unique[best].tolist(),
+            dict(zip(unique[best].tolist(), totals[best].tolist())),
+            dict(zip(unique[best].tolist(), counts[best].tolist())),
+        )
     
     def search_similar_papers(
         self, 
@@ -65,7 +222,7 @@ class SemanticSearch:
         """查找相似论文"""
         
         # 获取论文
-        paper = self.sql_manager.get_paper(paper_id)
+        paper = self.sql_manager.get_paper(paper_id, columns=('title', 'markdown_text'))
         if not paper:
             return []
         
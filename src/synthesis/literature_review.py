@@ -80,9 +80,11 @@ class LiteratureReviewGenerator:
         
         papers_text = []
         
+        # 批量获取分析信息
+        analyses = self.sql_manager.get_analyses([paper['id'] for paper in papers])
+        
         for i, paper in enumerate(papers, 1):
-            # 获取分析信息
-            analysis = self.sql_manager.get_paper_analysis(paper['id'])
+            analysis = analyses.get(paper['id'])
             
             paper_info = f"\n[{i}] {paper['title']}"
             
@@ -7,6 +7,11 @@ sys.path.insert(0, str(project_root))
 from config import settings
 from src.database import SQLManager, VectorManager
 from src.retrieval import QueryEngine
+from src.retrieval.query_cache import QueryEmbeddingCache
+from src.retrieval.result_cache import ResultCache
+from src.retrieval.semantic_search import SemanticSearch
+from src.retrieval.fusion import fuse, make_run
+from src.retrieval.hybrid_search import HybridSearch
 
 def test_semantic_search():
     """测试语义搜索"""
@@ -87,7 +92,251 @@ def test_list_papers():
         if paper.get('keywords'):
             print(f"关键词: {', '.join(paper['keywords'][:3])}")
 
+def test_query_cache():
+    """测试查询向量缓存：重复和只差空白的查询不再调用模型"""
+    class CountingEmbedder:
+        model_id = "test-model"
+    
+    class CountingVectors:
+        embedder = CountingEmbedder()
+        
+        def __init__(self):
+            self.calls = []
+        
+        def embed_queries(self, queries):
+            self.calls.append(list(queries))
+            return [[float(len(query)), 1.0] for query in queries]
+    
+    vectors = CountingVectors()
+    cache = QueryEmbeddingCache(maxsize=2)
+    
+    first = cache.embed(vectors, ["deep learning", "deep  learning ", "graphs"])
+    assert vectors.calls == [["deep learning", "graphs"]]
+    assert first[0] == first[1] == [13.0, 1.0]
+    
+    cache.embed(vectors, ["graphs"])
+    assert len(vectors.calls) == 1
+    
+    # 超出容量时淘汰最久未使用的查询
+    cache.embed(vectors, ["transformers"])
+    cache.embed(vectors, ["deep learning"])
+    assert vectors.calls[-1] == ["deep learning"]
+    
+    # 换模型后不复用旧向量
+    vectors.embedder = type("OtherEmbedder", (), {"model_id": "other-model"})()
+    cache.embed(vectors, ["graphs"])
+    assert vectors.calls[-1] == ["graphs"]
+    
+    info = cache.info()
+    assert info['size'] == 2 and info['hits'] == 2 and info['misses'] == 5
+    print("✓ 查询向量缓存测试通过")
+
+def test_result_cache():
+    """测试结果缓存：索引版本变化时失效，返回副本"""
+    cache = ResultCache(maxsize=2)
+    key = ResultCache.make_key("graphs", "hybrid", 5, {"venue": "ICML", "authors": ["Smith"]})
+    assert key == ResultCache.make_key("graphs", "hybrid", 5, {"authors": ["Smith"], "venue": "ICML"})
+    
+    assert cache.get(key, (1, 0)) is None
+    cache.put(key, (1, 0), [{"id": 1, "title": "A"}], seconds=0.5)
+    
+    cached = cache.get(key, (1, 0))
+    cached[0]["title"] = "changed"
+    assert cache.get(key, (1, 0)) == [{"id": 1, "title": "A"}]
+    
+    # 新增或删除论文后 epoch 变化，旧结果不再返回
+    assert cache.get(key, (2, 0)) is None
+    # 计算期间 epoch 已变化的结果不写入
+    cache.put(key, (1, 0), [{"id": 1}], seconds=0.5)
+    assert cache.get(key, (2, 0)) is None
+    
+    info = cache.info()
+    assert info['hits'] == 2 and info['misses'] == 3 and info['invalidations'] == 1
+    assert info['saved_seconds'] == 1.0
+    print("✓ 结果缓存测试通过")
+
+def test_grouped_search():
+    """测试按论文汇总分块得分：长论文占据前列时加深检索，仍返回 n 篇论文"""
+    # 论文 1 的 30 个分块最相关，其后是论文 2、3 的分块
+    chunks = [(1, 0.1 + i * 0.001) for i in range(30)] + [(2, 0.3), (3, 0.35), (3, 0.36), (2, 0.5)]
+    
+    class ChunkVectors:
+        def __init__(self):
+            self.requests = []
+        
+        def search_fulltext_batch(self, queries, n_results, where=None, query_embeddings=None):
+            self.requests.append(n_results)
+            hits = chunks[:n_results]
+            return [{
+                'metadatas': [[{'paper_id': paper_id} for paper_id, _ in hits]],
+                'distances': [[distance for _, distance in hits]],
+            } for _ in queries]
+    
+    class Papers:
+        def get_papers(self, ids):
+            return [{'id': paper_id, 'title': f"Paper {paper_id}"} for paper_id in ids]
+    
+    vectors = ChunkVectors()
+    search = SemanticSearch(vectors, Papers(), query_cache=None, aggregation="max")
+    results = search.search_papers("q", n_results=3, query_embedding=[0.0])
+    assert [paper['id'] for paper in results] == [1, 2, 3]
+    assert vectors.requests == [9, 18, 36]
+    assert abs(results[0]['relevance_score'] - 0.9) < 1e-9
+    assert results[0]['matched_chunks'] == 30 and results[2]['matched_chunks'] == 2
+    assert search.search_stats()['candidates'] == 9 + 18 + 34
+    
+    # sum 汇总：多个相关分块的论文排在只有一个分块的论文之前
+    search = SemanticSearch(vectors, Papers(), query_cache=None, aggregation="sum", top_m=2)
+    results = search.search_papers("q", n_results=3, query_embedding=[0.0])
+    scores = {paper['id']: paper['relevance_score'] for paper in results}
+    assert abs(scores[3] - (0.65 + 0.64)) < 1e-9 and abs(scores[2] - (0.7 + 0.5)) < 1e-9
+    assert [paper['id'] for paper in results] == [1, 3, 2]
+    print("✓ 论文分组检索测试通过")
+
+def test_batched_semantic_search():
+    """测试批量语义检索：一次向量查询、一次读取论文，同一论文在各查询结果中互不影响"""
+    hits = {
+        "rl": [(1, 0.1), (2, 0.2)],
+        "graphs": [(2, 0.15), (3, 0.3)],
+    }
+    
+    class BatchVectors:
+        def __init__(self):
+            self.requests = []
+        
+        def search_fulltext_batch(self, queries, n_results, where=None, query_embeddings=None):
+            self.requests.append(list(queries))
+            return [{
+                'metadatas': [[{'paper_id': paper_id} for paper_id, _ in hits[query]]],
+                'distances': [[distance for _, distance in hits[query]]],
+            } for query in queries]
+    
+    class Papers:
+        def __init__(self):
+            self.requests = []
+        
+        def get_papers(self, ids):
+            self.requests.append(list(ids))
+            return [{'id': paper_id, 'title': f"Paper {paper_id}"} for paper_id in ids]
+    
+    vectors, papers = BatchVectors(), Papers()
+    search = SemanticSearch(vectors, papers, query_cache=None, aggregation="max")
+    results = search.search_papers_batch(["rl", "graphs"], n_results=2, query_embeddings=[[0.0], [1.0]])
+    
+    assert vectors.requests == [["rl", "graphs"]]
+    assert papers.requests == [[1, 2, 3]]
+    assert [[paper['id'] for paper in batch] for batch in results] == [[1, 2], [2, 3]]
+    assert abs(results[0][1]['relevance_score'] - 0.8) < 1e-9
+    assert abs(results[1][0]['relevance_score'] - 0.85) < 1e-9
+    assert results[0][1] is not results[1][0]
+    print("✓ 批量语义检索测试通过")
+
+def test_fusion():
+    """测试融合方式：rrf 只看名次，分数融合不受各路尺度影响"""
+    semantic = make_run([(1, 0.82), (2, 0.80), (3, 0.79)])
+    keyword = make_run([(3, 25.0), (4, 3.0)])
+    
+    ids, scores = fuse([semantic, keyword], method="rrf", k=60)
+    assert ids.tolist() == [3, 1, 2, 4]
+    assert abs(scores[0] - (1 / 63 + 1 / 61) / (2 / 61)) < 1e-12
+    
+    # min-max 后各路末尾的论文贡献为 0
+    ids, scores = fuse([semantic, keyword], [0.7, 0.3], method="minmax")
+    assert ids.tolist() == [1, 3, 2, 4] and scores[-1] == 0.0
+    
+    # z-score：没有出现在某一路的论文不比该路末尾的论文得分高
+    ids, _ = fuse([semantic, keyword], method="zscore")
+    assert ids.tolist().index(4) > ids.tolist().index(3)
+    
+    # 旧版按最大值归一化，关键词分数尺度大时压过语义分数
+    ids, _ = fuse([semantic, keyword], [0.7, 0.3], method="max")
+    assert ids.tolist()[:2] == [3, 1]
+    
+    empty = make_run([])
+    assert fuse([empty, empty])[0].tolist() == []
+    try:
+        fuse([semantic], method="unknown")
+        assert False
+    except ValueError:
+        pass
+    print("✓ 结果融合测试通过")
+
+def test_filtered_search():
+    """测试高级搜索的过滤：两路检索的作者匹配规则一致，旧向量没有年份/作者元数据也能过滤，
+    年份未知的论文默认保留"""
+    db_path = project_root / "data" / "database" / "test_filtered_search.db"
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    if db_path.exists():
+        db_path.unlink()
+    
+    sql_manager = SQLManager(str(db_path))
+    ids = list(sql_manager.add_papers_bulk([
+        sql_manager.build_record(f"/tmp/filtered_{i}.pdf", {"title": title, "authors": authors, "year": year},
+                                 pdf_hash=f"filtered-{i}")
+        for i, (title, authors, year) in enumerate([
+            ("Graph networks", ["Alice Smith"], 2019),
+            ("Graph kernels", ["Bob Lee"], 2021),
+            ("Graph search", ["Carol Smithson"], 2022),
+            ("Graph sampling", ["Eve Jones"], None),
+        ])
+    ]).values())
+    
+    # 旧版本写入的分块只有 paper_id
+    chunks = [(ids[1], 0.1), (ids[1], 0.12), (ids[0], 0.2), (ids[2], 0.3), (ids[3], 0.4)]
+    
+    class LegacyVectors:
+        db_path = project_root / "data" / "database"
+        
+        def __init__(self):
+            self.wheres = []
+        
+        def search_fulltext_batch(self, queries, n_results, where=None, query_embeddings=None):
+            self.wheres.append(where)
+            allowed = where["paper_id"]["$in"] if where else None
+            hits = [(paper_id, d) for paper_id, d in chunks if allowed is None or paper_id in allowed][:n_results]
+            return [{
+                'metadatas': [[{'paper_id': paper_id} for paper_id, _ in hits]],
+                'distances': [[distance for _, distance in hits]],
+            } for _ in queries]
+    
+    vectors = LegacyVectors()
+    search = HybridSearch(vectors, sql_manager, fusion="max")
+    
+    # 只写姓的一部分：两路都命中 Smith 和 Smithson
+    results = search.advanced_search("graph", authors=["smi"], n_results=5, query_embedding=[0.0])
+    assert {paper['id'] for paper in results} == {ids[0], ids[2]}
+    assert all('relevance_score' in paper and 'keyword_score' in paper for paper in results)
+    assert vectors.wheres[-1] == {"paper_id": {"$in": [ids[0], ids[2]]}}
+    
+    # 满足条件的论文较多时不下推，在检索结果中过滤
+    search.semantic_search.filter_pushdown = 1
+    results = search.advanced_search("graph", authors=["SMI"], n_results=5, query_embedding=[0.0])
+    assert {paper['id'] for paper in results} == {ids[0], ids[2]}
+    assert vectors.wheres[-1] is None
+    
+    assert search.advanced_search("graph", authors=["nobody"], query_embedding=[0.0]) == []
+    
+    # 年份范围默认不排除年份未知的论文（与旧版相同），可以显式排除
+    search.semantic_search.filter_pushdown = 100
+    results = search.advanced_search("graph", year_from=2020, n_results=5, query_embedding=[0.0])
+    assert {paper['id'] for paper in results} == {ids[1], ids[2], ids[3]}
+    assert all('relevance_score' in paper and 'keyword_score' in paper for paper in results)
+    results = search.advanced_search("graph", year_from=2020, n_results=5, query_embedding=[0.0],
+                                     include_unknown_year=False)
+    assert {paper['id'] for paper in results} == {ids[1], ids[2]}
+    assert all('relevance_score' in paper and 'keyword_score' in paper for paper in results)
+    assert sql_manager.filter_paper_ids(year_to=2019, include_unknown_year=False) == [ids[0]]
+    sql_manager.close()
+    print("✓ 过滤检索测试通过")
+
 if __name__ == "__main__":
+    test_query_cache()
+    test_result_cache()
+    test_grouped_search()
+    test_batched_semantic_search()
+    test_fusion()
+    test_filtered_search()
+    
     print("请确保数据库中已有论文数据\n")
     
     test_semantic_search()
@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 """测试 SQLManager 的 add_paper 功能"""
 
+import os
 import sys
 from pathlib import Path
 
@@ -92,5 +93,736 @@ def test_add_paper():
     
     print("\n✅ 所有测试通过！")
 
+def test_read_during_write():
+    """测试写事务未提交时其他线程仍可读取（WAL）"""
+    import threading
+    
+    db_path = project_root / "data" / "database" / "test_wal.db"
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    if db_path.exists():
+        db_path.unlink()
+    
+    sql_manager = SQLManager(str(db_path))
+    assert sql_manager.get_connection().execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    
+    # 同一线程复用同一个连接
+    assert sql_manager.get_connection() is sql_manager.get_connection()
+    
+    results = []
+    with sql_manager.transaction() as conn:
+        conn.execute("INSERT INTO papers (title, pdf_path) VALUES (?, ?)", ("Pending", "/tmp/pending.pdf"))
+        
+        # 写事务进行中，另一个线程读取不应阻塞，也看不到未提交的数据
+        reader = threading.Thread(target=lambda: results.append(len(sql_manager.get_all_papers())))
+        reader.start()
+        reader.join(timeout=5)
+    
+    assert results == [0]
+    assert len(sql_manager.get_all_papers()) == 1
+    sql_manager.close()
+    print("✓ WAL 并发读取测试通过")
+
+def test_thread_connections():
+    """测试短生命周期线程退出后连接被释放（Streamlit 每次交互都在新线程中运行）"""
+    import threading
+    
+    db_path = project_root / "data" / "database" / "test_threads.db"
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    if db_path.exists():
+        db_path.unlink()
+    
+    sql_manager = SQLManager(str(db_path))
+    sql_manager.add_papers_bulk([sql_manager.build_record("/tmp/thread.pdf", {"title": "Thread"}, pdf_hash="thread")])
+    
+    results = []
+    for _ in range(50):
+        worker = threading.Thread(target=lambda: results.append(len(sql_manager.get_all_papers())))
+        worker.start()
+        worker.join(timeout=5)
+    
+    assert results == [1] * 50
+    # 只剩主线程的连接
+    assert sql_manager.pool.open_connections() == 1
+    
+    # 存活的线程各自保留连接，close_all 全部关闭
+    release = threading.Event()
+    started = threading.Barrier(4)
+    
+    def hold():
+        sql_manager.get_connection()
+        started.wait(timeout=5)
+        release.wait(timeout=5)
+    
+    workers = [threading.Thread(target=hold) for _ in range(3)]
+    for worker in workers:
+        worker.start()
+    started.wait(timeout=5)
+    assert sql_manager.pool.open_connections() == 4
+    release.set()
+    for worker in workers:
+        worker.join(timeout=5)
+    assert sql_manager.pool.open_connections() == 1
+    
+    sql_manager.close()
+    assert sql_manager.pool.open_connections() == 0
+    print("✓ 线程连接释放测试通过")
+
+def test_add_papers_bulk():
+    """测试批量添加论文（批内与库内查重）"""
+    db_path = project_root / "data" / "database" / "test_bulk.db"
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    if db_path.exists():
+        db_path.unlink()
+    
+    sql_manager = SQLManager(str(db_path))
+    existing_id = sql_manager.add_paper(pdf_path=create_test_pdf(), meta=ArticleMetadata(title="Existing"))
+    
+    records = [
+        sql_manager.build_record(f"/tmp/bulk_{i}.pdf", {"title": f"Paper {i}", "authors": ["A", "B"]},
+                                 pdf_hash=f"hash-{i}", raw_text="text")
+        for i in range(5)
+    ]
+    # 批内重复、库内重复
+    records.append(sql_manager.build_record("/tmp/bulk_dup.pdf", {"title": "Dup"}, pdf_hash="hash-0"))
+    records.append(sql_manager.build_record("/tmp/bulk_old.pdf", {"title": "Old"},
+                                            pdf_hash=sql_manager.get_paper(existing_id)['pdf_hash']))
+    
+    ids = sql_manager.add_papers_bulk(records)
+    
+    assert len(set(ids.values())) == 6
+    assert ids["/tmp/bulk_dup.pdf"] == ids["/tmp/bulk_0.pdf"]
+    assert ids["/tmp/bulk_old.pdf"] == existing_id
+    assert sql_manager.get_paper(ids["/tmp/bulk_3.pdf"])['authors'] == "A, B"
+    assert len(sql_manager.get_all_papers()) == 6
+    
+    # 传入 Path 对象（上传组件、导入脚本）
+    assert sql_manager.add_paper(pdf_path=Path(create_test_pdf()), meta=ArticleMetadata(title="Existing")) == existing_id
+    path_pdf = project_root / "data" / "pdfs" / "test_path.pdf"
+    path_pdf.write_bytes(b"Another test PDF passed as a Path.")
+    path_id = sql_manager.add_paper_from_metadata({"title": "Path"}, path_pdf, raw_text="text")
+    assert sql_manager.get_paper(path_id)['pdf_path'] == str(path_pdf)
+    sql_manager.close()
+    print("✓ 批量添加测试通过")
+
+def test_keyword_search():
+    """测试 FTS5 关键词搜索与触发器同步"""
+    db_path = project_root / "data" / "database" / "test_fts.db"
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    if db_path.exists():
+        db_path.unlink()
+    
+    sql_manager = SQLManager(str(db_path))
+    ids = sql_manager.add_papers_bulk([
+        sql_manager.build_record("/tmp/fts_1.pdf", {"title": "Reinforcement Learning for Scheduling"},
+                                 pdf_hash="fts-1", raw_text="job shop scheduling with curiosity"),
+        sql_manager.build_record("/tmp/fts_2.pdf", {"title": "Graph Neural Networks"},
+                                 pdf_hash="fts-2", raw_text="message passing on graphs, scheduling appendix"),
+    ])
+    
+    results = sql_manager.search_keywords("scheduling")
+    assert [p['id'] for p in results] == [ids["/tmp/fts_1.pdf"], ids["/tmp/fts_2.pdf"]]
+    assert 'raw_text' not in results[0]
+    assert results[0]['keyword_score'] > results[1]['keyword_score']
+    
+    # 更新后索引同步
+    with sql_manager.transaction() as conn:
+        conn.execute("UPDATE papers SET title = 'Transformers' WHERE id = ?", (ids["/tmp/fts_1.pdf"],))
+    assert sql_manager.search_keywords("reinforcement") == []
+    assert sql_manager.search_keywords("transformers")[0]['id'] == ids["/tmp/fts_1.pdf"]
+    sql_manager.close()
+    print("✓ 关键词搜索测试通过")
+
+def test_list_papers():
+    """测试投影列、游标分页与批量遍历"""
+    db_path = project_root / "data" / "database" / "test_list.db"
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    if db_path.exists():
+        db_path.unlink()
+    
+    sql_manager = SQLManager(str(db_path))
+    sql_manager.add_papers_bulk([
+        sql_manager.build_record(f"/tmp/list_{i}.pdf", {"title": f"Paper {i}", "keywords": ["k"]},
+                                 pdf_hash=f"list-{i}", raw_text="x" * 1000)
+        for i in range(7)
+    ])
+    
+    seen = []
+    cursor = None
+    while True:
+        papers, cursor = sql_manager.list_papers(columns=('title', 'keywords'), cursor=cursor, limit=3)
+        seen.extend(p['id'] for p in papers)
+        assert all(set(p) == {'id', 'title', 'keywords', 'keywords_list'} for p in papers)
+        if cursor is None:
+            break
+    assert seen == sorted(seen, reverse=True) and len(seen) == 7
+    
+    scanned = list(sql_manager.iter_papers(columns=('raw_text',), batch_size=2))
+    assert [p['id'] for p in scanned] == sorted(seen)
+    assert all(len(p['raw_text']) == 1000 for p in scanned)
+    
+    # 按添加时间倒序遍历（与 get_all_papers 顺序相同），沿索引读取不需要排序
+    with sql_manager.transaction() as conn:
+        conn.execute("UPDATE papers SET created_at = '2100-01-01 00:00:00' WHERE id = ?", (seen[-1],))
+    newest = [p['id'] for p in sql_manager.iter_papers(columns=('title', 'created_at'), batch_size=2, newest_first=True)]
+    assert newest == [seen[-1]] + seen[:-1]
+    assert newest == [p['id'] for p in sql_manager.get_all_papers()]
+    plan = sql_manager.get_connection().execute(
+        "EXPLAIN QUERY PLAN SELECT id FROM papers ORDER BY created_at DESC, id DESC"
+    ).fetchall()
+    assert not any('TEMP B-TREE' in row['detail'] for row in plan)
+    
+    try:
+        sql_manager.list_papers(columns=('id; DROP TABLE papers',))
+        assert False, "非法列名应该报错"
+    except ValueError:
+        pass
+    sql_manager.close()
+    print("✓ 分页与遍历测试通过")
+
+def test_library_stats():
+    """测试触发器维护的统计信息"""
+    db_path = project_root / "data" / "database" / "test_stats.db"
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    if db_path.exists():
+        db_path.unlink()
+    
+    sql_manager = SQLManager(str(db_path))
+    ids = sql_manager.add_papers_bulk([
+        sql_manager.build_record("/tmp/stats_1.pdf", {"title": "A", "year": 2023, "ai_summary": "summary"},
+                                 pdf_hash="stats-1"),
+        sql_manager.build_record("/tmp/stats_2.pdf", {"title": "B", "year": 2023}, pdf_hash="stats-2"),
+        sql_manager.build_record("/tmp/stats_3.pdf", {"title": "C"}, pdf_hash="stats-3"),
+    ])
+    sql_manager.set_chunk_counts({ids["/tmp/stats_1.pdf"]: 10, ids["/tmp/stats_2.pdf"]: 5})
+    
+    # 已分析数按 paper_analysis 统计，只有 ai_summary 不算
+    sql_manager.save_analyses_bulk({ids["/tmp/stats_2.pdf"]: {'methodology': "RL"}})
+    stats = sql_manager.get_library_stats()
+    assert stats == {'papers': 3, 'analyzed': 1, 'unanalyzed': 2, 'chunks': 15,
+                     'by_year': {None: 1, 2023: 2}}
+    
+    # 覆盖写入不重复计数
+    sql_manager.save_analyses_bulk({ids["/tmp/stats_2.pdf"]: {'methodology': "GA"},
+                                    ids["/tmp/stats_3.pdf"]: {'methodology': "RL"}})
+    assert sql_manager.get_library_stats()['analyzed'] == 2
+    assert sql_manager.get_library_stats()['analyzed'] == len(sql_manager.get_analyses(list(ids.values())))
+    
+    # 删除论文时分析结果级联删除，已分析数随之减少
+    with sql_manager.transaction() as conn:
+        conn.execute("UPDATE papers SET year = 2024 WHERE id = ?", (ids["/tmp/stats_3.pdf"],))
+        conn.execute("DELETE FROM papers WHERE id = ?", (ids["/tmp/stats_2.pdf"],))
+    
+    stats = sql_manager.get_library_stats()
+    assert stats == {'papers': 2, 'analyzed': 1, 'unanalyzed': 1, 'chunks': 10,
+                     'by_year': {2023: 1, 2024: 1}}
+    assert sql_manager.get_unanalyzed_ids() == [ids["/tmp/stats_1.pdf"]]
+    
+    sql_manager.rebuild_stats()
+    assert sql_manager.get_library_stats() == stats
+    sql_manager.close()
+    print("✓ 统计信息测试通过")
+
+def test_batched_lookups():
+    """测试 get_papers / get_analyses 批量查询保持请求顺序"""
+    db_path = project_root / "data" / "database" / "test_batch.db"
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    if db_path.exists():
+        db_path.unlink()
+    
+    sql_manager = SQLManager(str(db_path))
+    ids = list(sql_manager.add_papers_bulk([
+        sql_manager.build_record(f"/tmp/batch_{i}.pdf", {"title": f"Paper {i}"}, pdf_hash=f"batch-{i}")
+        for i in range(4)
+    ]).values())
+    sql_manager.save_paper_analysis(ids[2], {"research_question": "Q2", "keywords": ["a"]})
+    sql_manager.save_paper_analysis(ids[0], {"research_question": "Q0", "keywords": []})
+    
+    requested = [ids[3], 9999, ids[0], ids[2], ids[0]]
+    papers = sql_manager.get_papers(requested)
+    assert [p['id'] for p in papers] == [ids[3], ids[0], ids[2]]
+    
+    analyses = sql_manager.get_analyses(requested)
+    assert list(analyses) == [ids[0], ids[2]]
+    assert analyses[ids[2]]['research_question'] == "Q2"
+    assert sql_manager.get_paper_analysis(ids[1]) is None
+    sql_manager.close()
+    print("✓ 批量查询测试通过")
+
+def test_text_store():
+    """测试全文压缩存储：去重、按需读取"""
+    db_path = project_root / "data" / "database" / "test_text.db"
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    if db_path.exists():
+        db_path.unlink()
+    
+    sql_manager = SQLManager(str(db_path))
+    text = "Reinforcement learning for scheduling. " * 200
+    ids = sql_manager.add_papers_bulk([
+        sql_manager.build_record("/tmp/text_1.pdf", {"title": "A"}, pdf_hash="text-1",
+                                 raw_text=text, markdown_text=text),
+        sql_manager.build_record("/tmp/text_2.pdf", {"title": "B"}, pdf_hash="text-2", raw_text=text),
+    ])
+    
+    conn = sql_manager.get_connection()
+    count, size, stored = conn.execute("SELECT COUNT(*), SUM(size), SUM(length(data)) FROM text_blobs").fetchone()
+    assert count == 1 and size == len(text) and stored < len(text) / 10
+    
+    # 默认只返回元数据
+    paper = sql_manager.get_paper(ids["/tmp/text_1.pdf"])
+    assert 'raw_text' not in paper and 'raw_text_hash' not in paper
+    
+    paper = sql_manager.get_paper(ids["/tmp/text_2.pdf"], columns=('title', 'raw_text', 'markdown_text'))
+    assert paper['raw_text'] == text and paper['markdown_text'] is None
+    
+    # 正文仍然可以被关键词搜索到
+    assert len(sql_manager.search_keywords("reinforcement")) == 2
+    sql_manager.close()
+    print("✓ 全文存储测试通过")
+
+def test_fingerprint_cache():
+    """测试文件指纹缓存与解析前查重"""
+    from src.database.fingerprint import FileFingerprinter
+    
+    db_path = project_root / "data" / "database" / "test_fingerprint.db"
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    if db_path.exists():
+        db_path.unlink()
+    
+    sql_manager = SQLManager(str(db_path))
+    pdf_path = create_test_pdf()
+    new_pdf = project_root / "data" / "pdfs" / "test_new.pdf"
+    new_pdf.write_bytes(b"another pdf")
+    
+    assert sql_manager.is_ingested(pdf_path) is None
+    paper_id = sql_manager.add_paper(pdf_path=pdf_path, meta=ArticleMetadata(title="Cached"))
+    assert sql_manager.find_ingested([pdf_path, str(new_pdf)]) == {pdf_path: paper_id}
+    
+    # 文件未变化时直接命中缓存，不再读取文件
+    calls = []
+    original = FileFingerprinter.compute_hash
+    FileFingerprinter.compute_hash = classmethod(lambda cls, path: calls.append(path) or original(path))
+    try:
+        sql_manager.fingerprints.fingerprint(pdf_path)
+        assert calls == []
+        
+        # 写入指纹缓存不会清空论文记录缓存
+        generation = sql_manager.cache.generation
+        new_pdf.write_bytes(b"another pdf, modified")
+        sql_manager.fingerprints.fingerprint(str(new_pdf))
+        assert calls == [str(new_pdf.resolve())]
+        assert sql_manager.cache.generation == generation
+        
+        # 经符号链接、相对路径访问同一文件同样命中缓存
+        link = new_pdf.with_name("test_link.pdf")
+        if link.is_symlink() or link.exists():
+            link.unlink()
+        link.symlink_to(new_pdf)
+        relative = os.path.relpath(new_pdf)
+        assert sql_manager.fingerprints.fingerprint_many([str(link), relative]) == {
+            str(link): sql_manager.fingerprints.fingerprint(str(new_pdf)),
+            relative: sql_manager.fingerprints.fingerprint(str(new_pdf)),
+        }
+        assert calls == [str(new_pdf.resolve())]
+        link.unlink()
+    finally:
+        FileFingerprinter.compute_hash = original
+    
+    # 已算好的指纹可以直接查重
+    assert sql_manager.get_paper_id_by_hash(FileFingerprinter.compute_hash(pdf_path)) == paper_id
+    assert sql_manager.get_paper_id_by_hash("missing") is None
+    
+    assert FileFingerprinter.compute_hash(pdf_path) == sql_manager.get_paper(paper_id)['pdf_hash']
+    sql_manager.close()
+    print("✓ 文件指纹测试通过")
+
+def test_paper_analysis():
+    """测试分析结果的批量写入、读取与版本过滤"""
+    db_path = project_root / "data" / "database" / "test_analysis.db"
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    if db_path.exists():
+        db_path.unlink()
+    
+    sql_manager = SQLManager(str(db_path))
+    assert sql_manager.schema_version == len(sql_manager._migrations())
+    
+    ids = list(sql_manager.add_papers_bulk([
+        sql_manager.build_record(f"/tmp/analysis_{i}.pdf", {"title": f"Paper {i}"}, pdf_hash=f"analysis-{i}")
+        for i in range(3)
+    ]).values())
+    
+    analysis = {
+        'research_question': "How?",
+        'methodology': "RL",
+        'main_findings': ["f1", "f2"],
+        'key_contributions': ["c1"],
+        'limitations': [],
+        'future_work': "",
+        'keywords': ["rl", "scheduling"],
+        'dataset': "custom",
+    }
+    sql_manager.save_analyses_bulk({ids[0]: analysis, ids[1]: analysis}, model="llama2", prompt_version="v1")
+    
+    loaded = sql_manager.get_paper_analysis(ids[0])
+    assert loaded['main_findings'] == ["f1", "f2"] and loaded['dataset'] == "custom"
+    assert loaded['model'] == "llama2" and loaded['prompt_version'] == "v1"
+    
+    assert sql_manager.get_unanalyzed_ids() == [ids[2]]
+    assert sql_manager.get_unanalyzed_ids(prompt_version="v2") == ids
+    
+    # 覆盖写入
+    sql_manager.save_paper_analysis(ids[1], loaded, model="llama2", prompt_version="v2")
+    assert sql_manager.get_unanalyzed_ids(prompt_version="v2") == [ids[0], ids[2]]
+    assert sql_manager.get_paper_analysis(ids[1])['dataset'] == "custom"
+    sql_manager.close()
+    print("✓ 分析结果测试通过")
+
+def test_analyze_pending():
+    """测试 PaperExtractor.analyze_pending：按版本选出待分析论文并批量写回"""
+    from src.analysis.extractor import PaperExtractor
+    
+    class FakeLLM:
+        model = "fake-llm"
+        
+        def __init__(self):
+            self.calls = 0
+        
+        def generate_structured(self, prompt, schema):
+            self.calls += 1
+            if "broken" in prompt:
+                raise RuntimeError("bad json")
+            return {'research_question': "Q", 'keywords': ["k"]}
+    
+    db_path = project_root / "data" / "database" / "test_analyze_pending.db"
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    if db_path.exists():
+        db_path.unlink()
+    
+    sql_manager = SQLManager(str(db_path))
+    texts = ["text one", "text two", "broken text", ""]
+    ids = list(sql_manager.add_papers_bulk([
+        sql_manager.build_record(f"/tmp/pending_{i}.pdf", {"title": f"Paper {i}"}, raw_text=text, pdf_hash=f"pending-{i}")
+        for i, text in enumerate(texts)
+    ]).values())
+    
+    llm = FakeLLM()
+    extractor = PaperExtractor(llm)
+    stats = extractor.analyze_pending(sql_manager, batch_size=2)
+    assert stats['selected'] == 4 and stats['analyzed'] == 2
+    assert stats['failed'] == [ids[2], ids[3]]
+    
+    saved = sql_manager.get_analyses(ids)
+    assert list(saved) == ids[:2]
+    assert saved[ids[0]]['research_question'] == "Q" and saved[ids[0]]['main_findings'] == []
+    assert saved[ids[0]]['model'] == "fake-llm" and saved[ids[0]]['prompt_version'] == extractor.prompt_version
+    
+    # 失败的论文下次仍会被选中，已分析的不再重复调用LLM
+    assert sql_manager.get_unanalyzed_ids(extractor.model, extractor.prompt_version) == ids[2:]
+    llm.calls = 0
+    extractor.analyze_pending(sql_manager)
+    assert llm.calls == 1
+    
+    # 提示词版本变化后全部重新选中
+    extractor.prompt_version = "changed"
+    assert sql_manager.get_unanalyzed_ids(extractor.model, extractor.prompt_version) == ids
+    assert extractor.analyze_pending(sql_manager, limit=1)['analyzed'] == 1
+    assert sql_manager.get_paper_analysis(ids[0])['prompt_version'] == "changed"
+    sql_manager.close()
+    print("✓ 批量分析测试通过")
+
+def test_async_sql_manager():
+    """测试异步接口：并发读取与串行写入"""
+    import asyncio
+    import threading
+    from src.database.async_sql_manager import AsyncSQLManager
+    
+    db_path = project_root / "data" / "database" / "test_async.db"
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    if db_path.exists():
+        db_path.unlink()
+    
+    async def run():
+        async with AsyncSQLManager(str(db_path)) as db:
+            records = [
+                db.sync.build_record(f"/tmp/async_{i}.pdf", {"title": f"Async paper {i}", "year": 2020 + i},
+                                     pdf_hash=f"async-{i}")
+                for i in range(5)
+            ]
+            ids = await db.add_papers_bulk(records)
+            
+            papers, hits, stats = await asyncio.gather(
+                db.get_papers(list(ids.values())),
+                db.search_keywords("async"),
+                db.get_library_stats()
+            )
+            assert len(papers) == 5 and len(hits) == 5 and stats['papers'] == 5
+            
+            scanned = [paper['id'] async for paper in db.iter_papers(batch_size=2)]
+            assert sorted(scanned) == sorted(ids.values())
+            
+            # 过滤条件传给同步接口
+            hits = await db.search_keywords("async", year_from=2023)
+            assert sorted(p['year'] for p in hits) == [2023, 2024]
+            
+            # find_ingested 会写指纹缓存，应在写线程执行
+            pdf_path = create_test_pdf()
+            threads = []
+            find_ingested = db.sync.find_ingested
+            db.sync.find_ingested = lambda paths: threads.append(threading.current_thread().name) or find_ingested(paths)
+            assert await db.find_ingested([pdf_path]) == {}
+            assert threads[0].startswith("sql-write")
+    
+    asyncio.run(run())
+    print("✓ 异步接口测试通过")
+
+def test_record_cache():
+    """测试论文记录缓存：命中统计与写入后失效"""
+    db_path = project_root / "data" / "database" / "test_cache.db"
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    if db_path.exists():
+        db_path.unlink()
+    
+    db = SQLManager(str(db_path))
+    ids = db.add_papers_bulk([
+        db.build_record(f"/tmp/cache_{i}.pdf", {"title": f"Cache paper {i}", "keywords": ["cache"]},
+                        raw_text=f"text {i}", pdf_hash=f"cache-{i}")
+        for i in range(3)
+    ])
+    paper_id = ids["/tmp/cache_0.pdf"]
+    
+    db.get_paper(paper_id)
+    paper = db.get_paper(paper_id)
+    assert db.cache_info()['hits'] == 1 and db.cache_info()['misses'] == 1
+    assert paper['keywords_list'] == ["cache"]
+    
+    # 返回的是副本，修改不影响缓存
+    paper['keywords_list'].append("mutated")
+    assert db.get_paper(paper_id)['keywords_list'] == ["cache"]
+    
+    # 投影与全文
+    paper = db.get_paper(paper_id, columns=('title', 'raw_text'))
+    assert set(paper) == {'id', 'title', 'raw_text'} and paper['raw_text'] == "text 0"
+    
+    # 本连接写入后失效
+    db.set_chunk_counts({paper_id: 7})
+    assert db.cache_info()['size'] == 0
+    assert db.get_paper(paper_id)['chunk_count'] == 7
+    
+    # 其他连接（模拟其他进程）写入后失效
+    other = SQLManager(str(db_path))
+    other.set_chunk_counts({paper_id: 9})
+    assert db.get_paper(paper_id)['chunk_count'] == 9
+    other.close()
+    
+    # 禁用缓存
+    uncached = SQLManager(str(db_path), cache_size=0)
+    uncached.get_paper(paper_id)
+    assert uncached.cache_info()['size'] == 0
+    uncached.close()
+    
+    db.close()
+    print("✓ 记录缓存测试通过")
+
+def test_change_log():
+    """测试变更日志、检查点与增量同步"""
+    from src.database.index_sync import VectorIndexSync
+    
+    db_path = project_root / "data" / "database" / "test_changes.db"
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    if db_path.exists():
+        db_path.unlink()
+    
+    class RecordingVectors:
+        def __init__(self):
+            self.abstracts, self.analyses = {}, {}
+        def add_abstract(self, paper_id, abstract, metadata=None):
+            self.abstracts[paper_id] = abstract
+        def add_analysis(self, paper_id, text, metadata=None):
+            self.analyses[paper_id] = text
+        def delete_papers(self, paper_ids):
+            for paper_id in paper_ids:
+                self.abstracts.pop(paper_id, None)
+                self.analyses.pop(paper_id, None)
+        def delete_analysis(self, paper_id):
+            self.analyses.pop(paper_id, None)
+    
+    db = SQLManager(str(db_path))
+    ids = db.add_papers_bulk([
+        db.build_record(f"/tmp/change_{i}.pdf", {"title": f"Paper {i}", "abstract": f"abstract {i}"},
+                        pdf_hash=f"change-{i}")
+        for i in range(3)
+    ])
+    first, second, third = (ids[f"/tmp/change_{i}.pdf"] for i in range(3))
+    
+    changes = db.get_changes()
+    assert [(c['paper_id'], c['entity'], c['op']) for c in changes] == [
+        (first, 'paper', 'insert'), (second, 'paper', 'insert'), (third, 'paper', 'insert')
+    ]
+    
+    # 首次同步为全量重建
+    vectors = RecordingVectors()
+    syncer = VectorIndexSync(db, vectors)
+    syncer.sync()
+    assert set(vectors.abstracts) == {first, second, third}
+    assert syncer.pending() == 0
+    
+    # 回写 chunk_count 记为 index 变更：数据版本变化，同步时不重建向量；数量不变时不记录
+    epoch = db.change_epoch()
+    db.set_chunk_counts({first: 3})
+    db.set_chunk_counts({first: 3})
+    assert [(c['paper_id'], c['op']) for c in db.get_changes(entity='index')] == [(first, 'update')]
+    assert db.change_epoch() != epoch
+    vectors.abstracts.clear()
+    assert syncer.sync()['papers'] == 0 and vectors.abstracts == {}
+    assert syncer.pending() == 0
+    
+    # 修改、分析、删除
+    with db.transaction() as conn:
+        conn.execute("UPDATE papers SET abstract = 'new abstract' WHERE id = ?", (first,))
+    db.save_paper_analysis(second, {"research_question": "why", "main_findings": ["a", "b"]})
+    with db.transaction() as conn:
+        conn.execute("DELETE FROM papers WHERE id = ?", (third,))
+    
+    epoch = db.change_epoch()
+    stats = syncer.sync()
+    assert stats['changes'] == 3 and stats['deleted_papers'] == 1
+    # 同步推进检查点，数据版本随之变化
+    assert db.change_epoch() != epoch
+    assert vectors.abstracts[first] == 'new abstract'
+    assert "why" in vectors.analyses[second]
+    assert third not in vectors.abstracts
+    assert db.get_checkpoint("vector_index") == db.latest_change_seq()
+    
+    # 所有消费者都处理过的变更可以清理
+    latest = db.latest_change_seq()
+    assert db.prune_changes() == latest
+    assert db.get_changes() == []
+    # 清理变更日志后数据版本不回退
+    assert db.change_epoch()[0] == latest
+    
+    db.close()
+    print("✓ 变更日志测试通过")
+
+def test_keyword_filters():
+    """测试关键词搜索的年份/作者/会议过滤"""
+    db_path = project_root / "data" / "database" / "test_filters.db"
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    if db_path.exists():
+        db_path.unlink()
+    
+    db = SQLManager(str(db_path))
+    db.add_papers_bulk([
+        db.build_record(f"/tmp/filter_{i}.pdf", {
+            "title": f"Graph learning {i}",
+            "year": 2016 + i,
+            "authors": ["Alice Smith" if i % 2 else "Bob Lee"],
+            "venue": "ICML" if i < 2 else "NeurIPS",
+        }, pdf_hash=f"filter-{i}")
+        for i in range(4)
+    ])
+    
+    assert len(db.search_keywords("graph learning")) == 4
+    assert {p['year'] for p in db.search_keywords("graph", year_from=2017, year_to=2018)} == {2017, 2018}
+    assert {p['authors'] for p in db.search_keywords("graph", authors=["smith"])} == {"Alice Smith"}
+    assert {p['venue'] for p in db.search_keywords("graph", venue="ICML", authors=["lee", "smith"])} == {"ICML"}
+    
+    db.close()
+    print("✓ 关键词过滤测试通过")
+
+def test_delete_and_reconcile():
+    """测试批量删除与孤立向量清理"""
+    from src.database import VectorManager
+    from src.database.reconcile import StoreReconciler, delete_papers
+    from src.database.index_generation import IndexGeneration
+    
+    db_path = project_root / "data" / "database" / "test_reconcile.db"
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    if db_path.exists():
+        db_path.unlink()
+    
+    class ListCollection:
+        def __init__(self, items):
+            self.items = dict(items)
+        def get(self, ids=None, where=None, include=(), limit=None, offset=0):
+            keys = [k for k in self.items if ids is None or k in ids]
+            if where:
+                keys = [k for k in keys if self.items[k]["paper_id"] in where["paper_id"]["$in"]]
+            keys = keys[offset:offset + limit] if limit else keys
+            return {"ids": keys, "metadatas": [self.items[k] for k in keys]}
+        def delete(self, ids):
+            for k in ids:
+                self.items.pop(k, None)
+    
+    class ListVectors(VectorManager):
+        def __init__(self, paper_ids):  # 不加载嵌入模型
+            self.db_path = db_path.parent / "test_reconcile_vectors"
+            self.vector_backend = "numpy"
+            self.generation = IndexGeneration(str(self.db_path / "index_generation.sqlite"))
+            self.fulltext_collection = ListCollection(
+                (f"paper_{p}_chunk_{i}", {"paper_id": p}) for p in paper_ids for i in range(3)
+            )
+            self.abstract_collection = ListCollection((f"paper_{p}_abstract", {"paper_id": p}) for p in paper_ids)
+            self.analysis_collection = ListCollection({})
+        def compact(self):
+            pass
+    
+    db = SQLManager(str(db_path))
+    ids = db.add_papers_bulk([
+        db.build_record(f"/tmp/reconcile_{i}.pdf", {"title": f"Paper {i}"}, raw_text=f"full text {i}",
+                        pdf_hash=f"reconcile-{i}")
+        for i in range(4)
+    ])
+    first, second, third, fourth = (ids[f"/tmp/reconcile_{i}.pdf"] for i in range(4))
+    vectors = ListVectors([first, second, third, fourth, 999])
+    
+    # 两个库同时删除，全文一并清理
+    result = delete_papers(db, vectors, [first, second])
+    assert result == {'papers': 2, 'vectors': {'fulltext': 6, 'abstracts': 2, 'analysis': 0}}
+    assert db.paper_ids() == [third, fourth]
+    assert db.get_connection().execute("SELECT COUNT(*) FROM text_blobs").fetchone()[0] == 2
+    
+    # 只删除 SQLite 时留下的向量，以及不存在的论文 999 的向量，都是孤立向量
+    db.delete_paper(third)
+    reconciler = StoreReconciler(db, vectors)
+    report = reconciler.reconcile(batch_size=2, dry_run=True)
+    assert report['orphans'] == {'fulltext': 6, 'abstracts': 2, 'analysis': 0}
+    report = reconciler.reconcile(batch_size=2)
+    assert report['scanned']['fulltext'] == 9
+    assert set(vectors.fulltext_collection.items) == {f"paper_{fourth}_chunk_{i}" for i in range(3)}
+    assert reconciler.reconcile()['orphans'] == {'fulltext': 0, 'abstracts': 0, 'analysis': 0}
+    
+    # 扫描期间导入的论文：向量被当作孤立候选，删除前重新核对后保留
+    new_id = fourth + 1
+    vectors.abstract_collection.items[f"paper_{new_id}_abstract"] = {"paper_id": new_id}
+    find_orphans = reconciler.find_orphans
+    def find_then_import(batch_size):
+        found = find_orphans(batch_size)
+        assert db.add_papers_bulk([db.build_record("/tmp/reconcile_new.pdf", {"title": "New"},
+                                                   pdf_hash="reconcile-new")]) == {"/tmp/reconcile_new.pdf": new_id}
+        return found
+    reconciler.find_orphans = find_then_import
+    report = reconciler.reconcile()
+    assert report['orphans']['abstracts'] == 1 and report['skipped']['abstracts'] == 1
+    assert f"paper_{new_id}_abstract" in vectors.abstract_collection.items
+    assert db.existing_paper_ids([fourth, new_id, 999]) == {fourth, new_id}
+    
+    db.close()
+    print("✓ 删除与清理测试通过")
+
 if __name__ == "__main__":
     test_add_paper()
+    test_read_during_write()
+    test_thread_connections()
+    test_add_papers_bulk()
+    test_keyword_search()
+    test_list_papers()
+    test_library_stats()
+    test_batched_lookups()
+    test_text_store()
+    test_fingerprint_cache()
+    test_paper_analysis()
+    test_analyze_pending()
+    test_async_sql_manager()
+    test_record_cache()
+    test_change_log()
+    test_keyword_filters()
+    test_delete_and_reconcile()
@@ -0,0 +1,592 @@
+#!/usr/bin/env python3
+"""测试 NumpyVectorStore（内存映射的精确检索向量库）"""
+
+import hashlib
+import shutil
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# 添加项目根目录到路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.database.numpy_store import NumpyVectorStore
+from src.database.metadata_filters import build_where, paper_metadata
+from src.database.embeddings import SentenceTransformerEmbedder, OnnxEmbedder, create_embedder
+from src.database.embedding_cache import EmbeddingCache
+from src.database.vector_manager import VectorManager
+
+
+def create_store(name: str, **kwargs) -> NumpyVectorStore:
+    path = project_root / "data" / "database" / name
+    if path.exists():
+        shutil.rmtree(path)
+    return NumpyVectorStore(str(path), **kwargs)
+
+
+def random_vectors(n: int, dim: int = 32, seed: int = 0) -> np.ndarray:
+    vectors = np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+class HashEmbedder(SentenceTransformerEmbedder):
+    """由文本哈希生成确定的单位向量，不加载模型；记录实际编码过的文本"""
+
+    def __init__(self, dim: int = 16, **kwargs):
+        super().__init__("test/hash-embedder", **kwargs)
+        self.dim = dim
+        self.encoded = []
+
+    def _encode(self, texts):
+        self.encoded.extend(texts)
+        seeds = [int(hashlib.sha256(text.encode("utf-8")).hexdigest()[:8], 16) for text in texts]
+        return np.stack([random_vectors(1, self.dim, seed)[0] for seed in seeds])
+
+
+def create_manager(name: str, backend: str = "numpy", **kwargs) -> VectorManager:
+    """创建使用 HashEmbedder 的 VectorManager（不需要 sentence-transformers）"""
+    path = project_root / "data" / "database" / name
+    if path.exists():
+        shutil.rmtree(path)
+    manager = VectorManager(str(path), vector_backend=backend, **kwargs)
+    manager.embedder = HashEmbedder()
+    return manager
+
+
+def test_exact_search():
+    """测试精确 top-k 与暴力计算一致"""
+    store = create_store("test_numpy_exact", dtype="float32")
+    collection = store.get_or_create_collection("chunks")
+    vectors = random_vectors(500)
+    ids = [f"v{i}" for i in range(500)]
+    for start in range(0, 500, 100):
+        collection.add(
+            ids=ids[start:start + 100],
+            embeddings=vectors[start:start + 100].tolist(),
+            metadatas=[{"paper_id": i % 7, "year": 2015 + i % 10} for i in range(start, start + 100)],
+            documents=[f"doc {i}" for i in range(start, start + 100)],
+        )
+    assert collection.count() == 500
+
+    queries = random_vectors(3, seed=1)
+    results = collection.query(query_embeddings=queries.tolist(), n_results=5)
+    expected = np.argsort(((queries[:, None, :] - vectors[None]) ** 2).sum(-1), axis=1)[:, :5]
+    for row, expected_row in zip(results["ids"], expected):
+        assert row == [ids[i] for i in expected_row]
+    assert results["documents"][0][0] == f"doc {expected[0][0]}"
+    assert abs(results["distances"][0][0] - (2 - 2 * queries[0] @ vectors[expected[0][0]])) < 1e-4
+
+    # 元数据过滤
+    where = build_where(year_from=2020, year_to=2021)
+    filtered = collection.query(query_embeddings=queries[:1].tolist(), n_results=5, where=where)
+    assert filtered["ids"][0] and all(2020 <= m["year"] <= 2021 for m in filtered["metadatas"][0])
+
+    store.close()
+    print("✓ 精确检索测试通过")
+
+
+def test_updates_and_compaction():
+    """测试覆盖、删除、元数据更新与段合并"""
+    store = create_store("test_numpy_compact", segment_rows=64, max_small_segments=4)
+    collection = store.get_or_create_collection("abstracts")
+    vectors = random_vectors(40)
+    for i in range(40):
+        collection.upsert(ids=[f"p{i}"], embeddings=[vectors[i].tolist()], metadatas=[{"paper_id": i}])
+
+    # 每次写入一个新段，未满的段超过 4 个时自动合并
+    assert len(list(collection.directory.glob("*.npy"))) <= 5
+    assert collection.count() == 40
+
+    # 覆盖后旧行失效，查询返回新向量
+    collection.upsert(ids=["p0"], embeddings=[vectors[1].tolist()], metadatas=[{"paper_id": 0}])
+    top = collection.query(query_embeddings=[vectors[1].tolist()], n_results=2)
+    assert set(top["ids"][0]) == {"p0", "p1"}
+
+    collection.update(ids=["p2"], metadatas=[{"venue": "ICML"}])
+    assert collection.get(ids=["p2"])["metadatas"][0] == {"paper_id": 2, "venue": "ICML"}
+
+    collection.delete(where={"paper_id": {"$gte": 10}})
+    assert collection.count() == 10
+    assert collection.compact() == 1
+    assert len(list(collection.directory.glob("*.npy"))) == 1
+
+    # 重新打开：只读 SQLite，第一次查询时映射段文件
+    store.close()
+    reopened = NumpyVectorStore(str(store.path)).get_or_create_collection("abstracts")
+    result = reopened.query(query_embeddings=[vectors[3].tolist()], n_results=1)
+    assert result["ids"][0] == ["p3"]
+    assert reopened.get(where={"paper_id": 3}, include=["metadatas"])["ids"] == ["p3"]
+    reopened.store.close()
+    print("✓ 段合并测试通过")
+
+
+def test_quantized_search():
+    """测试量化首轮 + 全精度精排"""
+    vectors = random_vectors(2000, dim=64)
+    queries = random_vectors(20, dim=64, seed=2)
+    ids = [f"v{i}" for i in range(2000)]
+
+    store = create_store("test_numpy_quantized")
+    store.get_or_create_collection("chunks").add(ids=ids, embeddings=vectors.tolist())
+    exact = store.get_or_create_collection("chunks").query(query_embeddings=queries.tolist(), n_results=10)
+    store.close()
+
+    for quantization in ("int8", "binary"):
+        # 以量化方式重新打开，缺少的编码在第一次查询时生成
+        quantized = NumpyVectorStore(str(store.path), quantization=quantization)
+        collection = quantized.get_or_create_collection("chunks")
+        results = collection.query(query_embeddings=queries.tolist(), n_results=10)
+        recall = np.mean([len(set(a) & set(b)) / 10 for a, b in zip(results["ids"], exact["ids"])])
+        assert recall >= 0.8, (quantization, recall)
+        # 返回的距离由全精度向量计算
+        first = ids.index(results["ids"][0][0])
+        assert abs(results["distances"][0][0] - ((queries[0] - vectors[first]) ** 2).sum()) < 1e-4
+        usage = collection.memory_usage()
+        assert 0 < usage["codes"] < usage["vectors"]
+        # int8 编码转换为 float32 后随快照缓存，之后的查询不再转换；二值编码直接扫描
+        assert usage["code_views"] == (usage["vectors"] if quantization == "int8" else 0)
+        quantized.close()
+    print("✓ 量化检索测试通过")
+
+
+def test_fulltext_diff():
+    """测试 add_fulltext 增量写入：只嵌入新分块、删除多余分块，元数据整体替换"""
+    for backend in ("numpy", "chroma"):
+        manager = create_manager(f"test_diff_{backend}", backend, embedding_cache=False)
+        paper = {"title": "Diff", "year": 2020, "authors": "Ada Lovelace, Alan Turing"}
+        metadata = paper_metadata(1, paper)
+        chunks = ["alpha", "beta", "gamma"]
+
+        stats = manager.add_fulltext(1, chunks, [metadata] * 3)
+        assert stats == {"added": 3, "unchanged": 0, "metadata_updated": 0, "deleted": 0}
+        assert manager.add_fulltext(1, chunks, [metadata] * 3) == {
+            "added": 0, "unchanged": 3, "metadata_updated": 0, "deleted": 0}
+
+        # 开头插入新分块、去掉最后一块：只嵌入新内容，其余分块只更新 chunk_index
+        manager.embedder.encoded.clear()
+        stats = manager.add_fulltext(1, ["delta", "alpha", "beta"], [metadata] * 3)
+        assert stats == {"added": 1, "unchanged": 0, "metadata_updated": 2, "deleted": 1}
+        assert manager.embedder.encoded == ["delta"]
+        assert manager.fulltext_collection.count() == 3
+
+        # 删除一位作者和年份后重新导入：旧键被清除，再次导入不再报告元数据变化
+        collection = manager.fulltext_collection
+        assert len(collection.get(where=build_where(authors=["Turing"]))["ids"]) == 3
+        metadata = paper_metadata(1, {"title": "Diff", "authors": "Ada Lovelace"})
+        chunks = ["delta", "alpha", "beta"]
+        assert manager.add_fulltext(1, chunks, [metadata] * 3)["metadata_updated"] == 3
+        assert manager.add_fulltext(1, chunks, [metadata] * 3) == {
+            "added": 0, "unchanged": 3, "metadata_updated": 0, "deleted": 0}
+        assert collection.get(where=build_where(authors=["Turing"]))["ids"] == []
+        assert collection.get(where=build_where(year_from=2000))["ids"] == []
+        assert len(collection.get(where=build_where(authors=["Lovelace"]))["ids"]) == 3
+
+        if backend == "numpy":
+            manager.client.close()
+    print("✓ 全文增量写入测试通过")
+
+
+def test_upsert_parity():
+    """测试 numpy 与 chroma 后端执行相同的 upsert 序列后内容一致，VectorManager 整体替换元数据"""
+    import chromadb
+    from chromadb.config import Settings
+
+    path = project_root / "data" / "database" / "test_parity_chroma"
+    if path.exists():
+        shutil.rmtree(path)
+    chroma = chromadb.PersistentClient(path=str(path), settings=Settings(anonymized_telemetry=False))
+    numpy_store = create_store("test_parity_numpy")
+    collections = [chroma.get_or_create_collection("parity"), numpy_store.get_or_create_collection("parity")]
+
+    vectors = random_vectors(3, dim=8).tolist()
+    steps = [
+        dict(ids=["a", "b"], embeddings=vectors[:2], documents=["doc a", "doc b"],
+             metadatas=[{"paper_id": 1, "year": 2020, "author:turing": True}, {"paper_id": 2}]),
+        # 已有记录：元数据按键合并，None 删除键，未提供文档时保持原文档
+        dict(ids=["a"], embeddings=vectors[2:], metadatas=[{"venue": "ICML", "author:turing": None}]),
+        dict(ids=["b", "c"], embeddings=vectors[1:], documents=["doc b2", "doc c"],
+             metadatas=[{"paper_id": 2, "year": 2021}, {"paper_id": 3}]),
+    ]
+    for step in steps:
+        for collection in collections:
+            collection.upsert(**step)
+
+    chroma_rows, numpy_rows = [collection.get(ids=["a", "b", "c"]) for collection in collections]
+    assert chroma_rows["ids"] == numpy_rows["ids"] == ["a", "b", "c"]
+    assert chroma_rows["documents"] == numpy_rows["documents"] == ["doc a", "doc b2", "doc c"]
+    assert chroma_rows["metadatas"] == numpy_rows["metadatas"]
+    assert numpy_rows["metadatas"][0] == {"paper_id": 1, "year": 2020, "venue": "ICML"}
+    numpy_store.close()
+
+    # VectorManager 写摘要/分析向量时不保留旧元数据中多出的键
+    for backend in ("numpy", "chroma"):
+        manager = create_manager(f"test_parity_manager_{backend}", backend, embedding_cache=False)
+        paper = {"title": "Parity", "year": 2019, "venue": "NeurIPS", "authors": "Alan Turing"}
+        manager.add_abstract(1, "abstract", paper_metadata(1, paper))
+        manager.add_analysis(1, "analysis", paper_metadata(1, paper))
+        replacement = paper_metadata(1, {"title": "Parity", "authors": "Ada Lovelace"})
+        manager.add_abstract(1, "abstract v2", replacement)
+        manager.add_analysis(1, "analysis v2", replacement)
+        for collection in (manager.abstract_collection, manager.analysis_collection):
+            stored = collection.get(include=["metadatas", "documents"])
+            assert stored["metadatas"] == [replacement], (backend, stored["metadatas"])
+            assert stored["documents"][0].endswith("v2")
+        if backend == "numpy":
+            manager.client.close()
+    print("✓ upsert 一致性测试通过")
+
+
+def test_author_filter():
+    """测试由 author:<键> 字段生成的 where 条件（全名或姓匹配，多位作者任意一位匹配）"""
+    assert build_where() is None
+    assert build_where(authors=["Alan Turing"]) == {"author:alan_turing": {"$eq": True}}
+    assert build_where(year_from=2020, authors=["Turing", "Lovelace"]) == {"$and": [
+        {"year": {"$gte": 2020}},
+        {"$or": [{"author:turing": {"$eq": True}}, {"author:lovelace": {"$eq": True}}]},
+    ]}
+
+    papers = {
+        1: {"authors": "Alan Turing, Ada Lovelace", "year": 2021},
+        2: {"authors": "José Müller", "year": 2019},
+        3: {"authors": "Grace Hopper", "year": 2022},
+    }
+    metadata = paper_metadata(2, papers[2])
+    assert metadata["author:jose_muller"] is True and metadata["author:muller"] is True
+
+    for backend in ("numpy", "chroma"):
+        manager = create_manager(f"test_author_filter_{backend}", backend, embedding_cache=False)
+        for paper_id, paper in papers.items():
+            manager.add_abstract(paper_id, f"abstract {paper_id}", paper_metadata(paper_id, paper))
+
+        def matching(**filters):
+            results = manager.search_abstracts("query", n_results=3, where=build_where(**filters))
+            return sorted(m["paper_id"] for m in results["metadatas"][0])
+
+        assert matching(authors=["turing"]) == [1]
+        assert matching(authors=["Jose Muller"]) == [2]
+        assert matching(authors=["Müller", "Hopper"]) == [2, 3]
+        assert matching(authors=["Lovelace", "Hopper"], year_from=2022) == [3]
+        assert matching(authors=["Knuth"]) == []
+        if backend == "numpy":
+            manager.client.close()
+    print("✓ 作者过滤测试通过")
+
+
+def test_shared_embedder():
+    """测试嵌入函数配置：构造参数覆盖 settings，三个集合共用一个延迟加载的嵌入函数"""
+    path = project_root / "data" / "database" / "test_shared_embedder"
+    if path.exists():
+        shutil.rmtree(path)
+    manager = VectorManager(str(path), embedding_model="test/model", device="cpu", batch_size=8,
+                            normalize=False, num_threads=2, backend="sentence-transformers",
+                            embedding_cache=False, vector_backend="numpy")
+    embedder = manager.embedder
+    assert type(embedder) is SentenceTransformerEmbedder
+    assert (embedder.model_name, embedder.device, embedder.batch_size) == ("test/model", "cpu", 8)
+    assert (embedder.normalize, embedder.num_threads) == (False, 2)
+    assert embedder.model_id == "test/model"
+    assert embedder._model is None  # 第一次编码时才加载模型
+    manager.client.close()
+
+    manager = create_manager("test_shared_embedder", embedding_cache=False)
+    manager.add_fulltext(1, ["chunk one", "chunk two"], [{"paper_id": 1}] * 2)
+    manager.add_abstract(1, "abstract")
+    manager.add_analysis(1, "analysis")
+    manager.search_batch(["query one", "query two"], n_results=1)
+
+    # 写入与查询都经过同一个嵌入函数，查询向量只算一次，吞吐分别统计
+    assert manager.embedder.encoded == ["chunk one", "chunk two", "abstract", "analysis", "query one", "query two"]
+    stats = manager.embedding_stats()
+    assert stats['ingest']['texts'] == 4 and stats['ingest']['calls'] == 3
+    assert stats['query']['texts'] == 2 and stats['query']['calls'] == 1
+    manager.client.close()
+    print("✓ 共享嵌入函数测试通过")
+
+
+def test_onnx_embedder():
+    """测试 ONNX 后端的选择、模型路径，以及按长度分批、均值池化后按原顺序返回"""
+    export_dir = project_root / "data" / "models" / "test_onnx"
+    int8 = create_embedder("onnx", model_name="org/model", export_dir=str(export_dir), quantize=True)
+    assert isinstance(int8, OnnxEmbedder) and int8.variant == "int8"
+    assert int8.model_id == "org/model:norm:onnx-int8"
+    assert int8.model_path == export_dir / "org__model" / "model.int8.onnx"
+
+    float_model = create_embedder("onnx", model_name="org/model", export_dir=str(export_dir), quantize=False)
+    assert float_model.model_path.name == "model.onnx" and float_model.model_id == "org/model:norm:onnx"
+
+    # VectorManager 按 backend 选择后端，模型在第一次编码时才导出/加载
+    path = project_root / "data" / "database" / "test_onnx_manager"
+    if path.exists():
+        shutil.rmtree(path)
+    manager = VectorManager(str(path), backend="onnx", embedding_cache=False, vector_backend="numpy")
+    assert isinstance(manager.embedder, OnnxEmbedder) and manager.embedder._model is None
+    manager.client.close()
+
+    # sentence-transformers 后端忽略 ONNX 专用参数
+    plain = create_embedder("sentence-transformers", model_name="org/model", export_dir="x", quantize=True)
+    assert type(plain) is SentenceTransformerEmbedder
+    try:
+        create_embedder("tensorrt")
+        assert False
+    except ValueError:
+        pass
+
+    class Encoding:
+        def __init__(self, ids, width):
+            self.ids = ids + [0] * (width - len(ids))
+            self.attention_mask = [1] * len(ids) + [0] * (width - len(ids))
+            self.type_ids = [0] * width
+
+    class FakeTokenizer:
+        def encode_batch(self, texts):
+            width = max(len(text) for text in texts)
+            return [Encoding([ord(ch) for ch in text], width) for text in texts]
+
+    class FakeSession:
+        """隐状态为 (字符编码, 1)，均值池化后第一维是有效字符编码的平均值"""
+        def __init__(self):
+            self.batches = []
+
+        def get_inputs(self):
+            return [type("Input", (), {"name": name})() for name in ("input_ids", "attention_mask")]
+
+        def run(self, outputs, feeds):
+            ids = feeds["input_ids"]
+            self.batches.append(ids.shape)
+            return [np.stack([ids, np.ones_like(ids)], axis=-1).astype(np.float32)]
+
+    embedder = OnnxEmbedder("org/model", batch_size=2, normalize=False, export_dir=str(export_dir))
+    embedder._model, embedder._tokenizer, embedder.meta = FakeSession(), FakeTokenizer(), {"pooling": "mean"}
+    texts = ["cccc", "a", "bb"]
+    vectors = embedder.embed(texts)
+    expected = [[np.mean([ord(ch) for ch in text]), 1.0] for text in texts]
+    assert np.allclose(vectors, expected)
+    # 按长度排序分批：短文本在同一批，填充更少
+    assert embedder._model.batches == [(2, 2), (1, 4)]
+
+    embedder.normalize = True
+    assert np.allclose(np.linalg.norm(embedder.embed(texts), axis=1), 1.0)
+    print("✓ ONNX 嵌入后端测试通过")
+
+
+def test_embedding_cache():
+    """测试向量缓存：规范化文本去重、float16 往返、命中统计与按模型隔离"""
+    path = project_root / "data" / "database" / "test_embedding_cache"
+    if path.exists():
+        shutil.rmtree(path)
+    cache = EmbeddingCache(str(path / "cache.sqlite"))
+    embedder = HashEmbedder()
+
+    texts = ["graph  neural\nnetworks", "graph neural networks", "transformers"]
+    first = cache.embed(embedder, texts)
+    assert embedder.encoded == ["graph  neural\nnetworks", "transformers"]
+    assert cache.hits == 1 and cache.misses == 2
+    assert first.dtype == np.float32 and np.array_equal(first[0], first[1])
+
+    # 新算出的向量也经过 float16，与之后从缓存读出的完全一致
+    exact = embedder._encode(["transformers"])[0]
+    assert np.array_equal(first[2], exact.astype(np.float16).astype(np.float32))
+    assert np.abs(first[2] - exact).max() < 1e-3
+
+    cache.close()
+    cache = EmbeddingCache(str(path / "cache.sqlite"))
+    embedder.encoded.clear()
+    assert np.array_equal(cache.embed(embedder, ["transformers", "graph neural networks"]), first[[2, 0]])
+    assert embedder.encoded == [] and cache.info()["hit_rate"] == 1.0
+
+    # 换模型后不复用
+    other = HashEmbedder(normalize=False)
+    cache.embed(other, ["transformers"])
+    assert other.encoded == ["transformers"]
+    assert cache.info()["entries"] == {embedder.model_id: 2, other.model_id: 1}
+    assert cache.clear(other.model_id) == 1
+    cache.close()
+
+    # VectorManager 写入时使用缓存：重新导入同样的内容不再调用模型
+    manager = create_manager("test_embedding_cache_manager", embedding_cache=True)
+    manager.add_abstract(1, "shared abstract")
+    manager.add_fulltext(1, ["chunk a", "chunk b"])
+    manager.delete_paper(1)
+    manager.add_abstract(1, "shared abstract")
+    manager.add_fulltext(1, ["chunk a", "chunk b", "chunk c"])
+    assert manager.embedder.encoded == ["shared abstract", "chunk a", "chunk b", "chunk c"]
+    cache_stats = manager.embedding_stats()["cache"]
+    assert cache_stats["hits"] == 3 and cache_stats["misses"] == 4
+    manager.client.close()
+    print("✓ 向量缓存测试通过")
+
+
+def test_batched_search():
+    """测试批量检索：一次编码所有查询，拆分后的结果与逐条检索一致"""
+    manager = create_manager("test_batched_search", embedding_cache=False)
+    for paper_id in range(1, 6):
+        manager.add_abstract(paper_id, f"abstract {paper_id}", {"paper_id": paper_id, "year": 2018 + paper_id})
+        manager.add_analysis(paper_id, f"analysis {paper_id}", {"paper_id": paper_id})
+
+    queries = ["abstract 2", "analysis 4", "unrelated"]
+    manager.embedder.encoded.clear()
+    batched = manager.search_abstracts_batch(queries, n_results=3)
+    assert manager.embedder.encoded == queries
+    assert len(batched) == 3 and batched[0]["ids"][0][0] == "paper_2_abstract"
+    for query, result in zip(queries, batched):
+        single = manager.search_abstracts(query, n_results=3)
+        assert result["ids"] == single["ids"] and result["metadatas"] == single["metadatas"]
+        assert np.allclose(result["distances"], single["distances"])
+
+    # 多个集合共用查询向量，where 条件对每个集合生效
+    manager.embedder.encoded.clear()
+    results = manager.search_batch(queries, n_results=2, collections=("abstracts", "analysis"),
+                                   where={"paper_id": {"$gte": 3}})
+    assert manager.embedder.encoded == queries
+    assert set(results) == {"abstracts", "analysis"}
+    assert results["analysis"][1]["ids"][0][0] == "paper_4_analysis"
+    assert all(m["paper_id"] >= 3 for per_query in results["abstracts"] for m in per_query["metadatas"][0])
+
+    # 预先计算的查询向量不再调用模型，数量必须与查询一致
+    embeddings = manager.embed_queries(queries)
+    manager.embedder.encoded.clear()
+    assert manager.search_abstracts_batch(queries, 3, query_embeddings=embeddings)[0]["ids"] == batched[0]["ids"]
+    assert manager.embedder.encoded == [] and manager.search_fulltext_batch([], 3) == []
+    try:
+        manager.search_abstracts_batch(queries, 3, query_embeddings=embeddings[:1])
+        assert False
+    except ValueError:
+        pass
+    manager.client.close()
+    print("✓ 批量检索测试通过")
+
+
+def test_write_generation():
+    """测试向量写入代数：持久化，其他实例（进程）的写入可见，写入失败时同样增加"""
+    writer = create_manager("test_write_generation", embedding_cache=False)
+    reader = VectorManager(str(writer.db_path), embedding_cache=False, vector_backend="numpy")
+    assert writer.write_generation == reader.write_generation == 0
+
+    writer.add_abstract(1, "abstract")
+    assert reader.write_generation == 1
+    # 内容未变的全文重复写入不算写入
+    writer.add_fulltext(1, ["chunk"])
+    writer.add_fulltext(1, ["chunk"])
+    assert reader.write_generation == 2
+
+    def broken_upsert(**kwargs):
+        raise RuntimeError("disk full")
+    writer.analysis_collection.upsert = broken_upsert
+    try:
+        writer.add_analysis(1, "analysis")
+        assert False
+    except RuntimeError:
+        pass
+    assert reader.write_generation == 3
+
+    writer.delete_paper(1)
+    assert reader.write_generation == 4
+    writer.client.close()
+    reader.client.close()
+    print("✓ 写入代数测试通过")
+
+
+def test_delete_during_query():
+    """测试查询取得快照后其他线程删除记录：不报错，已删除的记录不返回"""
+    import threading
+
+    store = create_store("test_numpy_delete_race", segment_rows=64, max_small_segments=2)
+    collection = store.get_or_create_collection("chunks")
+    vectors = random_vectors(60)
+    for start in range(0, 60, 20):
+        collection.add(
+            ids=[f"v{i}" for i in range(start, start + 20)],
+            embeddings=vectors[start:start + 20].tolist(),
+            metadatas=[{"paper_id": i} for i in range(start, start + 20)],
+            documents=[f"doc {i}" for i in range(start, start + 20)],
+        )
+
+    # 快照取得之后、读取元数据之前，另一个线程删除最近邻
+    load = collection._load
+
+    def load_then_delete():
+        snapshot = load()
+        worker = threading.Thread(target=collection.delete, kwargs={"ids": ["v0", "v1"]})
+        worker.start()
+        worker.join(timeout=5)
+        return snapshot
+
+    collection._load = load_then_delete
+    result = collection.query(query_embeddings=[vectors[0].tolist(), vectors[1].tolist()], n_results=5)
+    collection._load = load
+    for row_ids, row_metadatas, row_distances in zip(result["ids"], result["metadatas"], result["distances"]):
+        assert "v0" not in row_ids and "v1" not in row_ids
+        assert 3 <= len(row_ids) == len(row_metadatas) == len(row_distances) < 5
+        assert all(metadata["paper_id"] == int(vector_id[1:]) for vector_id, metadata in zip(row_ids, row_metadatas))
+
+    # 并发删除与查询
+    errors = []
+
+    def delete_all():
+        try:
+            for i in range(2, 60):
+                collection.delete(ids=[f"v{i}"])
+        except Exception as e:
+            errors.append(e)
+
+    worker = threading.Thread(target=delete_all)
+    worker.start()
+    while worker.is_alive():
+        try:
+            result = collection.query(query_embeddings=vectors[:4].tolist(), n_results=10)
+            for row_ids, row_documents in zip(result["ids"], result["documents"]):
+                assert len(row_ids) == len(row_documents)
+        except Exception as e:
+            errors.append(e)
+            break
+    worker.join(timeout=10)
+    assert not errors, errors
+    assert collection.count() == 0
+
+    store.close()
+    print("✓ 查询期间删除测试通过")
+
+
+def test_chroma_compact():
+    """测试 chroma 后端删除后 compact 运行 chroma vacuum 缩小文件，找不到命令时报错"""
+    from unittest import mock
+    from src.database.reconcile import disk_usage
+
+    manager = create_manager("test_chroma_compact", "chroma", embedding_cache=False)
+    for paper_id in range(20):
+        manager.add_fulltext(paper_id, [f"paper {paper_id} chunk {i} " + "text " * 400 for i in range(50)])
+    manager.delete_papers(list(range(1, 20)))
+    before = disk_usage(manager.db_path)
+
+    if shutil.which("chroma"):
+        assert manager.compact() is None
+        assert disk_usage(manager.db_path) < before
+        assert manager.fulltext_collection.count() == 50
+        hits = manager.fulltext_collection.query(query_embeddings=random_vectors(1, dim=16).tolist(), n_results=3)
+        assert len(hits["ids"][0]) == 3
+
+    with mock.patch("src.database.vector_manager.shutil.which", return_value=None):
+        try:
+            manager.compact()
+            assert False, "找不到 chroma 命令时应报错"
+        except RuntimeError as e:
+            assert "chroma vacuum --path" in str(e)
+    print("✓ chroma 空间回收测试通过")
+
+
+if __name__ == "__main__":
+    test_exact_search()
+    test_updates_and_compaction()
+    test_quantized_search()
+    test_fulltext_diff()
+    test_upsert_parity()
+    test_author_filter()
+    test_shared_embedder()
+    test_onnx_embedder()
+    test_embedding_cache()
+    test_batched_search()
+    test_write_generation()
+    test_delete_during_query()
+    test_chroma_compact()
@@ -37,9 +37,15 @@ def main():
         ["📄 论文管理", "📤 上传论文", "🔍 搜索论文", "📝 生成综述"]
     )
     
-    papers = st.session_state.sql_manager.get_all_papers()
+    stats = st.session_state.sql_manager.get_library_stats()
     st.sidebar.markdown("---")
-    st.sidebar.metric("论文总数", len(papers))
+    st.sidebar.metric("论文总数", stats['papers'])
+    st.sidebar.caption(f"已分析 {stats['analyzed']} 篇 · 文本块 {stats['chunks']} 个")
+    cache_info = st.session_state.query_engine.result_cache_info()
+    if cache_info['hits']:
+        st.sidebar.caption(
+            f"搜索缓存命中 {cache_info['hit_rate']:.0%} · 节省 {cache_info['saved_seconds']:.1f}s"
+        )
     
     st.sidebar.markdown("---")
     st.sidebar.subheader("⚙️ 配置")
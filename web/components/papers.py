@@ -1,15 +1,38 @@
 import streamlit as st
 
+PAGE_SIZE = 50
+
 def render_papers_page():
     st.header("📄 论文管理")
     
-    papers = st.session_state.sql_manager.get_all_papers()
+    # 游标栈：记录每一页的起始游标，用于上一页/下一页
+    if 'papers_cursors' not in st.session_state:
+        st.session_state.papers_cursors = [None]
+    
+    papers, next_cursor = st.session_state.sql_manager.list_papers(
+        columns=('title', 'authors', 'year'),
+        cursor=st.session_state.papers_cursors[-1],
+        limit=PAGE_SIZE
+    )
     
-    if not papers:
+    if not papers and len(st.session_state.papers_cursors) == 1:
         st.info("📭 数据库中还没有论文，请前往「上传论文」页面添加")
         return
     
-    st.success(f"共有 {len(papers)} 篇论文")
+    page = len(st.session_state.papers_cursors)
+    st.success(f"第 {page} 页，本页 {len(papers)} 篇论文")
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        if page > 1 and st.button("⬅️ 上一页"):
+            st.session_state.papers_cursors.pop()
+            st.rerun()
+    with col2:
+        if next_cursor is not None and st.button("下一页 ➡️"):
+            st.session_state.papers_cursors.append(next_cursor)
+            st.rerun()
+    
+    analyses = st.session_state.sql_manager.get_analyses([paper['id'] for paper in papers])
     
     for paper in papers:
         with st.expander(f"📄 {paper['title']}", expanded=False):
@@ -21,7 +44,7 @@ def render_papers_page():
             if paper.get('year'):
                 st.markdown(f"**年份:** {paper['year']}")
             
-            analysis = st.session_state.sql_manager.get_paper_analysis(paper['id'])
+            analysis = analyses.get(paper['id'])
             if analysis:
                 st.success("✅ 已分析")
                 if analysis.get('keywords'):
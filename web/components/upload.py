@@ -2,9 +2,57 @@ import streamlit as st
 from pathlib import Path
 import tempfile
 from src.parsers import ParserFactory, TextChunker
+from src.database.fingerprint import FileFingerprinter
+from src.database.metadata_filters import paper_metadata
 from src.llm import LLMFactory
 from config import settings
 
+# 每解析多少篇论文提交一次数据库事务
+UPLOAD_BATCH_SIZE = 10
+
+def _flush_pending(pending) -> int:
+    """批量写入数据库（单个事务）并逐篇建立向量索引
+    
+    单篇论文建立索引失败时只跳过这一篇，成功论文的 chunk_count 总会写回。
+    
+    Returns:
+        成功导入的论文数
+    """
+    if not pending:
+        return 0
+    
+    ids = st.session_state.sql_manager.add_papers_bulk([record for record, _ in pending])
+    chunker = TextChunker(settings.CHUNK_SIZE, settings.CHUNK_OVERLAP)
+    chunk_counts = {}
+    indexed = 0
+    
+    try:
+        for record, parsed in pending:
+            paper_id = ids[record['pdf_path']]
+            try:
+                chunks = chunker.chunk_text(parsed.full_text, paper_metadata(paper_id, record))
+                
+                if chunks:
+                    chunk_texts = [chunk["text"] for chunk in chunks]
+                    chunk_metadatas = [chunk.get("metadata", {}) for chunk in chunks]
+                    st.session_state.vector_manager.add_fulltext(paper_id, chunk_texts, chunk_metadatas)
+                    chunk_counts[paper_id] = len(chunks)
+                indexed += 1
+            except Exception as e:
+                st.error(f"论文 {Path(record['pdf_path']).name} 建立索引失败 (ID: {paper_id}): {e}")
+    finally:
+        st.session_state.sql_manager.set_chunk_counts(chunk_counts)
+    
+    return indexed
+
+def _flush_safely(pending) -> int:
+    """提交一批论文，整批写入失败时报告错误并返回 0"""
+    try:
+        return _flush_pending(pending)
+    except Exception as e:
+        st.error(f"写入数据库失败（{len(pending)} 篇论文）: {e}")
+        return 0
+
 def render_upload_page():
     st.header("📤 上传论文")
     
@@ -60,6 +108,7 @@ def render_upload_page():
         progress_bar = st.progress(0)
         status_text = st.empty()
         success_count = 0
+        pending = []
         
         for i, uploaded_file in enumerate(uploaded_files):
             unparsed_path = None
@@ -89,6 +138,17 @@ def render_upload_page():
                 
                 unparsed_path.write_bytes(uploaded_file.read())
                 
+                # 解析前检查是否已导入：指纹只算一次，后面直接传给 add_papers_bulk；
+                # 上传的文件随后会被移动，不写入指纹缓存
+                pdf_hash = FileFingerprinter.compute_hash(str(unparsed_path))
+                existing_id = st.session_state.sql_manager.get_paper_id_by_hash(pdf_hash)
+                if existing_id:
+                    unparsed_path.unlink()
+                    success_count += 1
+                    st.info(f"⏭ {uploaded_file.name} 已导入 (ID: {existing_id})，跳过解析")
+                    progress_bar.progress((i + 1) / len(uploaded_files))
+                    continue
+                
                 # 创建解析器（MinerU支持LLM）
                 if parser_type == "mineru":
                     from src.parsers.mineru_chunker import MinerUParser
@@ -103,24 +163,15 @@ def render_upload_page():
                 parsed_path = parsed_dir / filename
                 unparsed_path.rename(parsed_path)
                 
-                # 存入数据库（使用已解析目录的路径）
-                paper_id = st.session_state.sql_manager.add_paper(
-                    title=parsed.title,
-                    pdf_path=str(parsed_path),
-                    authors=', '.join(parsed.authors) if isinstance(parsed.authors, list) else parsed.authors,
+                # 记录待写入的论文，按批次统一提交
+                record = st.session_state.sql_manager.build_record(
+                    str(parsed_path),
+                    parsed,
                     raw_text=parsed.full_text,
-                    markdown_text=parsed.markdown_text
+                    markdown_text=parsed.markdown_text,
+                    pdf_hash=pdf_hash
                 )
-                
-                # 向量化存储
-                chunker = TextChunker(settings.CHUNK_SIZE, settings.CHUNK_OVERLAP)
-                chunks = chunker.chunk_text(parsed.full_text, {"paper_id": paper_id})
-                
-                if chunks:
-                    chunk_texts = [chunk["text"] for chunk in chunks]
-                    st.session_state.vector_manager.add_fulltext(paper_id, chunk_texts)
-                
-                success_count += 1
+                pending.append((record, parsed))
                 st.success(f"✓ {uploaded_file.name}")
                 
             except Exception as e:
@@ -131,8 +182,17 @@ def render_upload_page():
                     st.error(f"处理 {uploaded_file.name} 失败: {error_msg}")
                     # 如果处理失败，PDF保留在unparsed目录
             
+            # 提交与解析分开处理，写入失败不会算到当前文件上；无论成败都清空待写入列表，避免重复写入
+            if len(pending) >= UPLOAD_BATCH_SIZE:
+                try:
+                    success_count += _flush_safely(pending)
+                finally:
+                    pending = []
+            
             progress_bar.progress((i + 1) / len(uploaded_files))
         
+        success_count += _flush_safely(pending)
+        
         status_text.empty()
         
         if success_count == len(uploaded_files):